@@ -9,7 +9,7 @@
 # The output will be stored as:
 #   - mama-child.wav (contains the simulated speech)
 #   - mama-child-areas.txt (contains various simulation parameters)
-# Repair the wave file with the script "repair_header.py".
+# Repair the wave file with the script "repair_header.py" (Python 3).
 #
 #########################################################################################
 
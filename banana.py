@@ -5,9 +5,19 @@
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
 #                                                          load packages                                                               #
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
-import os, ctypes, time, random; #no need to install
-import xml.etree.ElementTree as et; #no need to install #among all packages that parse hml file, it is the fastest
-import numpy as np, matplotlib.pyplot as plt, librosa; #install needed
+import os, time; #no need to install
+import numpy as np, matplotlib.pyplot as plt; #install needed
+from pyvtl.features import get_cached_MFCC, default_extractor, FEATURE_VERSION; #MFCC function; the features of the target are cached on disk
+from pyvtl.parallel import ProcessPoolEvaluator; #parallel synthesis and scoring of candidates
+from pyvtl.memo import SynthesisMemo, objective_namespace; #results of candidates that were already evaluated
+from pyvtl.parameters import VTP_max_min, SCHWA_VTP; #the range of every vocal tract parameter
+from pyvtl.candidates import CandidateGenerator, TONGUE_VELUM_COUPLINGS; #random candidates with tongue and velum constraints
+from pyvtl.runlog import RunRecorder, read_log, export_csv; #binary log of every candidate
+from pyvtl.checkpoint import save_checkpoint, load_checkpoint; #the state of the search is saved regularly and can be resumed
+from pyvtl.surrogate import KNNSurrogate, SurrogateScreen; #prediction of the ssq of candidates before synthesis
+from pyvtl.fidelity import MultiFidelityEvaluator; #cheap evaluation of excerpts first, full synthesis only for the best candidates
+from pyvtl.optimize import SearchSpace, CMAES, AdaptiveLocalSearch, minimize; #batch optimizers as an alternative to the random search
+from pyvtl import telemetry; #stage timings and throughput of the training loop
 
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
 #                                                                Initialization                                                             #
@@ -18,200 +28,223 @@ start = time.time();
 #set working directory
 os.chdir('C:/Users/a.xu/Desktop/VTLAPI2.2-Windows');
 
-#Load VocalTractLab library
-VTL = ctypes.cdll.LoadLibrary('./VocalTractLabApi.dll');
+#VocalTractLab library; every worker process loads its own copy
+library_path = os.path.abspath('./VocalTractLabApi.dll');
 
-#initialize synthesis settings
-speaker_file_name = ctypes.c_char_p('nanana.speaker'.encode());
-gesture_file_name = ctypes.c_char_p('nanana.ges'.encode());
-wav_file_name = ctypes.c_char_p('nanana.wav'.encode());
-feedback_file_name = ctypes.c_char_p('feedback.txt'.encode());
-#The range of vocal tract parameters (VTP)
-VTP_max_min = np.array([[0,1],[-6,-3.5],[-0.5,0],[-7,0],[-1,1],[-2,4],[0,1],[-0.1,1],[0,0],[-3,4],[-3,1],[1.5,5.5],[-3,2.5],[-3,4],[-3,5],[-4,2],[-6,0],[-1.4,1.4],[-1.4,1.4],[-1.4,1.4],[-1.4,1.4],[-0.05,-0.05],[-0.05,-0.05],[-0.05,-0.05]]);
+#initialize synthesis settings; every worker synthesizes from a private copy of the speaker file
+speaker_file_name = os.path.abspath('nanana.speaker');
+gesture_file_name = os.path.abspath('nanana.ges');
+target_file_name = 'target_nanana.wav';
+#number of worker processes (None: one per core) and number of candidates evaluated per batch
+processes = None;
+batch_size = 4*(processes or os.cpu_count() or 1);
+#candidates are quantized to memo_resolution steps per VTP range; a candidate in an already evaluated grid cell is not synthesized again
+memo_resolution = 200;
+memo_file = None; #e.g. 'nanana_memo.sqlite' to share the results across runs; the results are kept apart by the contents of the speaker, gesture and target files and the objective settings below
+#every candidate (iteration, sum of squares, time, VTP) is appended to a binary run log; it is exported to the csv files at the end of the run
+run_log_file = 'nanana.runlog';
+#the state of the search (current VTP and ssq, counter, random generator) is saved atomically after every improvement and every checkpoint_every iterations
+#set resume = True to continue an interrupted run from its last checkpoint; with the same settings it draws exactly the candidates the interrupted run would have drawn
+#(use a memo_file, the in-memory memo is lost with the process)
+checkpoint_file = 'nanana.checkpoint.npz';
+checkpoint_every = 1000;
+resume = False;
+#optional pre-screening: a k-nearest-neighbour surrogate learns the ssq of the evaluated candidates, and only candidates predicted below the current ssq * (1 + screen_margin) are synthesized
+#a random screen_exploration fraction of the other candidates is synthesized anyway; these give the precision and recall of the screen, which are printed with the progress report
+#skipped candidates are logged with a ssq of NaN
+use_screen = False;
+screen_margin = 0.1;
+screen_exploration = 0.1;
+#optional multi-fidelity evaluation: every batch is scored on short excerpts of the gestural score with fewer MFCC coefficients first, and only the best eighth is synthesized in full (see pyvtl/fidelity.py)
+#candidates that are not promoted are logged with a ssq of NaN (they are not memoized)
+multi_fidelity = False;
+#optional banded DTW objective: with dtw_band = 10 candidates are scored by the DTW distance within 10 frames of the diagonal instead of the frame-by-frame sum of squares (see pyvtl/dtw.py)
+#then current_sum_of_squares has to be the DTW distance of the neutral sequence
+dtw_band = None;
+#optional early abandoning: with early_block_frames = 10 the MFCC error is accumulated 10 frames at a time and a candidate is abandoned as soon as it exceeds current_sum_of_squares (see pyvtl/early.py)
+#abandoned candidates are logged with an infinite ssq; how early they were abandoned is printed with the progress report
+early_block_frames = None;
+#optional telemetry: stage timings (wall and cpu), evaluations per second, memo hit rate, worker utilization and memory are written every telemetry_interval seconds (see pyvtl/telemetry.py)
+#e.g. 'nanana.prom' for a Prometheus text file that always holds the last snapshot, or 'nanana.jsonl' to append one JSON line per snapshot
+telemetry_file = None;
+telemetry_interval = 60.0;
+#search: 'random' draws the candidates around the current VTP with the tongue and velum constraints below (the baseline); 'cmaes' or 'local' let pyvtl/optimize.py propose them (CMAES or AdaptiveLocalSearch, starting at the VTP of schwas, without the constraints)
+#the progress reports print the current ssq against the number of synthesis calls and append it to progress_file, so that runs with different searches can be compared to the random search
+search = 'random';
+progress_file = 'nanana_progress.csv';
+#The range of vocal tract parameters (VTP) is VTP_max_min of pyvtl/parameters.py
 
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
 #                            tongue and velum constraints                                  #
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
 #Constraints1: Tongue parameters constraints: whenever the tongue blade paramters (TBX/TBY) were adjusted, those of tongue tip and tongue body were also modified by 20% with 1% resistance
-def constrained_parameterT(ii, TBX, TBY, current_VTP, VTP_max_min):
-    if ii == 9 or 11: #TCX and TTX changes according to TBX; TCY and TTY changes according to TBY
-        change = TBX - current_VTP[13];
-    else: #TCY and TTY changes according to TBY
-        change = TBY - current_VTP[14];
-    #TCX constraints
-    if current_VTP[ii]*0.99+change*0.2 == max(VTP_max_min[ii]): #make sure it stays within the VTP range
-        constrained_parameter = max(VTP_max_min[ii]);
-    elif current_VTP[ii]*0.99+change*0.2 == min(VTP_max_min[ii]):
-        constrained_parameter = min(VTP_max_min[ii]);
-    else:
-        constrained_parameter = current_VTP[ii]*0.99+change*0.2;
-    return  constrained_parameter
-
-#Constraints2:tongue body and velum constraints; every time the TCY parameter changes, velum opening changes by 20% with 1% resistance
-def constrained_parameterVO(ii, TCY, current_VTP, VTP_max_min):
-    change = TCY - current_VTP[10];
-    if current_VTP[ii]*0.99+change*0.2 == max(VTP_max_min[ii]):
-        constrained_parameter = max(VTP_max_min[ii]);
-    elif current_VTP[ii]*0.99+change*0.2 == min(VTP_max_min[ii]):
-        constrained_parameter = min(VTP_max_min[ii]);
-    else:
-        constrained_parameter = current_VTP[ii]*0.99+change*0.2;
-    return  constrained_parameter
+#TCX and TTX changes according to TBX; TCY and TTY changes according to TBY
+#Constraints2: tongue body and velum constraints; every time the TCY parameter changes, velum opening changes by 20% with 1% resistance
+#Constrained parameters are clipped to the VTP range
+couplings = TONGUE_VELUM_COUPLINGS; #see pyvtl/candidates.py
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
 #                          Generate random vocal tract parameters function                                 #
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
-def randomVTP_1():
-    HX=random.uniform(0,1);# Generate random number from 0 to 1
-    HY=random.uniform(-6,-3.5);
-    JX=random.uniform(-0.5,0);
-    JA=random.uniform(-7,0);
-    LP=random.uniform(-1,1);
-    LD=random.uniform(-2,4);
-    VS=random.uniform(0,1);
-    WC=0; #Not included in Prom-on et al., 2014, use netrual parameter instead
-    TBX=random.uniform(-3,4);
-    TBY=random.uniform(-3,5); 
-    TRX=random.uniform(-4,2);
-    TRY=random.uniform(-6,0); 
-    TS1=random.uniform(-1.4,1.4); 
-    TS2=random.uniform(-1.4,1.4); 
-    TS3=random.uniform(-1.4,1.4); 
-    TS4=random.uniform(-1.4,1.4); 
-    MA1= -0.05;
-    MA2= -0.05;
-    MA3= -0.05;
-	#Get VTP of tongue body (TCX, TCY), tongue tip (TTX,TTY) and velum opening (VO) by constraints
-    TCX = constrained_parameterT(9, TBX, TBY, current_VTP_1, VTP_max_min);
-    TCY = constrained_parameterT(10, TBX, TBY, current_VTP_1, VTP_max_min);
-    TTX = constrained_parameterT(11, TBX, TBY, current_VTP_1, VTP_max_min);
-    TTY = constrained_parameterT(12, TBX, TBY,current_VTP_1, VTP_max_min);
-    VO = constrained_parameterVO(7, TCY, current_VTP_1, VTP_max_min);
-    #
-    random_params = np.array([HX,HY,JX,JA,LP,LD,VS,VO,WC,TCX,TCY,TTX,TTY,TBX,TBY,TRX,TRY,TS1,TS2,TS3,TS4,MA1,MA2,MA3]);
-    return  random_params
-
-def randomVTP_2():
-    HX=random.uniform(0,1);# Generate random number from 0 to 1
-    HY=random.uniform(-6,-3.5);
-    JX=random.uniform(-0.5,0);
-    JA=random.uniform(-7,0);
-    LP=random.uniform(-1,1);
-    LD=random.uniform(-2,4);
-    VS=random.uniform(0,1);
-    WC=0; #Not included in Prom-on et al., 2014, use netrual parameter instead
-    TBX=random.uniform(-3,4);
-    TBY=random.uniform(-3,5);
-    TRX=random.uniform(-4,2);
-    TRY=random.uniform(-6,0);
-    TS1=random.uniform(-1.4,1.4);
-    TS2=random.uniform(-1.4,1.4); 
-    TS3=random.uniform(-1.4,1.4); 
-    TS4=random.uniform(-1.4,1.4); 
-    MA1= -0.05;
-    MA2= -0.05;
-    MA3= -0.05;
-	#Get VTP of tongue body (TCX, TCY), tongue tip (TTX,TTY) and velum opening (VO) by constraints
-    TCX = constrained_parameterT(9, TBX, TBY, current_VTP_2, VTP_max_min);
-    TCY = constrained_parameterT(10, TBX, TBY, current_VTP_2, VTP_max_min);
-    TTX = constrained_parameterT(11, TBX, TBY, current_VTP_2, VTP_max_min);
-    TTY = constrained_parameterT(12, TBX, TBY,current_VTP_2, VTP_max_min);
-    VO = constrained_parameterVO(7, TCY, current_VTP_2, VTP_max_min);
-    #
-    random_params = np.array([HX,HY,JX,JA,LP,LD,VS,VO,WC,TCX,TCY,TTX,TTY,TBX,TBY,TRX,TRY,TS1,TS2,TS3,TS4,MA1,MA2,MA3])
-    return  random_params
+#Every VTP is drawn uniformly from its range (WC and MA1-MA3 are fixed by their range), then TCX, TCY, TTX, TTY and VO are set by the constraints
+#A whole batch of candidates (n_candidates x 24) is generated at once; set seed to a number to repeat a run
+seed = None;
+generator_seed, screen_seed = np.random.SeedSequence(seed).spawn(2); #independent random streams for the candidates and the screen
+generator = CandidateGenerator(couplings, VTP_max_min, seed=generator_seed);
 
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
-#                                                                MFCC function                                                     #
-#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
-#The function takes sound file name as input; returns MFCC Matrix
-def get_MFCC(sound_file_name):
-    y, sr = librosa.load(sound_file_name, sr= 16000); #resample to 16000 Hz
-    #details of MFCC
-    n_mfcc = 40;
-    n_mels = 40;
-    n_fft = 512;
-    win_length = int(0.025*sr); #window time is 0.025
-    hop_length = int(0.010*sr); #hop time is 0.01 
-    window = 'hamming';
-    fmin = 0;
-    fmax = 8000;
-    stft_setting = librosa.stft(y, window=window, n_fft=n_fft, win_length=win_length, hop_length=hop_length);
-    S = librosa.feature.melspectrogram(S=stft_setting, y=y, n_mels=n_mels, fmin=fmin, fmax=fmax);
-    MFCC = librosa.feature.mfcc(S=librosa.power_to_db(S), n_mfcc=n_mfcc);
-    return MFCC
-#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
-#                                              Update speaker file function                                                     #
-#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
-#This function takes two sets of vocal tract parameters (numpy arrays)
-def update_speaker_file(params_1, params_2):
-    tree = et.parse("nanana.speaker");
-    for i in range(23):
-    #use getchildren to find the node that stores vocal tract parameter
-        tree.getroot().getchildren()[0].getchildren()[1].getchildren()[0].getchildren()[i].set('value', str(params_1[i]));# /a/ parameter in the speaker file
-        tree.getroot().getchildren()[0].getchildren()[1].getchildren()[40].getchildren()[i].set('value', str(params_2[i]));# /n/ parameter in the speaker file
-    tree.write("nanana.speaker")
-#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
 #                                                             training session                                                         #
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
 #The optimization is done by comparing the error of MFCC between the target and synthetic audio.
 #Every time there is an improvement in MFCC, the set of VTP will be adopted and recorded.
 #In every iteration, the VTP is random except for tongue tip (TTX/TTY), tongue body (TCX,TCY) and velum opening (V0), which are constrained by certain rules (see the tongue and velum constraints function).
-iteration = 100000;
-target_mfcc =  get_MFCC('target_nanana.wav'); #get target mfcc
-current_sum_of_squares =  562844.7591388852;#the mfcc difference between the netrual sequence and target sequence
-#start from vocal tract parameters of schwas
-current_VTP_1=np.array([1.0,  -4.75,  0.0,   -2.0,  -0.07,  0.95,   0.0,   -0.1,   0.0,   -0.4,   -1.46,    3.5,   -1.0,    2.0,    0.5,     0.0,    0.0,    0.0,   0.06,    0.15,    0.15,   -0.05,  -0.05,  -0.05]);# VTP of schwa
-current_VTP_2=np.array([1.0,  -4.75,  0.0,   -2.0,  -0.07,  0.95,   0.0,   -0.1,   0.0,   -0.4,   -1.46,    3.5,   -1.0,    2.0,    0.5,     0.0,    0.0,    0.0,   0.06,    0.15,    0.15,   -0.05,  -0.05,  -0.05]);# VTP of schwa
-#
-params_1 = np.array([1.0,  -4.75,  0.0,   -2.0,  -0.07,  0.95,   0.0,   -0.1,   0.0,   -0.4,   -1.46,    3.5,   -1.0,    2.0,    0.5,     0.0,    0.0,    0.0,   0.06,    0.15,    0.15,   -0.05,  -0.05,  -0.05]);# VTP of schwa
-params_2 =np.array([1.0,  -4.75,  0.0,   -2.0,  -0.07,  0.95,   0.0,   -0.1,   0.0,   -0.4,   -1.46,    3.5,   -1.0,    2.0,    0.5,     0.0,    0.0,    0.0,   0.06,    0.15,    0.15,   -0.05,  -0.05,  -0.05]);# VTP of schwa
-#
-Every_SSQ = np.zeros(shape=[iteration+1, 1]);  Every_SSQ[0,:] = current_sum_of_squares; #empty array for taking a record of every sum of squares; the first value in the array is the initial ssq
-#
-Every_VTP_1 = np.zeros(shape=[iteration+1, 24]); Every_VTP_1[0,:] = params_1; #empty array for taking a record of every set of VTP; the first value in the array is VTP of a schwa
-Every_VTP_2 = np.zeros(shape=[iteration+1, 24]); Every_VTP_2[0,:] = params_2;
-#
-counter = 0;
-for i in range(iteration):
-    counter += 1;
+#The candidates are synthesized and scored in batches on a pool of worker processes (see pyvtl/parallel.py).
+#The guard keeps the worker processes, which re-import this script on windows, from starting a training session of their own.
+if __name__ == '__main__':
+    iteration = 100000;
+    target_mfcc =  get_cached_MFCC(target_file_name); #get target mfcc (computed once, then loaded from the feature cache)
+    #start from vocal tract parameters of schwas
+    current_VTP_1=np.array([1.0,  -4.75,  0.0,   -2.0,  -0.07,  0.95,   0.0,   -0.1,   0.0,   -0.4,   -1.46,    3.5,   -1.0,    2.0,    0.5,     0.0,    0.0,    0.0,   0.06,    0.15,    0.15,   -0.05,  -0.05,  -0.05]);# VTP of schwa
+    current_VTP_2=np.array([1.0,  -4.75,  0.0,   -2.0,  -0.07,  0.95,   0.0,   -0.1,   0.0,   -0.4,   -1.46,    3.5,   -1.0,    2.0,    0.5,     0.0,    0.0,    0.0,   0.06,    0.15,    0.15,   -0.05,  -0.05,  -0.05]);# VTP of schwa
     #
-    params_1=randomVTP_1();#get a random set of vocal tract parameters with tongue constraints
-    params_2=randomVTP_2();
+    params_1 = np.array([1.0,  -4.75,  0.0,   -2.0,  -0.07,  0.95,   0.0,   -0.1,   0.0,   -0.4,   -1.46,    3.5,   -1.0,    2.0,    0.5,     0.0,    0.0,    0.0,   0.06,    0.15,    0.15,   -0.05,  -0.05,  -0.05]);# VTP of schwa
+    params_2 =np.array([1.0,  -4.75,  0.0,   -2.0,  -0.07,  0.95,   0.0,   -0.1,   0.0,   -0.4,   -1.46,    3.5,   -1.0,    2.0,    0.5,     0.0,    0.0,    0.0,   0.06,    0.15,    0.15,   -0.05,  -0.05,  -0.05]);# VTP of schwa
     #
-    update_speaker_file(params_1, params_2);
-    VTL.vtlGesToWav(speaker_file_name, gesture_file_name, wav_file_name, feedback_file_name);#synthesis by VTL
-    #VTL.vtlClose()
-    #caculate the MFCC of the synthesized audio
-    mfcc = get_MFCC('nanana.wav');
-    #caculate the sum of squares
-    residual = mfcc - target_mfcc;
-    sum_of_squares = np.sum(residual**2);
-    Every_SSQ[counter,:] = sum_of_squares; # Take a record of the SSQ of every synthetic sequence
-    Every_VTP_1[counter,:] = params_1; # Take a record of every set of VTP
-    Every_VTP_2[counter,:] = params_2;
-    if sum_of_squares < current_sum_of_squares:
-        current_sum_of_squares = sum_of_squares;
-        current_VTP_1=params_1;
-        current_VTP_2=params_2;
-        os.rename('nanana.wav','nanana%i.wav'%counter);
-        np.savetxt("Every_SSQ.csv", Every_SSQ, delimiter=","); #every sum of squares
-        np.savetxt("Every_VTP_1.csv", Every_VTP_1, delimiter=",");
-        np.savetxt("Every_VTP_2.csv", Every_VTP_2, delimiter=",");
-    #report the progress every 1000 iterations
-    if (counter % 1000==0):
-        print('Progress report');
-        print('Current_sum_of_sqaures: %i' % current_sum_of_squares);
-        np.savetxt("Every_SSQ.csv", Every_SSQ, delimiter=","); #every sum of squares
-        np.savetxt("Every_VTP_1.csv", Every_VTP_1, delimiter=",");
-        np.savetxt("Every_VTP_2.csv", Every_VTP_2, delimiter=",");
-#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
-#                                                      Training results                                                   #
-#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
-#timer
-end = time.time();
-time = end-start;
-print('Time: %i' % time);
-#save the output
-np.savetxt("Every_SSQ.csv", Every_SSQ, delimiter=",");
-np.savetxt("Every_VTP_1.csv", Every_VTP_1, delimiter=",");
-np.savetxt("Every_VTP_2.csv", Every_VTP_2, delimiter=",");
\ No newline at end of file
+    counter = 0;
+    #every worker process loads its own VTL library and synthesizes into its own scratch files
+    pool = ProcessPoolEvaluator(speaker_file_name, gesture_file_name, target_mfcc, processes=processes, library_path=library_path, band=dtw_band, block_frames=early_block_frames);
+    if resume:
+        state = load_checkpoint(checkpoint_file); #continue from the last checkpoint
+        counter = int(state['counter']);
+        current_sum_of_squares = state['current_sum_of_squares'];
+        current_VTP_1 = state['current_VTP_1'];
+        current_VTP_2 = state['current_VTP_2'];
+        generator.set_state(state['generator']);
+        recorder = RunRecorder(run_log_file, elapsed=state['elapsed']);
+        recorder.truncate(counter + 1); #drop the records after the checkpoint, they are evaluated again
+    else:
+        current_sum_of_squares = pool.evaluate([params_1], [params_2])[0]; #the mfcc difference between the neutral sequence and target sequence, computed with the current features (and DTW or early abandoning settings)
+        recorder = RunRecorder(run_log_file, append=False); #log for taking a record of every sum of squares and every set of VTP
+        recorder.record(0, current_sum_of_squares, params_1, params_2); #the first record is the initial ssq and the VTP of a schwa
+    last_checkpoint = counter;
+    #
+    #the optimizer proposes the candidates instead of the random generator; it starts at the VTP of schwas and is resumed from the checkpoint
+    optimizer = None;
+    if search != 'random':
+        space = SearchSpace();
+        optimizers = dict(cmaes=CMAES, local=AdaptiveLocalSearch);
+        optimizer = optimizers[search](space, x0=space.join(SCHWA_VTP, SCHWA_VTP), batch_size=batch_size, seed=generator_seed);
+        if resume:
+            optimizer.set_state(dict((key[len('optimizer_'):], value) for key, value in state.items() if key.startswith('optimizer_')));
+    #
+    evaluator = MultiFidelityEvaluator(pool, gesture_file_name) if multi_fidelity else pool;
+    namespace = objective_namespace([speaker_file_name, gesture_file_name, target_file_name], band=dtw_band, block_frames=early_block_frames, native=False, features=default_extractor().config, feature_version=FEATURE_VERSION); #results of other files or settings are never reused
+    memo = SynthesisMemo(resolution=memo_resolution, persistent_file=memo_file, namespace=namespace);
+    screen = None;
+    if use_screen:
+        screen = SurrogateScreen(KNNSurrogate(VTP_max_min), margin=screen_margin, exploration=screen_exploration, seed=screen_seed);
+        if resume:
+            recorder.flush();
+            records = read_log(run_log_file);
+            screen.surrogate.add(records['ssq'], records['params'][:, 0], records['params'][:, 1]); #learn from the candidates before the checkpoint
+            del records;
+            if 'screen' in state:
+                screen.set_state(state['screen']); #the explored candidates are drawn as in the original run
+    if telemetry_file is not None:
+        telemetry.configure(telemetry_file, format='jsonl' if telemetry_file.endswith('.jsonl') else 'prometheus', interval=telemetry_interval);
+    #
+    syntheses = int(state.get('syntheses', 0)) if resume else 0; #candidates passed to the evaluator (not memoized and not skipped by the screen)
+    def evaluate(candidates_1, candidates_2, files):
+        #synthesizes only the candidates without a memoized result; the audio of those better than the current ssq is kept in files
+        def compute(missing):
+            global syntheses;
+            syntheses += len(missing);
+            return evaluator.evaluate([candidates_1[j] for j in missing], [candidates_2[j] for j in missing], keep_below=current_sum_of_squares, keep_files=[files[j] for j in missing]);
+        return memo.evaluate(candidates_1, candidates_2, compute);
+    #
+    improved = False;
+    def run_batch(batch_1, batch_2):
+        #synthesis by VTL and sum of squares of the MFCC residual, computed in parallel; every candidate is recorded and the best one is adopted
+        global counter, current_sum_of_squares, current_VTP_1, current_VTP_2, improved;
+        n_candidates = len(batch_1);
+        keep_files = ['nanana%i.wav' % (counter + j + 1) for j in range(n_candidates)]; #the audio of candidates better than the current one is kept
+        with telemetry.stage('evaluate'):
+            if screen is None:
+                batch_ssq = evaluate(batch_1, batch_2, keep_files);
+            else: #only the candidates selected by the screen are evaluated
+                batch_ssq = screen.evaluate(batch_1, batch_2, current_sum_of_squares, lambda selected: evaluate(batch_1[selected], batch_2[selected], [keep_files[j] for j in selected]));
+        telemetry.count('evaluations', n_candidates);
+        for params_1, params_2, sum_of_squares, keep_file in zip(batch_1, batch_2, batch_ssq, keep_files):
+            counter += 1;
+            recorder.record(counter, sum_of_squares, params_1, params_2); # Take a record of the SSQ and the VTP of every synthetic sequence
+            if sum_of_squares < current_sum_of_squares:
+                current_sum_of_squares = sum_of_squares;
+                current_VTP_1=params_1;
+                current_VTP_2=params_2;
+                improved = True;
+            elif os.path.exists(keep_file): #beaten by an earlier candidate of the same batch
+                os.remove(keep_file);
+            #report the progress every 1000 iterations
+            if (counter % 1000==0):
+                print('Progress report');
+                print('Current_sum_of_sqaures: %i' % current_sum_of_squares);
+                print('Synthesis calls: %i (%s search)' % (syntheses, search));
+                with open(progress_file, 'a') as progress:
+                    progress.write('%s,%i,%i,%f\n' % (search, counter, syntheses, current_sum_of_squares));
+                print('Memo hit rate: %.3f' % memo.hit_rate);
+                if early_block_frames is not None:
+                    print(pool.abandon_stats.report());
+                if multi_fidelity:
+                    print('Full evaluations: %(full_evaluations)i of %(candidates)i, cost ratio %(cost_ratio).3f' % evaluator.stats());
+                if screen is not None:
+                    print('Screen: %(skip_rate).3f skipped, precision %(precision).3f, recall %(recall).3f' % screen.stats());
+        return batch_ssq;
+    #
+    def checkpoint_if_due():
+        #checkpoint after complete batches only, so that a resumed run draws the same batches
+        global improved, last_checkpoint;
+        if improved or counter - last_checkpoint >= checkpoint_every:
+            with telemetry.stage('checkpoint'):
+                recorder.flush(); #write the buffered records to the log first; it may be ahead of the checkpoint, never behind
+                checkpoint = dict(counter=counter, current_sum_of_squares=current_sum_of_squares, current_VTP_1=current_VTP_1, current_VTP_2=current_VTP_2, generator=generator.state(), elapsed=recorder.elapsed, syntheses=syntheses);
+                if screen is not None:
+                    checkpoint['screen'] = screen.state(); #the random selection of the screen is resumed as well
+                if optimizer is not None: #the search distribution of the optimizer is resumed as well
+                    checkpoint.update(('optimizer_' + key, value) for key, value in optimizer.state().items());
+                save_checkpoint(checkpoint_file, checkpoint);
+            last_checkpoint = counter;
+        improved = False;
+        telemetry.gauge('memo_hit_rate', memo.hit_rate);
+        telemetry.gauge('worker_utilization', pool.utilization);
+        telemetry.maybe_flush();
+    #
+    if optimizer is None:
+        for batch_start in range(counter, iteration, batch_size):
+            n_candidates = min(batch_size, iteration - batch_start);
+            #get random sets of vocal tract parameters with tongue constraints; all candidates of a batch are drawn around the same current VTP
+            with telemetry.stage('generate'):
+                batch_1 = generator.generate(current_VTP_1, n_candidates);
+                batch_2 = generator.generate(current_VTP_2, n_candidates);
+            run_batch(batch_1, batch_2);
+            checkpoint_if_due();
+    else:
+        def evaluate_candidates(batch_1, batch_2):
+            batch_ssq = run_batch(batch_1, batch_2);
+            return np.where(np.isnan(batch_ssq), np.inf, batch_ssq); #candidates skipped by the screen or not promoted by the multi-fidelity evaluation rank last
+        report = minimize(optimizer, evaluate_candidates, max_evaluations=iteration, callback=lambda __: checkpoint_if_due());
+        print('Optimizer: %s after %i evaluations' % (report['stop_reason'] or 'stopped', report['evaluations']));
+    if multi_fidelity:
+        evaluator.close(); #removes the excerpts
+    pool.close();
+    memo.close();
+    recorder.close();
+    telemetry.close();
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
+    #                                                      Training results                                                   #
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
+    #timer (including the time before a resume)
+    time = recorder.elapsed;
+    print('Time: %i' % time);
+    #the ssq reached per synthesis call; compare the lines of progress_file with those of a run with search = 'random'
+    print('Sum of squares: %i after %i synthesis calls (%s search)' % (current_sum_of_squares, syntheses, search));
+    #save the output: every sum of squares and every set of VTP
+    export_csv(run_log_file, "Every_SSQ.csv", ("Every_VTP_1.csv", "Every_VTP_2.csv"));
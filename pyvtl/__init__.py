@@ -0,0 +1,8 @@
+'''
+Python helpers around the VocalTractLab API that are shared by the training
+scripts (banana.py, banana_synthesis.ipynb) of this repository.
+
+The binary itself lives in ``vtlapi-2.1b``; see the examples there for the
+plain ``ctypes`` usage these helpers are built on.
+
+'''
@@ -0,0 +1,286 @@
+'''
+Typed binding of the VocalTractLab API.
+
+:func:`declare` sets ``argtypes`` and ``restype`` of all functions of
+``VocalTractLabApi64.h`` on a loaded library, with numpy arrays passed
+directly as ``double *`` / ``char *`` (``np.ctypeslib.ndpointer``), so
+wrong arguments raise a ``ctypes.ArgumentError`` instead of crashing the
+library.
+
+:class:`VocalTractLab` wraps one loaded library. After ``vtlInitialize`` it
+caches the constants and the parameter info of the speaker, and it keeps
+its output buffers (audio, tube areas and articulators) between calls, so
+repeated syntheses allocate nothing but the returned arrays.
+
+Example::
+
+    with VocalTractLab(speaker_file='JD2.speaker') as vtl:
+        tract = np.tile(vtl.get_tract_params('a'), (100, 1))
+        glottis = np.tile(vtl.glottis_param_neutral, (100, 1))
+        audio, tube_areas, tube_articulators = vtl.synth_block(tract, glottis)
+
+'''
+
+import ctypes
+
+import numpy as np
+
+from . import library
+
+
+# characters reserved per parameter name
+NAME_LENGTH = 32
+
+_doubles = np.ctypeslib.ndpointer(dtype=np.float64, flags='C_CONTIGUOUS')
+_chars = np.ctypeslib.ndpointer(dtype=np.uint8, flags='C_CONTIGUOUS')
+_int_pointer = ctypes.POINTER(ctypes.c_int)
+
+# name: (restype, argtypes), as in VocalTractLabApi64.h
+SIGNATURES = {
+    'vtlInitialize': (ctypes.c_int, [ctypes.c_char_p]),
+    'vtlClose': (None, []),
+    'vtlGetVersion': (None, [ctypes.c_char_p]),
+    'vtlGetConstants': (None, [_int_pointer, _int_pointer, _int_pointer,
+                               _int_pointer]),
+    'vtlGetTractParamInfo': (None, [ctypes.c_char_p, _doubles, _doubles,
+                                    _doubles]),
+    'vtlGetGlottisParamInfo': (None, [ctypes.c_char_p, _doubles, _doubles,
+                                      _doubles]),
+    'vtlGetTractParams': (ctypes.c_int, [ctypes.c_char_p, _doubles]),
+    'vtlGetTransferFunction': (None, [_doubles, ctypes.c_int, _doubles,
+                                      _doubles]),
+    'vtlSynthBlock': (ctypes.c_int, [_doubles, _doubles, _doubles, _chars,
+                                     ctypes.c_int, ctypes.c_double, _doubles,
+                                     _int_pointer]),
+    'vtlTubeSynthesisReset': (None, []),
+    'vtlTubeSynthesisAdd': (None, [ctypes.c_int, _doubles, _doubles, _doubles,
+                                   _chars, ctypes.c_double, ctypes.c_double,
+                                   ctypes.c_double, _doubles]),
+    'vtlApiTest1': (None, [ctypes.c_char_p, _doubles, _int_pointer]),
+    'vtlApiTest2': (None, [ctypes.c_char_p, _doubles, _int_pointer]),
+    'vtlGesToWav': (ctypes.c_int, [ctypes.c_char_p, ctypes.c_char_p,
+                                   ctypes.c_char_p, ctypes.c_char_p]),
+}
+
+
+def declare(VTL):
+    '''
+    Declares the signatures of all API functions on the ``ctypes`` handle
+    ``VTL`` and returns it.
+
+    '''
+    for name, (restype, argtypes) in SIGNATURES.items():
+        function = getattr(VTL, name)
+        function.restype = restype
+        function.argtypes = argtypes
+    return VTL
+
+
+def _doubles_array(values):
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def _encode(file_name):
+    return None if file_name is None else file_name.encode()
+
+
+class VocalTractLab(object):
+    '''
+    One loaded VocalTractLab library with typed calls.
+
+    Parameters:
+
+    * library_path -- VocalTractLab binary (default: the one in vtlapi-2.1b)
+    * speaker_file -- speaker to initialize the synthesizer with; without
+      it only :meth:`ges_to_wav` can be used until :meth:`initialize`
+    * private -- load a private copy of the library (see
+      :func:`pyvtl.library.load_private_copy`), stored in ``directory``
+
+    '''
+
+    def __init__(self, library_path=None, speaker_file=None, private=False,
+                 directory=None):
+        if private:
+            VTL = library.load_private_copy(library_path, directory)
+        else:
+            VTL = library.load_library(library_path)
+        self.VTL = declare(VTL)
+        self.initialized = False
+        self._buffers = dict()
+        if speaker_file is not None:
+            self.initialize(speaker_file)
+
+    @property
+    def version(self):
+        '''
+        Compile date of the library.
+
+        '''
+        version = ctypes.create_string_buffer(64)
+        self.VTL.vtlGetVersion(version)
+        return version.value.decode()
+
+    def initialize(self, speaker_file):
+        '''
+        Initializes the synthesizer with ``speaker_file`` and reads its
+        constants and parameter info.
+
+        '''
+        failure = self.VTL.vtlInitialize(speaker_file.encode())
+        if failure != 0:
+            raise ValueError('Error in vtlInitialize! Errorcode: %i' % failure)
+        self.initialized = True
+        self.speaker_file = speaker_file
+
+        constants = [ctypes.c_int(0) for __ in range(4)]
+        self.VTL.vtlGetConstants(*[ctypes.byref(value) for value in constants])
+        (self.audio_sampling_rate, self.number_tube_sections,
+         self.number_vocal_tract_parameters,
+         self.number_glottis_parameters) = [value.value for value in constants]
+
+        (self.tract_param_names, self.tract_param_min, self.tract_param_max,
+         self.tract_param_neutral) = self._param_info(
+             self.VTL.vtlGetTractParamInfo, self.number_vocal_tract_parameters)
+        (self.glottis_param_names, self.glottis_param_min,
+         self.glottis_param_max, self.glottis_param_neutral) = self._param_info(
+             self.VTL.vtlGetGlottisParamInfo, self.number_glottis_parameters)
+
+    def _param_info(self, function, number):
+        names = ctypes.create_string_buffer(NAME_LENGTH * number)
+        minimum = np.zeros(number)
+        maximum = np.zeros(number)
+        neutral = np.zeros(number)
+        function(names, minimum, maximum, neutral)
+        return names.value.decode().split(), minimum, maximum, neutral
+
+    def _buffer(self, name, shape, dtype=np.float64):
+        # reusable output buffer of at least shape; returns a view of shape
+        size = int(np.prod(shape))
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.size < size:
+            buffer = np.zeros(size, dtype=dtype)
+            self._buffers[name] = buffer
+        return buffer[:size].reshape(shape)
+
+    def get_tract_params(self, shape_name):
+        '''
+        Returns the vocal tract parameters of the shape ``shape_name`` of
+        the speaker.
+
+        '''
+        params = np.zeros(self.number_vocal_tract_parameters)
+        failure = self.VTL.vtlGetTractParams(shape_name.encode(), params)
+        if failure != 0:
+            raise ValueError('Error in vtlGetTractParams! Errorcode: %i'
+                             % failure)
+        return params
+
+    def synth_block(self, tract_params, glottis_params, frame_rate=200.0,
+                    copy=True):
+        '''
+        ``vtlSynthBlock`` for the frames x params matrices ``tract_params``
+        and ``glottis_params``; returns ``(audio, tube_areas,
+        tube_articulators)``, the areas and articulator letters (uint8) as
+        frames x tube sections.
+
+        With ``copy=False`` the results are views of the internal buffers,
+        which are overwritten by the next call.
+
+        '''
+        tract_params = _doubles_array(tract_params)
+        glottis_params = _doubles_array(glottis_params)
+        number_frames = tract_params.shape[0]
+        if glottis_params.shape[0] != number_frames:
+            raise ValueError('tract_params and glottis_params need the same '
+                             'number of frames')
+        # 2000 samples more in the audio signal for safety
+        audio = self._buffer('audio', int(number_frames / frame_rate
+                                          * self.audio_sampling_rate) + 2000)
+        tube_areas = self._buffer('tube_areas', (number_frames,
+                                                 self.number_tube_sections))
+        tube_articulators = self._buffer('tube_articulators',
+                                         (number_frames,
+                                          self.number_tube_sections),
+                                         np.uint8)
+        number_audio_samples = ctypes.c_int(0)
+
+        failure = self.VTL.vtlSynthBlock(tract_params,  # input
+                                         glottis_params,  # input
+                                         tube_areas,  # output
+                                         tube_articulators,  # output
+                                         number_frames,  # input
+                                         frame_rate,  # input
+                                         audio,  # output
+                                         ctypes.byref(number_audio_samples))
+        if failure != 0:
+            raise ValueError('Error in vtlSynthBlock! Errorcode: %i' % failure)
+        audio = audio[:number_audio_samples.value]
+        if copy:
+            return audio.copy(), tube_areas.copy(), tube_articulators.copy()
+        return audio, tube_areas, tube_articulators
+
+    def get_transfer_function(self, tract_params, num_spectrum_samples=1024):
+        '''
+        ``vtlGetTransferFunction`` for one vector of vocal tract parameters;
+        returns ``(magnitude_spectrum, phase_spectrum)``.
+
+        '''
+        magnitude_spectrum = np.zeros(num_spectrum_samples)
+        phase_spectrum = np.zeros(num_spectrum_samples)  # in radiants
+        self.VTL.vtlGetTransferFunction(_doubles_array(tract_params),
+                                        num_spectrum_samples,
+                                        magnitude_spectrum, phase_spectrum)
+        return magnitude_spectrum, phase_spectrum
+
+    def tube_synthesis_reset(self):
+        self.VTL.vtlTubeSynthesisReset()
+
+    def tube_synthesis_add(self, number_new_samples, tube_length, tube_area,
+                           tube_articulator, incisor_position,
+                           velum_opening, aspiration_strength, glottis_params,
+                           copy=True):
+        '''
+        ``vtlTubeSynthesisAdd``: synthesizes ``number_new_samples`` samples
+        while the tube geometry moves linearly to the given target (lengths
+        in m, areas in m^2, articulator letters as uint8 or bytes, incisor
+        position in m, velum opening in m^2, aspiration strength in dB) and
+        returns them.
+
+        '''
+        audio = self._buffer('tube_audio', number_new_samples)
+        if isinstance(tube_articulator, bytes):
+            tube_articulator = np.frombuffer(tube_articulator, dtype=np.uint8)
+        self.VTL.vtlTubeSynthesisAdd(number_new_samples, audio,
+                                     _doubles_array(tube_length),
+                                     _doubles_array(tube_area),
+                                     np.ascontiguousarray(tube_articulator,
+                                                          dtype=np.uint8),
+                                     incisor_position, velum_opening,
+                                     aspiration_strength,
+                                     _doubles_array(glottis_params))
+        return audio.copy() if copy else audio
+
+    def ges_to_wav(self, speaker_file, gesture_file, wav_file,
+                   feedback_file=None):
+        '''
+        ``vtlGesToWav``: synthesizes ``gesture_file`` with ``speaker_file``
+        into ``wav_file`` (and ``feedback_file``, if given).
+
+        '''
+        failure = self.VTL.vtlGesToWav(speaker_file.encode(),
+                                       gesture_file.encode(),
+                                       wav_file.encode(),
+                                       _encode(feedback_file))
+        if failure != 0:
+            raise ValueError('Error in vtlGesToWav! Errorcode: %i' % failure)
+
+    def close(self):
+        if self.initialized:
+            self.VTL.vtlClose()
+            self.initialized = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,93 @@
+'''
+Reading and resampling audio in memory.
+
+Synthesized audio is passed on to the feature stage as numpy arrays. Changes
+of the sampling rate use a polyphase filter that is designed once per pair of
+source and target rate and then reused for every signal.
+
+'''
+
+from math import gcd
+
+import numpy as np
+import scipy.io.wavfile
+import scipy.signal
+
+
+class Resampler(object):
+    '''
+    Polyphase resampling from ``source_rate`` to ``target_rate``.
+
+    The anti-aliasing filter is a kaiser windowed FIR low-pass as designed by
+    ``scipy.signal.resample_poly``; it is computed once in the constructor.
+
+    '''
+
+    def __init__(self, source_rate, target_rate, half_length=10, beta=5.0):
+        divisor = gcd(int(source_rate), int(target_rate))
+        self.source_rate = source_rate
+        self.target_rate = target_rate
+        self.up = int(target_rate) // divisor
+        self.down = int(source_rate) // divisor
+        max_rate = max(self.up, self.down)
+        if max_rate == 1:
+            self.filter = None  # nothing to resample
+            return
+        self.filter = scipy.signal.firwin(2 * half_length * max_rate + 1,
+                                          1.0 / max_rate,
+                                          window=('kaiser', beta))
+
+    def __call__(self, signal):
+        '''
+        Resamples ``signal`` along its last axis, so a N x samples batch is
+        resampled in one call.
+
+        '''
+        if self.up == self.down:
+            return np.asarray(signal)
+        return scipy.signal.resample_poly(signal, self.up, self.down, axis=-1,
+                                          window=self.filter)
+
+
+# resamplers already designed, keyed by (source rate, target rate)
+_resamplers = dict()
+
+
+def get_resampler(source_rate, target_rate):
+    '''
+    Returns the cached :class:`Resampler` for the pair of rates.
+
+    '''
+    key = (int(source_rate), int(target_rate))
+    if key not in _resamplers:
+        _resamplers[key] = Resampler(*key)
+    return _resamplers[key]
+
+
+def resample(signal, source_rate, target_rate):
+    '''
+    Resamples ``signal`` from ``source_rate`` to ``target_rate``.
+
+    '''
+    return get_resampler(source_rate, target_rate)(signal)
+
+
+def read_wav(sound_file_name, sr=None):
+    '''
+    Reads a wav file into a mono float32 signal in [-1, 1]; returns
+    ``(signal, rate)``. If ``sr`` is given, the signal is resampled to it.
+
+    '''
+    rate, signal = scipy.io.wavfile.read(sound_file_name)
+    # scale before mixing down: the mean of integer channels is float
+    if signal.dtype == np.uint8:
+        signal = (signal - 128.0) / 128.0  # 8 bit wav files are unsigned
+    elif np.issubdtype(signal.dtype, np.integer):
+        signal = signal / float(np.iinfo(signal.dtype).max + 1)
+    if signal.ndim > 1:
+        signal = signal.mean(axis=1)
+    signal = np.asarray(signal, dtype=np.float32)
+    if sr is not None and sr != rate:
+        signal = resample(signal, rate, sr).astype(np.float32)
+        rate = sr
+    return signal, rate
@@ -0,0 +1,331 @@
+'''
+Micro-benchmarks of the stages of the training pipeline.
+
+Every stage of banana.py is timed in isolation on the bundled inputs
+(JD2.speaker, banane.ges, banane-orig.wav and vtlapi-2.1b/example-hallo.ges):
+patching the speaker file, ``vtlGesToWav``, the header fix, reading the wav
+file, ``get_MFCC``, the sum of squares and the recording of a candidate (run
+log record and checkpoint), next to ``vtlSynthBlock`` on the /a/ to /i/
+sequence of example1.py and ``vtlGetTransferFunction`` of example3.py. The
+``end_to_end`` stage evaluates one candidate from the speaker file to the
+sum of squares.
+
+The results (latency percentiles in seconds and throughput in calls per
+second) are written as JSON and printed. Given a stored baseline, a stage
+whose median latency grew by more than ``threshold`` and by more than
+``min_delta`` seconds is a regression, and the command fails (the absolute
+floor keeps the timer jitter of microsecond stages from failing it)::
+
+    python -m pyvtl.benchmark --output results.json --save-baseline base.json
+    ...
+    python -m pyvtl.benchmark --baseline base.json --threshold 0.2
+
+'''
+
+import argparse
+import collections
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from . import api, audio, features, library, speaker, wav
+from .checkpoint import save_checkpoint
+from .parameters import SCHWA_VTP
+from .runlog import RunRecorder
+from .trajectory import TrajectoryBuilder
+
+
+# directory of the bundled inputs
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+Stage = collections.namedtuple('Stage', ['name', 'function', 'repeat',
+                                         'setup'])
+# setup is called before every timed call, outside of the timing
+Stage.__new__.__defaults__ = (20, None)
+
+
+def time_stage(stage, repeat=None, warmup=1):
+    '''
+    Returns the durations (s) of ``repeat`` timed calls of the
+    :class:`Stage` ``stage`` after ``warmup`` untimed ones.
+
+    '''
+    if repeat is None:
+        repeat = stage.repeat
+    durations = np.empty(repeat)
+    for number in range(warmup + repeat):
+        if stage.setup is not None:
+            stage.setup()
+        start = time.perf_counter()
+        stage.function()
+        duration = time.perf_counter() - start
+        if number >= warmup:
+            durations[number - warmup] = duration
+    return durations
+
+
+def summarize(durations):
+    '''
+    Returns the latency percentiles and the throughput of ``durations`` as
+    a dict.
+
+    '''
+    p50, p90, p99 = np.percentile(durations, [50, 90, 99])
+    mean = float(np.mean(durations))
+    return dict(calls=len(durations), mean=mean, min=float(durations.min()),
+                p50=float(p50), p90=float(p90), p99=float(p99),
+                max=float(durations.max()),
+                throughput=1.0 / mean if mean > 0 else float('inf'))
+
+
+class PipelineStages(object):
+    '''
+    The benchmark stages on the bundled inputs in ``root``, with scratch
+    files in a temporary directory.
+
+    Parameters:
+
+    * library_path -- VocalTractLab binary (default: the one in vtlapi-2.1b)
+    * scratch_dir -- directory in which the scratch directory is created
+
+    '''
+
+    def __init__(self, root=ROOT, library_path=None, scratch_dir=None):
+        self.root = root
+        self.scratch_dir = tempfile.mkdtemp(prefix='vtl-benchmark-',
+                                            dir=scratch_dir)
+        self.speaker_file = os.path.join(root, 'JD2.speaker')
+        self.gesture_file = os.path.join(root, 'banane.ges')
+        self.hallo_file = os.path.join(library.VTLAPI_DIR,
+                                       'example-hallo.ges')
+        self.target_mfcc = features.get_MFCC(os.path.join(root,
+                                                          'banane-orig.wav'))
+        # vtlGesToWav initializes and closes the synthesizer itself; the
+        # block synthesis runs on a private copy of the library
+        self.ges_vtl = api.VocalTractLab(library_path)
+        self.vtl = api.VocalTractLab(library_path, self.speaker_file,
+                                     private=True, directory=self.scratch_dir)
+
+        template = speaker.SpeakerTemplate(self.speaker_file)
+        self.patcher = template.patcher(speaker.default_shapes(template))
+        self.params = np.array(SCHWA_VTP)
+        self.candidate_file = self._scratch('candidate.speaker')
+        self.wav_file = self._scratch('candidate.wav')
+        self.hallo_wav_file = self._scratch('hallo.wav')
+        self.log_file = self._scratch('benchmark.runlog')
+        self.checkpoint_file = self._scratch('benchmark.checkpoint.npz')
+
+        # inputs of the later stages, from one run of the earlier ones
+        self.update_speaker_file()
+        self.ges_to_wav()
+        with open(self.wav_file, 'rb') as file_:
+            self._raw_header = file_.read(wav.VTL_HEADER_SIZE)
+        self.fix_header()
+        self.mfcc = self.get_MFCC()
+        self.recorder = RunRecorder(self.log_file, append=False)
+        builder = TrajectoryBuilder(self.vtl)
+        self.tract, self.glottis = builder.build(
+            [(0.0, 'a'), (0.995, 'i')], 1.0, f0=[(0.0, 120.0), (1.0, 100.0)])
+        self.frame_rate = builder.frame_rate
+        self.params_a = self.vtl.get_tract_params('a')
+
+    def _scratch(self, name):
+        return os.path.join(self.scratch_dir, name)
+
+    def update_speaker_file(self):
+        self.patcher.write(self.candidate_file, self.params[:23],
+                           self.params[:23])
+
+    def ges_to_wav(self):
+        self.ges_vtl.ges_to_wav(self.candidate_file, self.gesture_file,
+                                self.wav_file)
+
+    def ges_to_wav_hallo(self):
+        self.ges_vtl.ges_to_wav(self.speaker_file, self.hallo_file,
+                                self.hallo_wav_file)
+
+    def restore_header(self):
+        # the header as written by vtlGesToWav
+        with open(self.wav_file, 'r+b') as file_:
+            file_.write(self._raw_header)
+
+    def fix_header(self):
+        if sys.platform != 'win32':
+            wav.fix_header(self.wav_file)
+
+    def read_wav(self):
+        return audio.read_wav(self.wav_file)
+
+    def get_MFCC(self):
+        return features.get_MFCC(self.wav_file)
+
+    def sum_of_squares(self):
+        # over the frames of both sequences
+        frames = min(self.mfcc.shape[1], self.target_mfcc.shape[1])
+        return float(np.sum((self.mfcc[:, :frames]
+                             - self.target_mfcc[:, :frames])**2))
+
+    def record(self):
+        self.recorder.record(1, 0.0, self.params, self.params)
+        self.recorder.flush()
+
+    def checkpoint(self):
+        save_checkpoint(self.checkpoint_file,
+                        dict(counter=1, current_sum_of_squares=0.0,
+                             current_VTP_1=self.params,
+                             current_VTP_2=self.params))
+
+    def synth_block(self):
+        self.vtl.synth_block(self.tract, self.glottis, self.frame_rate)
+
+    def transfer_function(self):
+        self.vtl.get_transfer_function(self.params_a)
+
+    def end_to_end(self):
+        self.update_speaker_file()
+        self.ges_to_wav()
+        self.fix_header()
+        self.mfcc = self.get_MFCC()
+        return self.sum_of_squares()
+
+    def stages(self):
+        '''
+        Returns the list of :class:`Stage`\\ s.
+
+        '''
+        return [Stage('update_speaker_file', self.update_speaker_file, 200),
+                Stage('vtlGesToWav', self.ges_to_wav, 5),
+                Stage('vtlGesToWav_hallo', self.ges_to_wav_hallo, 3),
+                Stage('fix_header', self.fix_header, 200,
+                      self.restore_header),
+                Stage('read_wav', self.read_wav, 200),
+                Stage('get_MFCC', self.get_MFCC, 100),
+                Stage('sum_of_squares', self.sum_of_squares, 1000),
+                Stage('record', self.record, 1000),
+                Stage('checkpoint', self.checkpoint, 100),
+                Stage('vtlSynthBlock', self.synth_block, 3),
+                Stage('vtlGetTransferFunction', self.transfer_function, 100),
+                Stage('end_to_end', self.end_to_end, 5)]
+
+    def close(self):
+        self.recorder.close()
+        self.vtl.close()
+        shutil.rmtree(self.scratch_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def run(names=None, repeat=None, root=ROOT, library_path=None):
+    '''
+    Runs the stages ``names`` (default: all) and returns the results as a
+    dict with the ``environment`` and the summary of every stage.
+
+    '''
+    results = collections.OrderedDict()
+    with PipelineStages(root, library_path) as pipeline:
+        version = pipeline.ges_vtl.version
+        stages = pipeline.stages()
+        if names is not None:
+            unknown = sorted(set(names) - set(stage.name for stage in stages))
+            if unknown:
+                raise ValueError('Unknown stages: %s (available: %s)'
+                                 % (', '.join(unknown), ', '.join(
+                                     stage.name for stage in stages)))
+        for stage in stages:
+            if names is None or stage.name in names:
+                results[stage.name] = summarize(time_stage(stage, repeat))
+    environment = dict(python=platform.python_version(),
+                       numpy=np.__version__, platform=platform.platform(),
+                       processor=platform.processor(), library=version,
+                       time=time.strftime('%Y-%m-%dT%H:%M:%S'))
+    return dict(environment=environment, stages=results)
+
+
+def compare(results, baseline, threshold=0.2, statistic='p50',
+            min_delta=50e-6):
+    '''
+    Returns the regressions of ``results`` against ``baseline``: a list of
+    ``(stage, baseline, current, ratio)`` for every stage whose
+    ``statistic`` grew by more than ``threshold`` (relative) and by more
+    than ``min_delta`` seconds.
+
+    '''
+    regressions = []
+    for name, summary in results['stages'].items():
+        reference = baseline['stages'].get(name)
+        if reference is None:
+            continue
+        if summary[statistic] - reference[statistic] <= min_delta:
+            continue
+        ratio = summary[statistic] / reference[statistic]
+        if ratio > 1 + threshold:
+            regressions.append((name, reference[statistic],
+                                summary[statistic], ratio))
+    return regressions
+
+
+def _write_json(file_name, data):
+    with open(file_name, 'w') as file_:
+        json.dump(data, file_, indent=2)
+        file_.write('\n')
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description='Time the stages of the training pipeline.')
+    parser.add_argument('stages', nargs='*',
+                        help='stages to run (default: all)')
+    parser.add_argument('-n', '--repeat', type=int, default=None,
+                        help='timed calls per stage (default: per stage)')
+    parser.add_argument('-o', '--output', default='benchmark.json',
+                        help='JSON file of the results')
+    parser.add_argument('--baseline', default=None,
+                        help='JSON results to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed relative growth of the median latency')
+    parser.add_argument('--min-delta', type=float, default=50e-6,
+                        help='growth of the median latency in seconds below '
+                        'which a stage is never a regression')
+    parser.add_argument('--save-baseline', default=None,
+                        help='also write the results to this baseline file')
+    parser.add_argument('--library', default=None,
+                        help='VocalTractLab binary')
+    options = parser.parse_args(args)
+
+    try:
+        results = run(options.stages or None, options.repeat,
+                      library_path=options.library)
+    except ValueError as error:
+        parser.error(str(error))
+    _write_json(options.output, results)
+    for name, summary in results['stages'].items():
+        print('%-24s p50 %10.6f s  p90 %10.6f s  p99 %10.6f s  %10.1f /s'
+              % (name, summary['p50'], summary['p90'], summary['p99'],
+                 summary['throughput']))
+    if options.save_baseline is not None:
+        _write_json(options.save_baseline, results)
+
+    if options.baseline is None:
+        return 0
+    with open(options.baseline) as file_:
+        baseline = json.load(file_)
+    regressions = compare(results, baseline, options.threshold,
+                          min_delta=options.min_delta)
+    for name, reference, current, ratio in regressions:
+        print('Regression: %s: median %.6f s -> %.6f s (x%.2f)'
+              % (name, reference, current, ratio), file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
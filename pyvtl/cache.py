@@ -0,0 +1,149 @@
+'''
+Content-addressed on-disk cache for feature arrays.
+
+Features of target recordings and reference files are stored as ``.npy``
+files whose name is derived from the hash of the file content and of the
+full feature configuration. Every run after the first one loads them as a
+memory-mapped array instead of recomputing them. The cache directory is
+bounded in size; the least recently used entries are evicted first.
+
+Example::
+
+    cache = FeatureCache()
+    target_mfcc = cache.get('banane-orig.wav', get_MFCC, {'feature': 'mfcc'})
+
+'''
+
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'PYVTL_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'pyvtl'))
+
+
+def file_hash(file_name, block_size=1 << 20):
+    '''
+    Returns the sha256 hex digest of the content of ``file_name``.
+
+    '''
+    digest = hashlib.sha256()
+    with open(file_name, 'rb') as file_:
+        for block in iter(lambda: file_.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def config_hash(config):
+    '''
+    Returns the sha256 hex digest of a JSON serializable configuration.
+
+    '''
+    text = json.dumps(config, sort_keys=True, default=repr)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class FeatureCache(object):
+    '''
+    Size-bounded LRU cache of feature arrays in ``directory``.
+
+    Parameters:
+
+    * directory -- cache directory (default: ``$PYVTL_CACHE`` or
+      ``~/.cache/pyvtl``)
+    * max_bytes -- total size of the cached arrays after which the least
+      recently used ones are removed
+
+    '''
+
+    def __init__(self, directory=None, max_bytes=256 * 2**20):
+        if directory is None:
+            directory = os.path.join(DEFAULT_CACHE_DIR, 'features')
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, file_name, config):
+        '''
+        Returns the cache key of the features of ``file_name`` computed with
+        ``config``.
+
+        '''
+        return '%s-%s' % (file_hash(file_name)[:32], config_hash(config)[:16])
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.npy')
+
+    def get(self, file_name, compute, config):
+        '''
+        Returns the features of ``file_name`` for ``config``. On a miss they
+        are computed with ``compute(file_name)`` and stored; on a hit the
+        stored array is memory-mapped read-only.
+
+        '''
+        path = self.path(self.key(file_name, config))
+        try:
+            features = np.load(path, mmap_mode='r')
+        except (IOError, ValueError):
+            features = None
+        if features is not None:
+            os.utime(path)  # mark as recently used
+            return features
+
+        features = np.asarray(compute(file_name))
+        self.put(path, features)
+        return features
+
+    def put(self, path, features):
+        '''
+        Stores ``features`` atomically at ``path`` and evicts old entries.
+
+        '''
+        file_, temporary = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(file_, 'wb') as stream:
+                np.save(stream, features)
+            os.replace(temporary, path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+        self.evict()
+
+    def evict(self):
+        '''
+        Removes the least recently used entries until the cache is no larger
+        than ``max_bytes``.
+
+        '''
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.npy'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        entries.sort()
+        total = sum(size for __, size, __ in entries)
+        for __, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        '''
+        Removes all cached arrays.
+
+        '''
+        for name in os.listdir(self.directory):
+            if name.endswith('.npy'):
+                os.remove(os.path.join(self.directory, name))
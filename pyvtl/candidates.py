@@ -0,0 +1,127 @@
+'''
+Vectorized generation of random candidate vocal tract parameters.
+
+A :class:`CandidateGenerator` draws a whole N x 24 candidate matrix from a
+seeded ``np.random.Generator``: every parameter uniformly over its range in
+``VTP_max_min``, except the parameters that are coupled to others by the
+articulatory constraints.
+
+The constraints are declared as a list of :class:`Coupling` entries and
+applied in order, each as one array operation over all candidates. A coupled
+parameter follows the change of its driver relative to the current VTP::
+
+    new[target] = clip(current[target] * resistance
+                       + (new[driver] - current[driver]) * rate)
+
+and is clipped to its range. The default couplings are those of the nanana
+training: whenever the tongue blade (TBX/TBY) moves, tongue body (TCX/TCY)
+and tongue tip (TTX/TTY) follow by 20 % with 1 % resistance, and the velum
+opening (VO) follows the new tongue body height (TCY) the same way.
+
+'''
+
+import collections
+
+import numpy as np
+
+from .checkpoint import generator_state, set_generator_state
+from .parameters import VTP_NAMES, VTP_max_min
+
+
+Coupling = collections.namedtuple('Coupling',
+                                  ['target', 'driver', 'rate', 'resistance'])
+Coupling.__new__.__defaults__ = (0.2, 0.99)
+
+
+# Constraints1: tongue tip and tongue body follow the tongue blade
+# Constraints2: velum opening follows the tongue body; applied after the
+#   tongue constraints, so VO follows the already constrained TCY
+TONGUE_VELUM_COUPLINGS = [Coupling('TCX', 'TBX'),
+                          Coupling('TCY', 'TBY'),
+                          Coupling('TTX', 'TBX'),
+                          Coupling('TTY', 'TBY'),
+                          Coupling('VO', 'TCY')]
+
+
+class CandidateGenerator(object):
+    '''
+    Draws batches of random candidates with articulatory constraints.
+
+    Parameters:
+
+    * couplings -- list of :class:`Coupling` (default: the tongue and velum
+      constraints of the nanana training)
+    * ranges -- [min, max] row per parameter (default: ``VTP_max_min``)
+    * names -- parameter names used in the couplings (default: ``VTP_NAMES``)
+    * seed -- seed of the random generator, or a ``np.random.Generator``
+
+    '''
+
+    def __init__(self, couplings=TONGUE_VELUM_COUPLINGS, ranges=VTP_max_min,
+                 names=VTP_NAMES, seed=None):
+        ranges = np.asarray(ranges, dtype=float)
+        self.lower = ranges.min(axis=1)
+        self.upper = ranges.max(axis=1)
+        self.random = np.random.default_rng(seed)
+        self.couplings = list(couplings)
+        self._compile(names)
+
+    def _compile(self, names):
+        index = dict((name, position) for position, name in enumerate(names))
+        # (target, driver, rate, resistance) as indices and floats
+        self._operations = []
+        for coupling in self.couplings:
+            try:
+                target = index[coupling.target]
+                driver = index[coupling.driver]
+            except KeyError as error:
+                raise ValueError('Unknown parameter %s in coupling %r'
+                                 % (error, coupling))
+            self._operations.append((target, driver, float(coupling.rate),
+                                     float(coupling.resistance)))
+
+    def uniform(self, number):
+        '''
+        Returns ``number`` candidates with every parameter uniformly
+        distributed over its range, without constraints.
+
+        '''
+        unit = self.random.random((number, len(self.lower)))
+        return self.lower + unit * (self.upper - self.lower)
+
+    def constrain(self, candidates, current):
+        '''
+        Applies the couplings to ``candidates`` (N x parameters, modified in
+        place) relative to the ``current`` VTP and returns them.
+
+        '''
+        current = np.asarray(current, dtype=float)
+        for target, driver, rate, resistance in self._operations:
+            change = candidates[:, driver] - current[driver]
+            candidates[:, target] = np.clip(
+                current[target] * resistance + change * rate,
+                self.lower[target], self.upper[target])
+        return candidates
+
+    def generate(self, current, number=1):
+        '''
+        Returns ``number`` random candidates (number x parameters) around the
+        ``current`` VTP.
+
+        '''
+        return self.constrain(self.uniform(number), current)
+
+    def state(self):
+        '''
+        Returns the state of the random generator, see
+        :func:`pyvtl.checkpoint.generator_state`.
+
+        '''
+        return generator_state(self.random)
+
+    def set_state(self, state):
+        '''
+        Continues the random sequence from a :meth:`state`.
+
+        '''
+        set_generator_state(self.random, state)
@@ -0,0 +1,94 @@
+'''
+Crash-safe checkpoints of the state of a training run.
+
+A checkpoint holds everything a search needs to continue where it stopped:
+the current parameter vectors, the current sum of squares, the iteration
+counter and the state of the random generators. :func:`save_checkpoint`
+writes it to a temporary file in the same directory and renames it over the
+previous checkpoint, so a run that is killed at any time leaves either the
+old or the new checkpoint behind, never a partial one.
+
+Arrays are stored as they are; numbers, strings, lists and dicts (e.g. the
+state of a ``np.random.Generator``, see :func:`generator_state`) are stored
+as JSON. Both are returned by :func:`load_checkpoint` in one dict.
+
+Example::
+
+    save_checkpoint('nanana.checkpoint.npz', dict(
+        counter=counter, current_sum_of_squares=current_sum_of_squares,
+        current_VTP_1=current_VTP_1, current_VTP_2=current_VTP_2,
+        generator=generator.state()))
+    ...
+    state = load_checkpoint('nanana.checkpoint.npz')
+    generator.set_state(state['generator'])
+
+'''
+
+import json
+import os
+import tempfile
+
+import numpy as np
+
+
+_JSON_KEY = '__json__'
+
+
+def generator_state(random):
+    '''
+    Returns the state of the ``np.random.Generator`` ``random`` as a JSON
+    serializable dict.
+
+    '''
+    return random.bit_generator.state
+
+
+def set_generator_state(random, state):
+    '''
+    Restores the state of the ``np.random.Generator`` ``random`` from
+    :func:`generator_state`.
+
+    '''
+    random.bit_generator.state = state
+
+
+def save_checkpoint(checkpoint_file, state):
+    '''
+    Writes the dict ``state`` atomically to ``checkpoint_file`` (a ``.npz``
+    file).
+
+    '''
+    arrays = dict()
+    values = dict()
+    for key, value in state.items():
+        if isinstance(value, np.ndarray):
+            arrays[key] = value
+        elif isinstance(value, np.generic):
+            values[key] = value.item()
+        else:
+            values[key] = value
+    arrays[_JSON_KEY] = np.array(json.dumps(values))
+
+    directory = os.path.dirname(os.path.abspath(checkpoint_file))
+    file_, temporary = tempfile.mkstemp(suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(file_, 'wb') as stream:
+            np.savez(stream, **arrays)
+            stream.flush()
+            os.fsync(stream.fileno())
+        os.replace(temporary, checkpoint_file)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def load_checkpoint(checkpoint_file):
+    '''
+    Returns the state dict saved with :func:`save_checkpoint`.
+
+    '''
+    with np.load(checkpoint_file) as data:
+        state = dict((key, data[key]) for key in data.files
+                     if key != _JSON_KEY)
+        state.update(json.loads(str(data[_JSON_KEY])))
+    return state
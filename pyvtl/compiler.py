@@ -0,0 +1,627 @@
+'''
+Compiling gestural scores into parameter sequences for ``vtlSynthBlock``.
+
+``vtlGesToWav`` reads the speaker and the gestural score from disk, writes
+a wav file (with a broken header) and a feedback file, and the features are
+computed from the file read back. A :class:`ScoreCompiler` turns a parsed
+:class:`pyvtl.gestures.GesturalScore` into tract and glottis parameter
+matrices (frames x params) at ``frame_rate``, which are synthesized in memory
+with :meth:`pyvtl.api.VocalTractLab.synth_block`.
+
+The compiler follows the model of VocalTractLab 2.1, simplified:
+
+* every tier moves by target approximation
+  (:func:`pyvtl.trajectory.target_approximation` of ``TARGET_ORDER`` with
+  the time constant of every gesture), and frame ``i`` is synthesized with
+  the score at ``i / frame_rate + SCORE_LEAD``
+* the vowel tier moves the tract from shape to shape; neutral gestures aim
+  at the neutral tract
+* every consonant tier (lips, tongue tip, tongue body) has an activation
+  that approaches 1 during its gestures and 0 during neutral ones and after
+  the end of the tier; the tract moves from the vowel towards the consonant
+  shape by the activation times the dominance of the shape's parameters.
+  The consonant shape is the one named by the gesture or its variant in
+  the context (``'(a)'``, ``'(i)'`` or ``'(u)'``) of the closest of these
+  vowels; as in VocalTractLab, gestures without such a shape (e.g. the
+  ``'-clo'`` gestures with the JD2 speaker) are neutral
+* the velic tier moves the velum opening (``VO``) from the one of the tract
+  towards the value of its gestures by their activation
+* the glottal shape tier moves between the glottis shapes of the selected
+  glottis model; the F0 tier (semitones above C0, targets rising by their
+  slope to their value at the end of the gesture) and the lung pressure
+  tier (Pa) set F0 and the subglottal pressure
+
+All steps are linear in the tract shapes, so a :class:`CompiledScore` keeps
+the weights of every shape and computes the tract parameters for other
+shape parameters (e.g. the candidates of the nanana training) with one sum,
+without a speaker file (:class:`CompiledEvaluator` evaluates candidates
+this way). :func:`validate` compares the synthesis of a compiled score with
+the one of ``vtlGesToWav``; the simplified model does not reproduce it
+exactly, and the command line fails when the MFCC distance, the envelope
+correlation or the duration are off by more than the tolerances. As with
+``vtlGesToWav``, the noise sources of the synthesizer are random and the
+first synthesis of a library copy differs from the later ones, so repeated
+syntheses of a candidate differ.
+
+Example::
+
+    with VocalTractLab(speaker_file='JD2.speaker', private=True) as vtl:
+        compiler = ScoreCompiler(vtl)
+        compiled = compiler.compile(read_gestural_score('banane.ges'))
+        signal = compiled.synthesize(vtl, {'a': params_a})
+        print(validate(compiler, 'banane.ges'))
+
+or from the command line::
+
+    python -m pyvtl.compiler banane.ges --output compiled.wav
+
+'''
+
+import argparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import scipy.io.wavfile
+
+from . import api, audio, features, wav
+from .dtw import BandedDTW
+from .gestures import read_gestural_score
+from .speaker import SpeakerTemplate, default_shapes
+from .trajectory import (F0_INDEX, PRESSURE_INDEX, PRESSURE_ONSET,
+                         target_approximation)
+
+
+VOWEL_TIER = 'vowel-gestures'
+CONSONANT_TIERS = ('lip-gestures', 'tongue-tip-gestures',
+                   'tongue-body-gestures')
+VELIC_TIER = 'velic-gestures'
+GLOTTAL_TIER = 'glottal-shape-gestures'
+F0_TIER = 'f0-gestures'
+PRESSURE_TIER = 'lung-pressure-gestures'
+
+# frequency (Hz) of 0 semitones in the F0 tier (C0)
+F0_REFERENCE = 16.351597831287414
+# vowels whose contexts the consonant shapes are defined in
+CONTEXT_VOWELS = ('a', 'i', 'u')
+# order of the critically damped systems of all tiers (as in VocalTractLab)
+TARGET_ORDER = 5
+# VocalTractLab synthesizes frame i with the score at time
+# i / frame_rate + SCORE_LEAD (seconds), as its feedback file shows
+SCORE_LEAD = 0.01
+# largest accepted MFCC DTW distance per frame between the compiled
+# synthesis and vtlGesToWav: the example scores stay below 1200, while a
+# schwa in place of the /a/ of banane.ges gives about 10000
+MAX_FRAME_DISTANCE = 2000.0
+VELUM_PARAM = 'VO'
+
+_SELECTED_GLOTTIS = re.compile(r'<glottis_model\b[^>]*\bselected="1"[^>]*>')
+_TYPE = re.compile(r'\btype="([^"]*)"')
+
+
+def _keys(starts, durations, targets, time_constants):
+    # key times, values and time constants for target_approximation: the
+    # target of every gesture is approached until its end, from rest at
+    # the first target
+    ends = starts + durations
+    times = np.concatenate([[0.0], ends])
+    values = np.concatenate([targets[:1], targets])
+    return times, values, np.concatenate([time_constants[:1], time_constants])
+
+
+def _approach(starts, durations, targets, time_constants, frame_times,
+              after=None, slopes=None):
+    # trajectories of the targets at frame_times; after the last gesture
+    # the target after is approached if given (else the last one is kept)
+    if len(targets) == 0:
+        return None
+    if slopes is not None:
+        slopes = np.concatenate([[0.0], slopes])
+    if after is not None:
+        end = starts[-1] + durations[-1]
+        starts = np.append(starts, end)
+        durations = np.append(durations, max(frame_times[-1] - end, 0.0))
+        targets = np.append(targets, after)
+        time_constants = np.append(time_constants, time_constants[-1])
+        if slopes is not None:
+            slopes = np.append(slopes, 0.0)
+    times, values, time_constants = _keys(starts, durations, targets,
+                                          time_constants)
+    return target_approximation(times, values.reshape(len(values), -1),
+                                frame_times, time_constants, TARGET_ORDER,
+                                slopes).reshape(
+                                    (len(frame_times),) + targets.shape[1:])
+
+
+def _steps(sequence, frame_times):
+    # index of the gesture of every frame (the last one after the end)
+    ends = np.cumsum(sequence.duration)
+    return np.minimum(np.searchsorted(ends, frame_times, side='right'),
+                      len(sequence) - 1)
+
+
+class CompiledScore(object):
+    '''
+    Tract and glottis parameters of a compiled gestural score.
+
+    The tract parameters are ``sum(weights[b] * basis[b])`` over the
+    ``basis`` vectors: a vector of ones (b = 0) and the tract shapes
+    ``shape_names`` (b > 0).
+
+    '''
+
+    def __init__(self, weights, shape_names, shapes, glottis, frame_rate,
+                 tract_min=None, tract_max=None):
+        self.weights = weights  # frames x basis x params
+        self.shape_names = list(shape_names)
+        self.shapes = dict(shapes)  # tract parameters of the speaker
+        self.glottis = glottis
+        self.frame_rate = frame_rate
+        self.tract_min = tract_min
+        self.tract_max = tract_max
+
+    @property
+    def number_frames(self):
+        return len(self.glottis)
+
+    def basis(self, shapes=None):
+        '''
+        Returns the basis vectors with the tract parameters of the dict
+        ``shapes`` (shape name -> vector) replacing those of the speaker; a
+        vector shorter than the number of parameters only replaces the
+        leading ones. Raises KeyError for shapes the score does not use.
+
+        '''
+        unknown = set(shapes or ()).difference(self.shape_names)
+        if unknown:
+            raise KeyError('Shapes not used by the score: %s (used: %s)'
+                           % (', '.join(sorted(unknown)),
+                              ', '.join(self.shape_names)))
+        basis = np.empty(self.weights.shape[1:])
+        basis[0] = 1.0
+        for number, name in enumerate(self.shape_names, 1):
+            basis[number] = self.shapes[name]
+            if shapes is not None and name in shapes:
+                vector = np.asarray(shapes[name], dtype=float)[:basis.shape[1]]
+                basis[number, :len(vector)] = vector
+        return basis
+
+    def tract_params(self, shapes=None):
+        '''
+        Returns the tract parameters (frames x params), see :meth:`basis`.
+
+        '''
+        tract = np.einsum('fbp,bp->fp', self.weights, self.basis(shapes))
+        if self.tract_min is not None:
+            np.clip(tract, self.tract_min, self.tract_max, out=tract)
+        return tract
+
+    def synthesize(self, vtl, shapes=None):
+        '''
+        Returns the audio signal synthesized by ``vtl`` (at
+        ``vtl.audio_sampling_rate``), cut to the duration of the frames.
+
+        '''
+        signal = vtl.synth_block(self.tract_params(shapes), self.glottis,
+                                 self.frame_rate)[0]
+        number_samples = int(round(self.number_frames / self.frame_rate
+                                   * vtl.audio_sampling_rate))
+        return signal[:number_samples]
+
+
+class ScoreCompiler(object):
+    '''
+    Compiles gestural scores for the speaker of ``vtl``.
+
+    Parameters:
+
+    * vtl -- initialized :class:`pyvtl.api.VocalTractLab`
+    * frame_rate -- frames per second
+    * speaker_file -- speaker file of the glottis shapes and the dominance
+      of the consonant shapes (default: the one of ``vtl``)
+
+    '''
+
+    def __init__(self, vtl, frame_rate=200.0, speaker_file=None):
+        self.vtl = vtl
+        self.frame_rate = frame_rate
+        self.template = SpeakerTemplate(speaker_file or vtl.speaker_file)
+        match = _SELECTED_GLOTTIS.search(self.template.text)
+        if match is None:
+            raise ValueError('No glottis model selected in the speaker file')
+        self.glottis_model = _TYPE.search(match.group(0)).group(1)
+        self.velum = vtl.tract_param_names.index(VELUM_PARAM)
+        self._shapes = dict()
+
+    def tract_shape(self, name):
+        '''
+        Returns the tract parameters of the shape ``name`` of the speaker
+        (``vtlGetTractParams``).
+
+        '''
+        if name not in self._shapes:
+            self._shapes[name] = self.vtl.get_tract_params(name)
+        return self._shapes[name]
+
+    def glottis_shape(self, name):
+        '''
+        Returns the glottis parameters of the shape ``name`` of the selected
+        glottis model.
+
+        '''
+        return self.template.get_params('%s/%s' % (self.glottis_model, name))
+
+    def consonant_shape(self, value, vowel):
+        '''
+        Returns the name of the tract shape of the consonant gesture
+        ``value`` next to the vowel parameters ``vowel``: the shape
+        ``value`` or, in the context of the closest of ``CONTEXT_VOWELS``,
+        ``'value(context)'``. Returns None if the speaker has neither.
+
+        '''
+        if value in self.template.shapes:
+            return value
+        contexts = [context for context in CONTEXT_VOWELS
+                    if '%s(%s)' % (value, context) in self.template.shapes]
+        if not contexts:
+            return None
+        distances = [np.sum((vowel - self.tract_shape(context))**2)
+                     for context in contexts]
+        return '%s(%s)' % (value, contexts[int(np.argmin(distances))])
+
+    def frame_times(self, duration):
+        '''
+        Returns the score times of the frames of a score of ``duration``
+        seconds.
+
+        '''
+        return (np.arange(int(np.ceil(duration * self.frame_rate)))
+                / self.frame_rate + SCORE_LEAD)
+
+    def compile(self, score):
+        '''
+        Returns the :class:`CompiledScore` of the
+        :class:`pyvtl.gestures.GesturalScore` ``score``.
+
+        '''
+        frame_times = self.frame_times(score.duration)
+        number_params = self.vtl.number_vocal_tract_parameters
+        names = []
+
+        def coefficients(shape):
+            # basis coefficients (basis x params) of a tract shape name or
+            # of constant parameters
+            if isinstance(shape, str):
+                if shape not in names:
+                    names.append(shape)
+                    self.tract_shape(shape)
+                return ('shape', names.index(shape))
+            return ('constant', np.asarray(shape, dtype=float))
+
+        def matrix(entries):
+            # gestures x basis x params from coefficients()
+            result = np.zeros((len(entries), len(names) + 1, number_params))
+            for number, (kind, entry) in enumerate(entries):
+                if kind == 'shape':
+                    result[number, entry + 1] = 1.0
+                else:
+                    result[number, 0] = entry
+            return result
+
+        tiers = dict((sequence.type, sequence) for sequence in score.sequences)
+        vowels = tiers.get(VOWEL_TIER)
+        if vowels is None or len(vowels) == 0:
+            vowel_entries = [coefficients(self.vtl.tract_param_neutral)]
+            vowel_tier = None
+        else:
+            vowel_entries = [coefficients(self.vtl.tract_param_neutral
+                                          if neutral or not value else value)
+                             for value, neutral in zip(vowels.value,
+                                                       vowels.neutral)]
+            vowel_tier = vowels
+
+        velic = tiers.get(VELIC_TIER)
+        consonants = []
+        for tier in CONSONANT_TIERS:
+            sequence = tiers.get(tier)
+            if sequence is None or len(sequence) == 0:
+                continue
+            middles = sequence.start + sequence.duration / 2
+            # like VocalTractLab, gestures without a shape of the speaker
+            # are neutral
+            shapes = [None if neutral or not value else self.consonant_shape(
+                value, self._vowel_at(vowel_tier, vowel_entries, middle,
+                                      names))
+                      for value, neutral, middle in zip(
+                          sequence.value, sequence.neutral, middles)]
+            active = np.array([shape is not None for shape in shapes])
+            if not active.any():
+                continue
+            entries = []
+            dominance = []
+            for number in range(len(sequence)):
+                # neutral gestures keep the closest active consonant, so
+                # that only the activation changes
+                source = number if active[number] else int(np.argmin(
+                    np.where(active, np.abs(middles - middles[number]),
+                             np.inf)))
+                shape = shapes[source]
+                entries.append(coefficients(shape))
+                dominance.append(self.template.get_dominance(shape))
+            consonants.append((sequence, active, entries,
+                               np.array(dominance)))
+
+        # the basis is complete: compute the trajectories
+        if vowel_tier is None:
+            weights = np.repeat(matrix(vowel_entries), len(frame_times),
+                                axis=0)
+        else:
+            weights = _approach(vowel_tier.start, vowel_tier.duration,
+                                matrix(vowel_entries),
+                                vowel_tier.time_constant, frame_times)
+        for sequence, active, entries, dominance in consonants:
+            starts, durations = sequence.start, sequence.duration
+            activation = _approach(starts, durations, active.astype(float),
+                                   sequence.time_constant, frame_times, 0.0)
+            consonant = _approach(starts, durations, matrix(entries),
+                                  sequence.time_constant, frame_times)
+            factor = (activation[:, np.newaxis]
+                      * dominance[_steps(sequence, frame_times)])
+            weights += factor[:, np.newaxis, :] * (consonant - weights)
+        if velic is not None and len(velic) > 0 and not velic.neutral.all():
+            active = velic.neutral == 0
+            activation = _approach(velic.start, velic.duration,
+                                   active.astype(float), velic.time_constant,
+                                   frame_times, 0.0)
+            # neutral gestures keep the opening of the closest active one
+            middles = velic.start + velic.duration / 2
+            closest = [number if active[number] else int(np.argmin(
+                np.where(active, np.abs(middles - middles[number]), np.inf)))
+                       for number in range(len(velic))]
+            opening = _approach(velic.start, velic.duration,
+                                velic.value[closest], velic.time_constant,
+                                frame_times)
+            velum = weights[:, :, self.velum]
+            velum *= (1 - activation)[:, np.newaxis]
+            velum[:, 0] += activation * opening
+
+        shapes = dict((name, self.tract_shape(name)) for name in names)
+        return CompiledScore(weights, names, shapes,
+                             self.glottis(tiers, frame_times),
+                             self.frame_rate, self.vtl.tract_param_min,
+                             self.vtl.tract_param_max)
+
+    def _vowel_at(self, vowel_tier, vowel_entries, time, names):
+        # tract parameters of the vowel target at time
+        if vowel_tier is None:
+            kind, entry = vowel_entries[0]
+        else:
+            ends = np.cumsum(vowel_tier.duration)
+            number = min(int(np.searchsorted(ends, time, side='right')),
+                         len(vowel_entries) - 1)
+            kind, entry = vowel_entries[number]
+        if kind == 'shape':
+            return self.tract_shape(names[entry])
+        return entry
+
+    def glottis(self, tiers, frame_times):
+        '''
+        Returns the glottis parameters (frames x params) of the glottal
+        shape, F0 and lung pressure tiers (dict of sequences by type).
+
+        '''
+        neutral = self.vtl.glottis_param_neutral
+        shapes = tiers.get(GLOTTAL_TIER)
+        if shapes is None or len(shapes) == 0:
+            glottis = np.tile(neutral, (len(frame_times), 1))
+        else:
+            targets = np.array([neutral if flag or not value
+                                else self.glottis_shape(value)
+                                for value, flag in zip(shapes.value,
+                                                       shapes.neutral)])
+            glottis = _approach(shapes.start, shapes.duration, targets,
+                                shapes.time_constant, frame_times)
+
+        f0 = tiers.get(F0_TIER)
+        if f0 is not None and len(f0) > 0:
+            glottis[:, F0_INDEX] = F0_REFERENCE * 2**(_approach(
+                f0.start, f0.duration, f0.value, f0.time_constant,
+                frame_times, slopes=f0.slope) / 12.0)
+        pressure = tiers.get(PRESSURE_TIER)
+        if pressure is not None and len(pressure) > 0:
+            glottis[:, PRESSURE_INDEX] = _approach(
+                pressure.start, pressure.duration, pressure.value,
+                pressure.time_constant, frame_times)
+        onset = min(len(PRESSURE_ONSET), len(frame_times))
+        glottis[:onset, PRESSURE_INDEX] *= PRESSURE_ONSET[:onset]
+        return np.clip(glottis, self.vtl.glottis_param_min,
+                       self.vtl.glottis_param_max)
+
+
+class CompiledEvaluator(object):
+    '''
+    Evaluates candidate parameter pairs on a compiled score in memory, like
+    :meth:`pyvtl.parallel.ProcessPoolEvaluator.evaluate` but without speaker,
+    gesture or wav files: the candidates replace the tract shapes
+    ``shape_names`` (default: those of :func:`pyvtl.speaker.default_shapes`)
+    and the synthesis of ``vtl`` is compared with ``target_mfcc``.
+
+    Parameters:
+
+    * band -- score with the banded DTW distance (see :mod:`pyvtl.dtw`)
+      instead of the sum of squares over the common frames
+
+    Raises KeyError if the score does not use one of ``shape_names`` (see
+    :meth:`CompiledScore.basis`): VocalTractLab ignores consonant gestures
+    without a shape of the speaker, so e.g. the /n/ shape of the nanana
+    training has no effect on banane.ges.
+
+    The objective values are not comparable with those of a
+    :class:`pyvtl.parallel.ProcessPoolEvaluator`: the compiled synthesis
+    only approximates ``vtlGesToWav`` (see :func:`validate`), so do not mix
+    the scores of the two evaluators in one search or against one best
+    value.
+
+    '''
+
+    def __init__(self, vtl, compiled, target_mfcc, shape_names=None,
+                 band=None):
+        if shape_names is None:
+            shape_names = default_shapes(SpeakerTemplate(vtl.speaker_file))
+        unknown = [name for name in shape_names
+                   if name not in compiled.shape_names]
+        if unknown:
+            raise KeyError('Shapes not used by the score: %s (used: %s)'
+                           % (', '.join(unknown),
+                              ', '.join(compiled.shape_names)))
+        self.vtl = vtl
+        self.compiled = compiled
+        self.target_mfcc = np.asarray(target_mfcc)
+        self.shape_names = list(shape_names)
+        self.dtw = None if band is None else BandedDTW(self.target_mfcc, band)
+
+    def evaluate(self, *params):
+        '''
+        Returns the objective values of the candidates ``zip(*params)``, one
+        parameter matrix per shape.
+
+        '''
+        values = []
+        for vectors in zip(*params):
+            signal = self.compiled.synthesize(
+                self.vtl, dict(zip(self.shape_names, vectors)))
+            mfcc = features.signal_MFCC(signal, self.vtl.audio_sampling_rate)
+            if self.dtw is not None:
+                values.append(self.dtw.distance(mfcc))
+                continue
+            frames = min(mfcc.shape[1], self.target_mfcc.shape[1])
+            values.append(float(np.sum((mfcc[:, :frames]
+                                        - self.target_mfcc[:, :frames])**2)))
+        return np.array(values)
+
+
+def validate(compiler, gesture_file, library_path=None, shapes=None,
+             band=10, output_file=None, min_correlation=0.6,
+             max_duration_error=0.02, max_frame_distance=MAX_FRAME_DISTANCE):
+    '''
+    Synthesizes ``gesture_file`` with the :class:`ScoreCompiler`
+    ``compiler`` and with ``vtlGesToWav`` (on a fresh copy of the library)
+    and returns a dict comparing the two: the durations (s), the RMS
+    envelope correlation and the MFCC sum of squares (over the common
+    frames) and banded DTW distance between them, also per reference
+    frame. ``shapes`` (shape name -> tract parameters) replace shapes of
+    the speaker in both syntheses. The compiled audio is written to
+    ``output_file`` if given.
+
+    ``passed`` is True if the DTW distance per reference frame is at most
+    ``max_frame_distance``, the envelope correlation is at least
+    ``min_correlation`` and the durations differ by at most
+    ``max_duration_error`` (relative to the reference duration).
+
+    VocalTractLab keeps state between syntheses: only the first one of a
+    library copy is reproducible, so ``compiler`` should be on a fresh copy
+    as well.
+
+    '''
+    scratch_dir = tempfile.mkdtemp(prefix='vtl-compiler-')
+    try:
+        speaker_file = compiler.vtl.speaker_file
+        if shapes:
+            speaker_file = os.path.join(scratch_dir, 'speaker.speaker')
+            compiler.template.write(speaker_file, shapes)
+        wav_file = os.path.join(scratch_dir, 'reference.wav')
+        # a fresh copy: later vtlGesToWav calls on a library differ from the
+        # first one
+        reference_vtl = api.VocalTractLab(library_path, private=True,
+                                          directory=scratch_dir)
+        reference_vtl.ges_to_wav(speaker_file, gesture_file, wav_file)
+        if sys.platform != 'win32':
+            wav.fix_header(wav_file)
+        reference, rate = audio.read_wav(wav_file)
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    compiled = compiler.compile(read_gestural_score(gesture_file))
+    if shapes:
+        shapes = dict((name, vector) for name, vector in shapes.items()
+                      if name in compiled.shape_names)
+    signal = compiled.synthesize(compiler.vtl, shapes)
+    sr = compiler.vtl.audio_sampling_rate
+    if output_file is not None:
+        scipy.io.wavfile.write(output_file, sr, np.asarray(signal,
+                                                           dtype=np.float32))
+    signal = audio.resample(signal, sr, rate)
+
+    mfcc = features.signal_MFCC(signal, rate)
+    reference_mfcc = features.signal_MFCC(reference, rate)
+    frames = min(mfcc.shape[1], reference_mfcc.shape[1])
+    samples = min(len(signal), len(reference))
+    hop = int(rate * 0.010)
+    envelopes = [np.sqrt(np.mean(np.reshape(np.asarray(y[:samples // hop
+                                                          * hop]) ** 2,
+                                            (-1, hop)), axis=1))
+                 for y in (signal, reference)]
+    duration = len(signal) / float(rate)
+    reference_duration = len(reference) / float(rate)
+    correlation = float(np.corrcoef(*envelopes)[0, 1])
+    distance = BandedDTW(reference_mfcc, band).distance(mfcc)
+    frame_distance = distance / reference_mfcc.shape[1]
+    passed = (frame_distance <= max_frame_distance
+              and correlation >= min_correlation
+              and abs(duration - reference_duration)
+              <= max_duration_error * reference_duration)
+    return dict(duration=duration,
+                reference_duration=reference_duration,
+                envelope_correlation=correlation,
+                sum_of_squares=float(np.sum((mfcc[:, :frames]
+                                             - reference_mfcc[:, :frames])**2)),
+                dtw_distance=distance,
+                frame_distance=frame_distance,
+                frames=compiled.number_frames,
+                passed=bool(passed))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description='Compile a gestural score for vtlSynthBlock and compare '
+                    'the synthesis with vtlGesToWav.')
+    parser.add_argument('gesture_file', help='gestural score (.ges)')
+    parser.add_argument('--speaker', default='JD2.speaker',
+                        help='speaker file')
+    parser.add_argument('--frame-rate', type=float, default=200.0,
+                        help='frames per second')
+    parser.add_argument('-o', '--output', default=None,
+                        help='wav file of the compiled synthesis')
+    parser.add_argument('--library', default=None,
+                        help='VocalTractLab binary')
+    parser.add_argument('--max-frame-distance', type=float,
+                        default=MAX_FRAME_DISTANCE,
+                        help='largest accepted DTW distance per frame')
+    parser.add_argument('--min-correlation', type=float, default=0.6,
+                        help='lowest accepted RMS envelope correlation')
+    parser.add_argument('--max-duration-error', type=float, default=0.02,
+                        help='largest accepted relative duration difference')
+    options = parser.parse_args(args)
+
+    scratch_dir = tempfile.mkdtemp(prefix='vtl-compiler-')
+    try:
+        with api.VocalTractLab(options.library, options.speaker, private=True,
+                               directory=scratch_dir) as vtl:
+            report = validate(ScoreCompiler(vtl, options.frame_rate),
+                              options.gesture_file, options.library,
+                              output_file=options.output,
+                              min_correlation=options.min_correlation,
+                              max_duration_error=options.max_duration_error,
+                              max_frame_distance=options.max_frame_distance)
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+    for name, value in report.items():
+        print('%-22s %s' % (name, value))
+    return 0 if report['passed'] else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,164 @@
+'''
+Dynamic time warping distance between MFCC sequences with a Sakoe-Chiba band.
+
+The sum of squares ``np.sum((mfcc - target_mfcc)**2)`` needs equally long
+sequences and punishes a small timing difference like a spectral one. The
+DTW distance is the smallest sum of squared frame distances along a
+monotonic alignment path from the first to the last frames of both
+sequences. Frame ``i`` of a candidate can only be aligned to target frames
+within ``band`` frames of the diagonal ``i * (target frames - 1) /
+(candidate frames - 1)``, so the cost grows with ``T * band`` instead of
+``T**2``. For equally long sequences the diagonal is the sum of squares, so
+the DTW distance is never larger. Sequences whose lengths differ by more
+than a factor of about ``2 * band`` have no path within the band (the
+distance is infinite).
+
+A :class:`BandedDTW` precomputes the target side (frame norms and the target
+frames within the band of every candidate frame) once per candidate length
+and computes the distances of a whole batch of candidates together. Every
+row of the dynamic program is computed at once for all candidates: the
+steps from the previous row are elementwise minima, and the steps within the
+row are a running minimum of prefix sums.
+
+Example::
+
+    dtw = BandedDTW(target_mfcc, band=10)
+    distances = dtw.batch([get_MFCC(name) for name in wav_files])
+    distance, path = dtw.distance(mfcc, path=True)
+
+'''
+
+import numpy as np
+
+
+class BandedDTW(object):
+    '''
+    Banded DTW distances of MFCC matrices (coefficients x frames) to
+    ``target_mfcc``.
+
+    Parameters:
+
+    * band -- half width of the Sakoe-Chiba band in frames
+
+    '''
+
+    def __init__(self, target_mfcc, band=10):
+        if band < 1:
+            raise ValueError('band has to be at least 1, got %r' % band)
+        # frames x coefficients
+        self.target = np.ascontiguousarray(np.asarray(target_mfcc,
+                                                      dtype=np.float64).T)
+        self.target_norms = np.sum(self.target**2, axis=1)
+        self.band = band
+        self._bands = dict()
+
+    def _band(self, number_frames):
+        # first target frame of the band of every candidate frame, and the
+        # target frames and norms within the bands (frames x width [x C])
+        band = self._bands.get(number_frames)
+        if band is None:
+            target_frames = len(self.target)
+            width = min(2 * self.band + 1, target_frames)
+            if number_frames > 1:
+                center = np.rint(np.arange(number_frames) * (target_frames - 1)
+                                 / float(number_frames - 1)).astype(int)
+            else:
+                center = np.zeros(1, dtype=int)
+            start = np.clip(center - self.band, 0, target_frames - width)
+            index = start[:, np.newaxis] + np.arange(width)
+            band = (start, self.target[index], self.target_norms[index])
+            self._bands[number_frames] = band
+        return band
+
+    def local_costs(self, mfccs):
+        '''
+        Returns the squared distances (N x frames x width) between the
+        frames of the candidates ``mfccs`` (N x coefficients x frames) and
+        the target frames within their bands.
+
+        '''
+        frames = np.asarray(mfccs, dtype=np.float64).transpose(0, 2, 1)
+        start, target, target_norms = self._band(frames.shape[1])
+        costs = np.einsum('ntc,twc->ntw', frames, target)
+        costs *= -2
+        costs += np.sum(frames**2, axis=2)[:, :, np.newaxis]
+        costs += target_norms
+        return np.maximum(costs, 0.0)
+
+    def _accumulate(self, costs, keep):
+        # dynamic program over the rows; returns the distances and, with
+        # keep, the accumulated costs of all rows (N x frames x width)
+        number, number_frames, width = costs.shape
+        start = self._band(number_frames)[0]
+        accumulated = np.empty_like(costs) if keep else None
+        inf = np.full((number, 1), np.inf)
+        row = np.cumsum(costs[:, 0], axis=1)  # the band starts at frame 0
+        for i in range(number_frames):
+            if i > 0:
+                shift = start[i] - start[i - 1]
+                # previous row in the columns of this one, padded with inf
+                previous = np.concatenate(
+                    [inf, row, np.full((number, shift), np.inf)], axis=1)
+                vertical = previous[:, 1 + shift:1 + shift + width]
+                diagonal = previous[:, shift:shift + width]
+                entry = np.minimum(vertical, diagonal) + costs[:, i]
+                # horizontal steps: D[j] = min over k <= j of
+                # entry[k] + costs[k + 1] + ... + costs[j]
+                prefix = np.cumsum(costs[:, i], axis=1)
+                row = prefix + np.minimum.accumulate(entry - prefix, axis=1)
+            if keep:
+                accumulated[:, i] = row
+        if start[-1] + width < len(self.target):
+            # the band of a one frame candidate does not reach the last
+            # target frame: no path fits
+            return np.full(number, np.inf), accumulated
+        return row[:, -1], accumulated
+
+    def _path(self, accumulated, start):
+        # backtracking from the last frames of both sequences
+        number_frames, width = accumulated.shape
+        i, w = number_frames - 1, width - 1
+        path = [(i, start[i] + w)]
+        while i > 0 or start[i] + w > 0:
+            j = start[i] + w
+            steps = []
+            if w > 0:
+                steps.append((accumulated[i, w - 1], i, w - 1))
+            if i > 0:
+                for column in (j - 1, j):
+                    k = column - start[i - 1]
+                    if 0 <= k < width:
+                        steps.append((accumulated[i - 1, k], i - 1, k))
+            __, i, w = min(steps)
+            path.append((i, start[i] + w))
+        return np.array(path[::-1])
+
+    def batch(self, mfccs, path=False):
+        '''
+        Returns the DTW distances of the candidates ``mfccs`` (N x
+        coefficients x frames array or list of equally long MFCC matrices);
+        with ``path=True`` also the list of their alignment paths, each an
+        array of ``(candidate frame, target frame)`` rows (empty where no
+        path fits in the band and the distance is infinite).
+
+        '''
+        mfccs = np.asarray(mfccs, dtype=np.float64)
+        costs = self.local_costs(mfccs)
+        distances, accumulated = self._accumulate(costs, path)
+        if not path:
+            return distances
+        start = self._band(costs.shape[1])[0]
+        return distances, [self._path(rows, start) if np.isfinite(distance)
+                           else np.empty((0, 2), dtype=int)
+                           for rows, distance in zip(accumulated, distances)]
+
+    def distance(self, mfcc, path=False):
+        '''
+        Returns the DTW distance of one MFCC matrix (and its alignment path
+        with ``path=True``).
+
+        '''
+        result = self.batch(np.asarray(mfcc)[np.newaxis], path)
+        if not path:
+            return float(result[0])
+        return float(result[0][0]), result[1][0]
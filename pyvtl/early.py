@@ -0,0 +1,211 @@
+'''
+Early-abandoning evaluation of the MFCC sum of squares.
+
+A candidate is only accepted if its sum of squares is below the incumbent,
+so the evaluation can stop as soon as the error is known to exceed it. An
+:class:`EarlyAbandoningObjective` computes the features of a signal block by
+block (``block_frames`` MFCC frames at a time: windowing, FFT and mel
+filterbank) and keeps a lower bound of the sum of squares of the frames
+seen so far; once the bound exceeds the incumbent the candidate is
+abandoned. Candidates that are not abandoned get exactly the sum of squares
+of :func:`pyvtl.features.signal_MFCC`.
+
+The bound works in the log mel domain. With as many coefficients as mel
+bands the DCT is orthonormal, so the sum of squares of the MFCCs equals that
+of the log mel spectra (the target is transformed back once). A log mel
+value of the candidate is only final once the ``top_db`` floor of the whole
+signal is known, but the floor lies between the one of the blocks seen so
+far and the one of the largest possible spectrum of the signal (from its
+peak amplitude), which bounds every value to an interval. The squared
+distance of the target value to that interval is a lower bound of its
+final contribution.
+
+Example::
+
+    objective = EarlyAbandoningObjective(target_mfcc, block_frames=10)
+    result = objective.evaluate(signal, 22050, current_sum_of_squares)
+    if not result.abandoned and result.value < current_sum_of_squares:
+        ...
+    objective.stats.report()
+
+'''
+
+import collections
+
+import numpy as np
+
+from . import audio, features
+
+
+Evaluation = collections.namedtuple('Evaluation', [
+    'value', 'bound', 'abandoned', 'fraction'])
+Evaluation.__doc__ = '''
+Result of :meth:`EarlyAbandoningObjective.evaluate`: the sum of squares
+(infinite if abandoned), the lower bound when the evaluation stopped,
+whether it was abandoned and the fraction of the frames computed.
+'''
+
+
+class AbandonStats(object):
+    '''
+    Counts how early candidates were abandoned.
+
+    Parameters:
+
+    * bins -- number of histogram bins over the fraction of frames computed
+
+    '''
+
+    def __init__(self, bins=10):
+        self.evaluated = 0
+        self.abandoned = 0
+        self.frames = 0.0  # sum of the fractions of frames computed
+        self.histogram = np.zeros(bins, dtype=np.int64)
+
+    def add(self, abandoned, fraction):
+        '''
+        Counts one evaluation that computed ``fraction`` of the frames.
+
+        '''
+        self.evaluated += 1
+        self.frames += fraction
+        if abandoned:
+            self.abandoned += 1
+            bins = len(self.histogram)
+            self.histogram[min(int(fraction * bins), bins - 1)] += 1
+
+    def merge(self, other):
+        '''
+        Adds the counts of the :class:`AbandonStats` ``other``.
+
+        '''
+        self.evaluated += other.evaluated
+        self.abandoned += other.abandoned
+        self.frames += other.frames
+        self.histogram += other.histogram
+
+    def stats(self):
+        '''
+        Returns the counts, the mean fraction of frames computed and the
+        histogram of the fractions of abandoned candidates as a dict.
+
+        '''
+        return dict(evaluated=self.evaluated,
+                    abandoned=self.abandoned,
+                    abandon_rate=(self.abandoned / float(self.evaluated)
+                                  if self.evaluated else 0.0),
+                    mean_fraction=(self.frames / self.evaluated
+                                   if self.evaluated else 0.0),
+                    histogram=self.histogram.tolist())
+
+    def report(self):
+        '''
+        Returns a printable summary of :meth:`stats`.
+
+        '''
+        stats = self.stats()
+        bins = len(self.histogram)
+        lines = ['%(abandoned)i of %(evaluated)i candidates abandoned, '
+                 '%(mean_fraction).3f of the frames computed' % stats]
+        for number, count in enumerate(self.histogram):
+            lines.append('  abandoned after %3i-%3i %% of the frames: %i'
+                         % (100 * number // bins, 100 * (number + 1) // bins,
+                            count))
+        return '\n'.join(lines)
+
+
+class EarlyAbandoningObjective(object):
+    '''
+    MFCC sum of squares against ``target_mfcc`` (coefficients x frames)
+    with early abandoning.
+
+    Parameters:
+
+    * block_frames -- MFCC frames computed per block
+    * native -- compute the features at the rate of the signal, see
+      :func:`pyvtl.features.signal_MFCC`
+
+    '''
+
+    def __init__(self, target_mfcc, block_frames=10, native=False):
+        if block_frames < 1:
+            raise ValueError('block_frames has to be at least 1, got %r'
+                             % block_frames)
+        self.target_mfcc = np.asarray(target_mfcc, dtype=np.float64)
+        self.block_frames = block_frames
+        self.native = native
+        self.stats = AbandonStats()
+        # extractor and target log mel spectrum (frames x bands) by rate
+        self._targets = dict()
+
+    def _target(self, sr):
+        if sr not in self._targets:
+            extractor = (features.native_extractor(sr) if self.native
+                         else features.default_extractor())
+            dct_basis = extractor.dct_basis
+            if dct_basis.shape[0] != dct_basis.shape[1]:
+                raise ValueError('Early abandoning needs as many MFCC '
+                                 'coefficients as mel bands')
+            # the DCT is orthonormal: its inverse is its transpose
+            self._targets[sr] = (extractor,
+                                 (dct_basis.T @ self.target_mfcc).T)
+        return self._targets[sr]
+
+    def evaluate(self, signal, sr, incumbent=np.inf):
+        '''
+        Returns the :class:`Evaluation` of ``signal`` at ``sr`` Hz; the
+        evaluation stops once the sum of squares is known to exceed
+        ``incumbent``.
+
+        '''
+        extractor, target = self._target(sr)
+        signal = np.asarray(signal, dtype=np.float64)
+        if not self.native:
+            signal = audio.resample(signal, sr, extractor.sr)
+        number_frames = extractor.number_frames(len(signal))
+        if number_frames != len(target):
+            raise ValueError('The signal has %i MFCC frames, the target %i'
+                             % (number_frames, len(target)))
+
+        pad = extractor.n_fft // 2
+        padded = np.pad(signal, pad, mode=extractor.pad_mode)
+        frames = np.lib.stride_tricks.sliding_window_view(
+            padded, extractor.n_fft)[::extractor.hop_length]
+        log_mel = np.empty_like(target)
+
+        # largest possible log mel value, from the peak amplitude
+        peak = np.max(np.abs(signal), initial=0.0)
+        largest = (peak * np.sum(np.abs(extractor.window))
+                   * np.max(np.sum(extractor.mel_basis, axis=1)))
+        largest = 10.0 * np.log10(max(extractor.amin, largest))
+        top_db = np.inf if extractor.top_db is None else extractor.top_db
+        highest_floor = largest - top_db
+        maximum = -np.inf
+
+        bound = 0.0
+        for start in range(0, number_frames, self.block_frames):
+            end = min(start + self.block_frames, number_frames)
+            spectrum = np.fft.rfft(frames[start:end] * extractor.window,
+                                   axis=-1)
+            mel = np.abs(spectrum @ extractor.mel_basis.T)
+            block = 10.0 * np.log10(np.maximum(extractor.amin, mel))
+            log_mel[start:end] = block
+            maximum = max(maximum, block.max())
+            # the final value of every element lies in [lower, upper]
+            lower = np.maximum(block, maximum - top_db)
+            upper = np.maximum(block, highest_floor)
+            reference = target[start:end]
+            distance = (np.maximum(lower - reference, 0.0)
+                        + np.maximum(reference - upper, 0.0))
+            bound += float(np.sum(distance**2))
+            if bound > incumbent and end < number_frames:
+                fraction = end / float(number_frames)
+                self.stats.add(True, fraction)
+                return Evaluation(np.inf, bound, True, fraction)
+
+        if extractor.top_db is not None:
+            log_mel = np.maximum(log_mel, maximum - top_db)
+        mfcc = extractor.dct_basis @ log_mel.T
+        value = float(np.sum((mfcc - self.target_mfcc)**2))
+        self.stats.add(False, 1.0)
+        return Evaluation(value, bound, False, 1.0)
@@ -0,0 +1,234 @@
+'''
+Acoustic features used to compare synthesized and target audio.
+
+:func:`get_MFCC` is the feature of the training scripts. It is computed by a
+:class:`MFCCExtractor`, which builds the window, the mel filterbank and the
+DCT basis once and then computes the MFCCs of a whole batch of equally long
+signals in one vectorized pass.
+
+:func:`signal_MFCC` computes the same feature for audio that is already in
+memory, e.g. the output of ``vtlSynthBlock``. With ``native=True`` the MFCCs
+are computed directly at the sampling rate of the signal (22050 Hz for
+VocalTractLab) with the same window and hop times, so no resampling is
+needed at all. Native features are not comparable to resampled ones; compute
+the target with the same setting as the candidates.
+
+:func:`get_cached_MFCC` keeps the features of target recordings in a
+:class:`pyvtl.cache.FeatureCache`, so they are only computed once.
+
+'''
+
+import librosa
+import numpy as np
+import scipy.fft
+import scipy.signal
+
+from . import audio
+from .cache import FeatureCache
+
+
+# increase when the feature computation changes in a way that is not
+# visible in the extractor configuration; invalidates cached features
+FEATURE_VERSION = 1
+
+
+class MFCCExtractor(object):
+    '''
+    Vectorized MFCC computation for a fixed configuration.
+
+    The defaults reproduce :func:`get_MFCC`: signals at 16000 Hz, a 25 ms
+    hamming window every 10 ms zero padded to ``n_fft = 512``, 40 mel bands
+    between 0 and 8000 Hz and 40 coefficients. As in the original librosa
+    pipeline the mel filterbank is applied to the complex spectrum, the
+    magnitude of the result is converted to dB (``power_to_db`` with
+    ``top_db = 80`` per signal) and a type II orthonormal DCT gives the
+    coefficients.
+
+    ``mel_sr`` is the sampling rate the mel filterbank is laid out for.
+    ``get_MFCC`` never passed its sampling rate to
+    ``librosa.feature.melspectrogram``, so the filterbank uses librosa's
+    default of 22050 Hz; keep that value to stay comparable to existing
+    results. ``pad_mode`` is the padding of the centered frames ('constant'
+    since librosa 0.10, 'reflect' before).
+
+    '''
+
+    def __init__(self, sr=16000, n_mfcc=40, n_mels=40, n_fft=512,
+                 win_length=None, hop_length=None, window='hamming', fmin=0,
+                 fmax=8000, mel_sr=22050, top_db=80.0, amin=1e-10,
+                 pad_mode='constant'):
+        if win_length is None:
+            win_length = int(0.025 * sr)  # window time is 0.025
+        if hop_length is None:
+            hop_length = int(0.010 * sr)  # hop time is 0.01
+        self.config = dict(sr=sr, n_mfcc=n_mfcc, n_mels=n_mels, n_fft=n_fft,
+                           win_length=win_length, hop_length=hop_length,
+                           window=window, fmin=fmin, fmax=fmax, mel_sr=mel_sr,
+                           top_db=top_db, amin=amin, pad_mode=pad_mode)
+        self.sr = sr
+        self.n_mfcc = n_mfcc
+        self.n_fft = n_fft
+        self.win_length = win_length
+        self.hop_length = hop_length
+        self.top_db = top_db
+        self.amin = amin
+        self.pad_mode = pad_mode
+
+        # window of win_length samples, centered in n_fft samples
+        window = scipy.signal.get_window(window, win_length, fftbins=True)
+        offset = (n_fft - win_length) // 2
+        self.window = np.zeros(n_fft)
+        self.window[offset:offset + win_length] = window
+        # n_mels x (1 + n_fft // 2)
+        self.mel_basis = librosa.filters.mel(sr=mel_sr, n_fft=n_fft,
+                                             n_mels=n_mels, fmin=fmin,
+                                             fmax=fmax)
+        # n_mfcc x n_mels
+        self.dct_basis = scipy.fft.dct(np.eye(n_mels), type=2, norm='ortho',
+                                       axis=0)[:n_mfcc]
+
+    def number_frames(self, number_samples):
+        '''
+        Returns the number of MFCC frames of a signal with ``number_samples``
+        samples.
+
+        '''
+        return 1 + number_samples // self.hop_length
+
+    def frames(self, signals):
+        '''
+        Returns the windowed frames (N x frames x n_fft) of the signals
+        (N x samples).
+
+        '''
+        pad = self.n_fft // 2
+        padded = np.pad(signals, ((0, 0), (pad, pad)), mode=self.pad_mode)
+        frames = np.lib.stride_tricks.sliding_window_view(
+            padded, self.n_fft, axis=-1)[:, ::self.hop_length]
+        return frames * self.window
+
+    def log_mel(self, signals):
+        '''
+        Returns the dB mel spectrogram (N x n_mels x frames) of the signals
+        (N x samples).
+
+        '''
+        spectrum = np.fft.rfft(self.frames(signals), axis=-1)
+        mel = np.abs(spectrum @ self.mel_basis.T)
+        log_mel = 10.0 * np.log10(np.maximum(self.amin, mel))
+        if self.top_db is not None:
+            floor = log_mel.max(axis=(1, 2), keepdims=True) - self.top_db
+            log_mel = np.maximum(log_mel, floor)
+        return log_mel.transpose(0, 2, 1)
+
+    def batch(self, signals):
+        '''
+        Returns the MFCCs (N x n_mfcc x frames) of a batch of equally long
+        signals, given as N x samples array or list of 1d arrays.
+
+        '''
+        signals = _stack(signals)
+        return np.matmul(self.dct_basis, self.log_mel(signals))
+
+    def __call__(self, signal):
+        '''
+        Returns the MFCC matrix (n_mfcc x frames) of one signal.
+
+        '''
+        return self.batch(np.asarray(signal)[np.newaxis])[0]
+
+
+def _stack(signals):
+    if isinstance(signals, np.ndarray):
+        signals = np.asarray(signals, dtype=np.float64)
+        if signals.ndim != 2:
+            raise ValueError('signals have to be a N x samples array')
+        return signals
+    lengths = set(len(signal) for signal in signals)
+    if len(lengths) > 1:
+        raise ValueError('All signals of a batch need the same length, got %s'
+                         % sorted(lengths))
+    return np.array(signals, dtype=np.float64)
+
+
+# extractor with the configuration of get_MFCC
+_extractor = None
+# extractors for native sampling rates, keyed by rate
+_native_extractors = dict()
+
+
+def default_extractor():
+    '''
+    Returns the shared :class:`MFCCExtractor` of :func:`get_MFCC`.
+
+    '''
+    global _extractor
+    if _extractor is None:
+        _extractor = MFCCExtractor()
+    return _extractor
+
+
+def native_extractor(sr):
+    '''
+    Returns the shared :class:`MFCCExtractor` for signals at ``sr`` Hz: a
+    25 ms window every 10 ms, zero padded to the next power of two, with the
+    mel filterbank laid out for ``sr``.
+
+    '''
+    if sr not in _native_extractors:
+        win_length = int(0.025 * sr)
+        n_fft = 1 << (win_length - 1).bit_length()
+        _native_extractors[sr] = MFCCExtractor(sr=sr, n_fft=n_fft,
+                                               win_length=win_length,
+                                               hop_length=int(0.010 * sr),
+                                               mel_sr=sr)
+    return _native_extractors[sr]
+
+
+def signal_MFCC(y, sr, native=False):
+    '''
+    Returns the MFCC matrix (n_mfcc x frames) of the signal ``y`` at ``sr``
+    Hz, or the MFCCs (N x n_mfcc x frames) of a N x samples batch.
+
+    By default the signal is resampled to 16000 Hz with a cached polyphase
+    filter, as in :func:`get_MFCC`; with ``native=True`` the MFCCs are
+    computed at ``sr`` (see :func:`native_extractor`).
+
+    '''
+    y = np.asarray(y)
+    if native:
+        extractor = native_extractor(sr)
+    else:
+        extractor = default_extractor()
+        y = audio.resample(y, sr, extractor.sr)
+    if y.ndim == 1:
+        return extractor(y)
+    return extractor.batch(y)
+
+
+def get_MFCC(sound_file_name, native=False):
+    '''
+    Takes a sound file name as input; returns the MFCC matrix
+    (n_mfcc x frames) of the signal resampled to 16000 Hz, or at the rate of
+    the file with ``native=True``.
+
+    '''
+    y, sr = audio.read_wav(sound_file_name)
+    return signal_MFCC(y, sr, native=native)
+
+
+def get_cached_MFCC(sound_file_name, native=False, cache=None):
+    '''
+    :func:`get_MFCC` of a target file, stored in and loaded from a feature
+    cache (by default a :class:`pyvtl.cache.FeatureCache` in its default
+    directory). Cached features are returned as read-only memory maps.
+
+    '''
+    if cache is None:
+        cache = FeatureCache()
+    config = dict(feature='get_MFCC', version=FEATURE_VERSION, native=native,
+                  resampler='polyphase')
+    if not native:
+        config['extractor'] = default_extractor().config
+    return cache.get(sound_file_name,
+                     lambda name: get_MFCC(name, native=native), config)
@@ -0,0 +1,156 @@
+'''
+Reader for the feedback files written by ``vtlGesToWav``.
+
+The ``#data`` section of a feedback file has one chunk of 6 lines every
+10 ms: the time in seconds, the 40 tube section areas (cm^2) and lengths
+(cm) from glottis to mouth, the articulator of every tube section (N =
+other, T = tongue, I = lower incisors, L = lower lip), the vocal tract
+parameters and the glottis parameters.
+
+:func:`iter_feedback` parses the file in blocks of whole frames: the
+articulator letters are translated to digits and every block is converted
+by numpy in one call, so no Python objects are created per line or value.
+The articulators are returned as ASCII codes (uint8), as
+:meth:`pyvtl.api.VocalTractLab.synth_block` returns them and
+:mod:`pyvtl.streaming` takes them.
+:func:`read_feedback` returns the whole file as one :class:`Feedback` and
+keeps a binary sidecar (``<feedback file>.npz``) that is loaded instead of
+the text as long as the feedback file is unchanged.
+
+Example::
+
+    feedback = read_feedback('feedback.txt')
+    feedback.areas.shape  # frames x 40
+    mouth = feedback.areas[:, -1]
+
+'''
+
+import collections
+import os
+import tempfile
+
+import numpy as np
+
+
+# articulator letters; parsed as their index, returned as ASCII codes
+ARTICULATORS = 'NTIL'
+_TO_DIGITS = bytes.maketrans(ARTICULATORS.encode(), b'0123')
+_LETTERS = np.frombuffer(ARTICULATORS.encode(), dtype=np.uint8)
+# version of the arrays in the sidecar files
+_SIDECAR_VERSION = 2
+
+Feedback = collections.namedtuple('Feedback', ['time', 'areas', 'lengths',
+                                               'articulators', 'tract_params',
+                                               'glottis_params'])
+Feedback.__doc__ = '''
+Frames of a feedback file: ``time`` (frames), ``areas`` and ``lengths``
+(frames x tube sections, float32), ``articulators`` (frames x tube sections,
+ASCII codes of the letters in ``ARTICULATORS`` as uint8), ``tract_params``
+and ``glottis_params`` (frames x parameters).
+'''
+
+_LINES_PER_FRAME = 6
+
+
+def _layout(lines):
+    # number of values on each of the lines of a frame
+    return [len(line.split()) for line in lines]
+
+
+def _split(values, layout):
+    values = values.reshape(-1, sum(layout))
+    bounds = np.cumsum([0] + layout)
+    columns = [values[:, start:end] for start, end in zip(bounds[:-1],
+                                                          bounds[1:])]
+    return Feedback(time=columns[0][:, 0].copy(),
+                    areas=columns[1].astype(np.float32),
+                    lengths=columns[2].astype(np.float32),
+                    articulators=_LETTERS[columns[3].astype(np.intp)],
+                    tract_params=columns[4].copy(),
+                    glottis_params=columns[5].copy())
+
+
+def iter_feedback(feedback_file, block_size=1 << 20):
+    '''
+    Yields the frames of ``feedback_file`` as one :class:`Feedback` per
+    block of about ``block_size`` bytes of text. An incomplete last frame
+    (e.g. of a file that is still being written) is ignored.
+
+    '''
+    with open(feedback_file, 'rb') as file_:
+        for line in file_:
+            if line.strip() == b'#data':
+                break
+        else:
+            raise ValueError('No #data section in %s' % feedback_file)
+        first = [file_.readline() for __ in range(_LINES_PER_FRAME)]
+        layout = _layout(first)
+        rest = b''.join(first)
+        while True:
+            block = file_.read(block_size)
+            text = rest + block
+            if not block and rest and not rest.endswith(b'\n'):
+                text += b'\n'  # last line without line break
+            # offsets after the last line of every complete frame
+            ends = np.flatnonzero(np.frombuffer(text, dtype=np.uint8)
+                                  == ord('\n'))[_LINES_PER_FRAME - 1::
+                                                 _LINES_PER_FRAME] + 1
+            if len(ends):
+                data = text[:ends[-1]].translate(_TO_DIGITS).decode('ascii')
+                yield _split(np.fromstring(data, sep=' '), layout)
+                rest = text[ends[-1]:]
+            else:
+                rest = text
+            if not block:
+                return
+
+
+def _concatenate(blocks):
+    if not blocks:
+        raise ValueError('No complete frame in the feedback file')
+    return Feedback(*[np.concatenate(arrays) for arrays in zip(*blocks)])
+
+
+def sidecar_file(feedback_file):
+    '''
+    Returns the name of the binary sidecar of ``feedback_file``.
+
+    '''
+    return feedback_file + '.npz'
+
+
+def read_feedback(feedback_file, cache=True):
+    '''
+    Returns all frames of ``feedback_file`` as one :class:`Feedback`.
+
+    With ``cache=True`` the arrays are stored in a binary sidecar file next
+    to the feedback file and loaded from there as long as the size and
+    modification time of the feedback file are unchanged.
+
+    '''
+    stat = os.stat(feedback_file)
+    signature = np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+    sidecar = sidecar_file(feedback_file)
+    if cache:
+        try:
+            with np.load(sidecar) as data:
+                if (np.array_equal(data['signature'], signature)
+                        and data['version'] == _SIDECAR_VERSION):
+                    return Feedback(*[data[field]
+                                      for field in Feedback._fields])
+        except (IOError, ValueError, KeyError):
+            pass
+
+    feedback = _concatenate(list(iter_feedback(feedback_file)))
+    if cache:
+        directory = os.path.dirname(os.path.abspath(sidecar))
+        file_, temporary = tempfile.mkstemp(suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(file_, 'wb') as stream:
+                np.savez(stream, signature=signature,
+                         version=_SIDECAR_VERSION, **feedback._asdict())
+            os.replace(temporary, sidecar)
+        except BaseException:
+            os.remove(temporary)
+            raise
+    return feedback
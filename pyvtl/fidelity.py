@@ -0,0 +1,203 @@
+'''
+Multi-fidelity evaluation of candidates with successive halving.
+
+A full evaluation synthesizes the whole gestural score and compares all MFCC
+coefficients of all frames. Most candidates are already clearly worse on a
+cheaper evaluation: a :class:`MultiFidelityEvaluator` scores every candidate
+of a batch on the lowest :class:`FidelityLevel` first, promotes the best
+``promote`` fraction to the next level and so on; only the candidates
+promoted from the last level are evaluated at full fidelity. A level is
+cheaper because of
+
+* ``duration`` -- only an excerpt of the first ``duration`` seconds of the
+  gestural score is synthesized (see :func:`excerpt_gestural_score`) and
+  compared to the corresponding frames of the target, and/or
+* ``n_mfcc`` -- only the first ``n_mfcc`` MFCC coefficients are compared.
+
+With the default levels an eighth of the candidates of a batch reaches full
+fidelity; for banane.ges (0.86 s) the synthesized audio drops to
+``0.25 / 0.86 + 0.25 * 0.5 / 0.86 + 0.125``, about 56 % (the
+:attr:`MultiFidelityEvaluator.cost_ratio` of a run).
+
+Example::
+
+    with ProcessPoolEvaluator('JD2.speaker', 'banane.ges', target_mfcc) as ev:
+        evaluator = MultiFidelityEvaluator(ev, 'banane.ges')
+        ssq = evaluator.evaluate(batch_1, batch_2)
+        evaluator.stats()['full_evaluations']
+
+Candidates that are not promoted to full fidelity get a sum of squares of
+NaN.
+
+'''
+
+import collections
+import math
+import os
+import shutil
+import tempfile
+import xml.etree.ElementTree as ElementTree
+
+import numpy as np
+
+
+# time between MFCC frames (s), see pyvtl.features
+FRAME_TIME = 0.010
+# frames at the end of an excerpt that are affected by its end
+_EDGE_FRAMES = 2
+
+FidelityLevel = collections.namedtuple('FidelityLevel', [
+    'duration', 'n_mfcc', 'promote'])
+# whole score, all coefficients, best half promoted
+FidelityLevel.__new__.__defaults__ = (None, None, 0.5)
+
+DEFAULT_LEVELS = (FidelityLevel(duration=0.25, n_mfcc=13, promote=0.25),
+                  FidelityLevel(duration=0.5, n_mfcc=20, promote=0.5))
+
+
+def gestural_score_duration(gesture_file):
+    '''
+    Returns the duration (s) of the longest gesture sequence of
+    ``gesture_file``.
+
+    '''
+    root = ElementTree.parse(gesture_file).getroot()
+    return max(sum(float(gesture.get('duration_s'))
+                   for gesture in sequence.iter('gesture'))
+               for sequence in root.iter('gesture_sequence'))
+
+
+def excerpt_gestural_score(gesture_file, duration, excerpt_file):
+    '''
+    Writes the first ``duration`` seconds of ``gesture_file`` to
+    ``excerpt_file``: gestures that start later are removed and the
+    gestures at the cut are shortened.
+
+    '''
+    tree = ElementTree.parse(gesture_file)
+    for sequence in tree.getroot().iter('gesture_sequence'):
+        start = 0.0
+        for gesture in list(sequence.iter('gesture')):
+            length = float(gesture.get('duration_s'))
+            if start >= duration:
+                sequence.remove(gesture)
+            elif start + length > duration:
+                gesture.set('duration_s', '%f' % (duration - start))
+            start += length
+    tree.write(excerpt_file)
+
+
+class MultiFidelityEvaluator(object):
+    '''
+    Successive-halving evaluation of batches of candidates on a
+    :class:`pyvtl.parallel.ProcessPoolEvaluator` ``evaluator`` that
+    synthesizes ``gesture_file``.
+
+    Parameters:
+
+    * levels -- lower :class:`FidelityLevel`\\ s from cheapest to most
+      expensive; full fidelity follows the last one
+    * scratch_dir -- directory in which the excerpts are written (default:
+      the system temp directory)
+
+    '''
+
+    def __init__(self, evaluator, gesture_file, levels=DEFAULT_LEVELS,
+                 scratch_dir=None):
+        self.evaluator = evaluator
+        self.duration = gestural_score_duration(gesture_file)
+        self.scratch_dir = tempfile.mkdtemp(prefix='vtl-fidelity-',
+                                            dir=scratch_dir)
+        self.levels = []
+        # arguments of evaluator.evaluate and cost of every level
+        self._arguments = []
+        self._costs = []
+        for number, level in enumerate(levels):
+            if not 0 < level.promote <= 1:
+                raise ValueError('promote has to be in (0, 1], got %r'
+                                 % level.promote)
+            arguments = dict(n_mfcc=level.n_mfcc)
+            cost = 1.0
+            if level.duration is not None and level.duration < self.duration:
+                arguments['gesture_file'] = os.path.join(
+                    self.scratch_dir, 'level-%i.ges' % number)
+                excerpt_gestural_score(gesture_file, level.duration,
+                                       arguments['gesture_file'])
+                arguments['frames'] = max(
+                    1, int(level.duration / FRAME_TIME) - _EDGE_FRAMES)
+                cost = level.duration / self.duration
+            self.levels.append(level)
+            self._arguments.append(arguments)
+            self._costs.append(cost)
+        self.candidates = 0
+        self.evaluations = [0] * (len(self.levels) + 1)
+
+    def evaluate(self, params_1, params_2, keep_below=None, keep_files=None):
+        '''
+        Returns the full-fidelity sums of squares of the candidates
+        ``zip(params_1, params_2)`` as a numpy array, NaN for those that
+        were not promoted. ``keep_below`` and ``keep_files`` apply to the
+        full-fidelity evaluation, see
+        :meth:`pyvtl.parallel.ProcessPoolEvaluator.evaluate`.
+
+        '''
+        number = len(params_1)
+        indices = np.arange(number)
+        for number_level, (level, arguments) in enumerate(
+                zip(self.levels, self._arguments)):
+            if len(indices) <= 1:
+                break
+            values = self.evaluator.evaluate([params_1[j] for j in indices],
+                                             [params_2[j] for j in indices],
+                                             **arguments)
+            self.evaluations[number_level] += len(indices)
+            promoted = max(1, int(math.ceil(level.promote * len(indices))))
+            indices = indices[np.argsort(values, kind='stable')[:promoted]]
+            indices.sort()
+
+        results = np.full(number, np.nan)
+        if keep_files is not None:
+            keep_files = [keep_files[j] for j in indices]
+        results[indices] = self.evaluator.evaluate(
+            [params_1[j] for j in indices], [params_2[j] for j in indices],
+            keep_below=keep_below, keep_files=keep_files)
+        self.candidates += number
+        self.evaluations[-1] += len(indices)
+        return results
+
+    @property
+    def cost_ratio(self):
+        '''
+        Synthesized audio relative to full-fidelity evaluations of all
+        candidates.
+
+        '''
+        if self.candidates == 0:
+            return 0.0
+        cost = sum(evaluations * cost for evaluations, cost
+                   in zip(self.evaluations, self._costs + [1.0]))
+        return cost / float(self.candidates)
+
+    def stats(self):
+        '''
+        Returns the number of candidates, the evaluations per level and the
+        cost ratio as a dict.
+
+        '''
+        return dict(candidates=self.candidates,
+                    evaluations=list(self.evaluations),
+                    full_evaluations=self.evaluations[-1],
+                    cost_ratio=self.cost_ratio)
+
+    def close(self):
+        '''
+        Removes the excerpts; the wrapped evaluator stays open.
+
+        '''
+        shutil.rmtree(self.scratch_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,410 @@
+'''
+Gestural scores as numpy arrays, and a search over their timing.
+
+A :class:`GesturalScore` holds the gesture sequences (tiers) of a ``.ges``
+file. Every :class:`GestureSequence` keeps its gestures in arrays: the
+values (labels such as ``'a'`` or ``'tt-alveolar-clo'``, or numbers for the
+velic, F0 and lung pressure tiers), slopes, durations (s), time constants
+(s) and neutral flags. As in :mod:`pyvtl.speaker`, the file is only parsed
+once: the text is split into a template around the attribute values, and
+:meth:`GesturalScore.serialize` fills the template from the arrays in one
+formatting step, so a modified score is written in microseconds. Everything
+outside the attribute values is written as in the original file.
+
+A :class:`TimingSpace` maps a flat vector of timing parameters (durations,
+time constants, F0 targets and slopes) to a score, with bounds around the
+original values, so the optimizers of :mod:`pyvtl.optimize` can search
+them. A :class:`TimingEvaluator` writes one gestural score per candidate
+and synthesizes the batch on a :class:`pyvtl.parallel.ProcessPoolEvaluator`
+with fixed speaker shapes. Different durations change the number of MFCC
+frames, so score the candidates with the banded DTW distance (``band``).
+
+Example::
+
+    score = read_gestural_score('banane.ges')
+    score['f0-gestures'].value[1] += 2.0  # semitones
+    score.write('candidate.ges')
+
+    space = TimingSpace(score, fields=('duration', 'time_constant'))
+    with ProcessPoolEvaluator('JD2.speaker', 'banane.ges', target_mfcc,
+                              band=10) as ev:
+        evaluator = TimingEvaluator(ev, space, SCHWA_VTP, SCHWA_VTP)
+        best = minimize(CMAES(space.space, x0=space.vector()),
+                        evaluator.evaluate, max_evaluations=500)
+        space.apply(best['best_x']).write('best.ges')
+
+'''
+
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+
+from .optimize import SearchSpace
+
+
+# tiers whose gesture values are numbers (velum opening, F0 in semitones,
+# lung pressure in Pa) instead of labels
+NUMERIC_TIERS = ('velic-gestures', 'f0-gestures', 'lung-pressure-gestures')
+F0_TIER = 'f0-gestures'
+
+_SEQUENCE = re.compile(r'<gesture_sequence\s+type="(?P<type>[^"]*)"'
+                       r'\s+unit="(?P<unit>[^"]*)"\s*>'
+                       r'|(?P<end></gesture_sequence>)')
+_GESTURE = re.compile(r'<gesture\s+value="(?P<value>[^"]*)"'
+                      r'\s+slope="(?P<slope>[^"]*)"'
+                      r'\s+duration_s="(?P<duration>[^"]*)"'
+                      r'\s+time_constant_s="(?P<time_constant>[^"]*)"'
+                      r'\s+neutral="(?P<neutral>[^"]*)"\s*/>')
+_ATTRIBUTES = ('value', 'slope', 'duration', 'time_constant', 'neutral')
+
+_NEWLINE = '\r\n'
+_HEADER = '<gestural_score>' + _NEWLINE
+_FOOTER = '</gestural_score>' + _NEWLINE
+
+
+class GestureSequence(object):
+    '''
+    One tier of a gestural score.
+
+    Parameters:
+
+    * type -- tier name, e.g. ``'vowel-gestures'``
+    * unit -- unit of the values (``'st'`` for F0, ``'Pa'`` for the lung
+      pressure)
+    * value -- labels (list of str) or, for numeric tiers, numbers
+    * slope, duration, time_constant, neutral -- one value per gesture
+
+    '''
+
+    def __init__(self, type, unit, value, slope, duration, time_constant,
+                 neutral):
+        self.type = type
+        self.unit = unit
+        self.numeric = type in NUMERIC_TIERS
+        if self.numeric:
+            self.value = np.asarray(value, dtype=float)
+        else:
+            self.value = list(value)
+        self.slope = np.asarray(slope, dtype=float)
+        self.duration = np.asarray(duration, dtype=float)
+        self.time_constant = np.asarray(time_constant, dtype=float)
+        self.neutral = np.asarray(neutral, dtype=np.int8)
+
+    def __len__(self):
+        return len(self.duration)
+
+    @property
+    def start(self):
+        '''
+        Start times (s) of the gestures.
+
+        '''
+        return np.concatenate([[0.0], np.cumsum(self.duration)[:-1]])
+
+    @property
+    def total_duration(self):
+        return float(np.sum(self.duration))
+
+    def copy(self):
+        return GestureSequence(self.type, self.unit, np.copy(self.value)
+                               if self.numeric else list(self.value),
+                               self.slope.copy(), self.duration.copy(),
+                               self.time_constant.copy(), self.neutral.copy())
+
+    def _fields(self):
+        # attribute values of all gestures, in the order of the template
+        value = self.value.tolist() if self.numeric else self.value
+        return [field for row in zip(value, self.slope.tolist(),
+                                     self.duration.tolist(),
+                                     self.time_constant.tolist(),
+                                     self.neutral.tolist())
+                for field in row]
+
+
+class GesturalScore(object):
+    '''
+    The gesture sequences of a gestural score.
+
+    ``template`` is the text of the file with format specifiers in place of
+    the attribute values (built by :meth:`parse`); without it the score is
+    written in the layout of VocalTractLab.
+
+    '''
+
+    def __init__(self, sequences, template=None):
+        self.sequences = list(sequences)
+        if template is None:
+            template = _template(self.sequences)
+        self.template = template
+
+    @classmethod
+    def parse(cls, text):
+        '''
+        Returns the :class:`GesturalScore` of the ``.ges`` file content
+        ``text``.
+
+        '''
+        sequences = []
+        pieces = []
+        position = 0
+        current = None
+        for match in re.finditer('%s|%s' % (_SEQUENCE.pattern,
+                                            _GESTURE.pattern), text):
+            if match.group('type') is not None:
+                current = dict(type=match.group('type'),
+                               unit=match.group('unit'),
+                               value=[], slope=[], duration=[],
+                               time_constant=[], neutral=[])
+                continue
+            if match.group('end') is not None:
+                if current is not None:
+                    numeric = current['type'] in NUMERIC_TIERS
+                    if numeric:
+                        current['value'] = [float(value)
+                                            for value in current['value']]
+                    sequences.append(GestureSequence(**current))
+                    current = None
+                continue
+            if current is None:
+                raise ValueError('Gesture outside of a gesture sequence')
+            numeric = current['type'] in NUMERIC_TIERS
+            for name in _ATTRIBUTES:
+                start, end = match.span(name)
+                pieces.append(text[position:start].replace('%', '%%'))
+                position = end
+                if name == 'value':
+                    pieces.append('%f' if numeric else '%s')
+                    current['value'].append(match.group(name))
+                elif name == 'neutral':
+                    pieces.append('%i')
+                    current['neutral'].append(int(match.group(name)))
+                else:
+                    pieces.append('%f')
+                    current[name].append(float(match.group(name)))
+        if current is not None:
+            raise ValueError('Unterminated gesture sequence %r'
+                             % current['type'])
+        pieces.append(text[position:].replace('%', '%%'))
+        return cls(sequences, ''.join(pieces))
+
+    def __getitem__(self, type):
+        for sequence in self.sequences:
+            if sequence.type == type:
+                return sequence
+        raise KeyError(type)
+
+    def __contains__(self, type):
+        return any(sequence.type == type for sequence in self.sequences)
+
+    @property
+    def types(self):
+        return [sequence.type for sequence in self.sequences]
+
+    @property
+    def duration(self):
+        '''
+        Duration (s) of the longest gesture sequence.
+
+        '''
+        return max([sequence.total_duration for sequence in self.sequences]
+                   or [0.0])
+
+    def copy(self):
+        '''
+        Returns a copy with its own arrays (sharing the template).
+
+        '''
+        return GesturalScore([sequence.copy() for sequence in self.sequences],
+                             self.template)
+
+    def serialize(self):
+        '''
+        Returns the ``.ges`` file content of the score.
+
+        '''
+        fields = []
+        for sequence in self.sequences:
+            fields.extend(sequence._fields())
+        return self.template % tuple(fields)
+
+    def write(self, gesture_file):
+        with open(gesture_file, 'w', newline='') as file_:
+            file_.write(self.serialize())
+
+
+def _template(sequences):
+    # VocalTractLab layout of the given sequences
+    pieces = [_HEADER]
+    for sequence in sequences:
+        pieces.append('  <gesture_sequence type="%s" unit="%s">%s'
+                      % (sequence.type, sequence.unit, _NEWLINE))
+        value = '%f' if sequence.numeric else '%s'
+        pieces.extend(['    <gesture value="%s" slope="%%f" duration_s="%%f" '
+                       'time_constant_s="%%f" neutral="%%i" />%s'
+                       % (value, _NEWLINE)] * len(sequence))
+        pieces.append('  </gesture_sequence>' + _NEWLINE)
+    pieces.append(_FOOTER)
+    return ''.join(pieces)
+
+
+def read_gestural_score(gesture_file):
+    '''
+    Returns the :class:`GesturalScore` of ``gesture_file``.
+
+    '''
+    with open(gesture_file, newline='') as file_:
+        return GesturalScore.parse(file_.read())
+
+
+class TimingSpace(object):
+    '''
+    Timing parameters of a gestural score as one flat vector with bounds.
+
+    Parameters:
+
+    * fields -- parameters searched, any of ``'duration'``,
+      ``'time_constant'``, ``'value'`` and ``'slope'``; values and slopes
+      are only searched on the F0 tier
+    * tiers -- names of the tiers searched (default: all)
+    * scale -- durations vary by this fraction of their original value
+    * time_constant -- range (s) of the time constants (widened to include
+      the original values)
+    * f0 -- F0 targets vary by this many semitones
+    * slope -- F0 slopes vary by this many semitones per second
+
+    The search space of the optimizers is :attr:`space`.
+
+    '''
+
+    def __init__(self, score, fields=('duration', 'time_constant'),
+                 tiers=None, scale=0.5, time_constant=(0.005, 0.05), f0=3.0,
+                 slope=20.0):
+        self.score = score
+        # (sequence index, field, offset) of every searched field of a
+        # sequence: its values are vector[offset:offset + len(sequence)]
+        self.entries = []
+        lower = []
+        upper = []
+        for number, sequence in enumerate(score.sequences):
+            if tiers is not None and sequence.type not in tiers:
+                continue
+            for field in fields:
+                if field in ('value', 'slope') and sequence.type != F0_TIER:
+                    continue
+                if field not in ('duration', 'time_constant', 'value',
+                                 'slope'):
+                    raise ValueError('Unknown field %r' % field)
+                current = getattr(sequence, field)
+                if field == 'duration':
+                    low, high = current * (1 - scale), current * (1 + scale)
+                elif field == 'time_constant':
+                    low = np.minimum(current, time_constant[0])
+                    high = np.maximum(current, time_constant[1])
+                elif field == 'value':
+                    low, high = current - f0, current + f0
+                else:
+                    low, high = current - slope, current + slope
+                self.entries.append((number, field, len(lower)))
+                lower.extend(low.tolist())
+                upper.extend(high.tolist())
+        self.ranges = np.column_stack([lower, upper])
+        self.space = SearchSpace(self.ranges, number_vectors=1)
+
+    def vector(self, score=None):
+        '''
+        Returns the timing parameters of ``score`` (default: the original).
+
+        '''
+        if score is None:
+            score = self.score
+        vector = np.empty(len(self.ranges))
+        for number, field, offset in self.entries:
+            values = getattr(score.sequences[number], field)
+            vector[offset:offset + len(values)] = values
+        return vector
+
+    def apply(self, vector, score=None):
+        '''
+        Returns a copy of ``score`` (default: the original) with the timing
+        parameters ``vector``; with ``score`` given, it is changed in place
+        and returned.
+
+        '''
+        if score is None:
+            score = self.score.copy()
+        vector = np.asarray(vector, dtype=float)
+        for number, field, offset in self.entries:
+            values = getattr(score.sequences[number], field)
+            values[:] = vector[offset:offset + len(values)]
+        return score
+
+
+class TimingEvaluator(object):
+    '''
+    Evaluates batches of timing parameter vectors of ``space`` on a
+    :class:`pyvtl.parallel.ProcessPoolEvaluator` ``evaluator``, with the
+    speaker shapes set to ``params_1`` and ``params_2``.
+
+    Parameters:
+
+    * scratch_dir -- directory in which the scratch directory of the
+      candidate scores is created
+
+    If ``space`` searches durations, ``evaluator`` has to score with the
+    banded DTW distance (``band``).
+
+    '''
+
+    def __init__(self, evaluator, space, params_1, params_2,
+                 scratch_dir=None):
+        if (any(field == 'duration' for __, field, __ in space.entries)
+                and getattr(evaluator, 'band', None) is None):
+            raise ValueError('Candidates with other durations have another '
+                             'number of MFCC frames than the target: use an '
+                             'evaluator with a DTW band')
+        self.evaluator = evaluator
+        self.space = space
+        self.params_1 = np.asarray(params_1, dtype=float)
+        self.params_2 = np.asarray(params_2, dtype=float)
+        self.scratch_dir = tempfile.mkdtemp(prefix='vtl-timing-',
+                                            dir=scratch_dir)
+        self._score = space.score.copy()
+
+    def write(self, candidates):
+        '''
+        Writes one gestural score per candidate and returns their paths.
+
+        '''
+        gesture_files = []
+        for number, vector in enumerate(np.atleast_2d(candidates)):
+            gesture_file = os.path.join(self.scratch_dir,
+                                        'candidate-%i.ges' % number)
+            self.space.apply(vector, self._score).write(gesture_file)
+            gesture_files.append(gesture_file)
+        return gesture_files
+
+    def evaluate(self, candidates, keep_below=None, keep_files=None):
+        '''
+        Returns the objective values of the timing parameter vectors
+        ``candidates`` (N x parameters).
+
+        '''
+        gesture_files = self.write(candidates)
+        number = len(gesture_files)
+        return self.evaluator.evaluate([self.params_1] * number,
+                                       [self.params_2] * number,
+                                       keep_below=keep_below,
+                                       keep_files=keep_files,
+                                       gesture_file=gesture_files)
+
+    def close(self):
+        shutil.rmtree(self.scratch_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
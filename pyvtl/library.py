@@ -0,0 +1,59 @@
+'''
+Locating and loading the VocalTractLab shared library.
+
+'''
+
+import ctypes
+import os
+import shutil
+import sys
+import tempfile
+
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPOSITORY_DIR = os.path.dirname(PACKAGE_DIR)
+VTLAPI_DIR = os.path.join(REPOSITORY_DIR, 'vtlapi-2.1b')
+
+
+def default_library_path():
+    '''
+    Returns the path of the 64-bit VocalTractLab binary shipped in
+    ``vtlapi-2.1b`` for the current platform.
+
+    '''
+    # Use 'VocalTractLabApi32.dll' if you use a 32-bit python version.
+    if sys.platform == 'win32':
+        return os.path.join(VTLAPI_DIR, 'VocalTractLabApi64.dll')
+    return os.path.join(VTLAPI_DIR, 'VocalTractLabApi64.so')
+
+
+def load_library(library_path=None):
+    '''
+    Loads the VocalTractLab binary at ``library_path`` (defaults to
+    :func:`default_library_path`) and returns the ``ctypes`` handle.
+
+    '''
+    if library_path is None:
+        library_path = default_library_path()
+    return ctypes.cdll.LoadLibrary(os.path.abspath(library_path))
+
+
+def load_private_copy(library_path=None, directory=None):
+    '''
+    Copies the VocalTractLab binary to a unique file in ``directory`` and
+    loads that copy.
+
+    The synthesizer keeps its state in globals of the library (``vtlInitialize``
+    and ``vtlClose`` act on a single synthesizer), and the dynamic loader maps
+    every library file only once per process. Each private copy therefore
+    comes with its own synthesizer, independent of all other copies.
+
+    '''
+    if library_path is None:
+        library_path = default_library_path()
+    file_, copy_path = tempfile.mkstemp(
+        prefix='VocalTractLabApi-', suffix=os.path.splitext(library_path)[1],
+        dir=directory)
+    os.close(file_)
+    shutil.copyfile(library_path, copy_path)
+    return ctypes.cdll.LoadLibrary(copy_path)
@@ -0,0 +1,219 @@
+'''
+Memoization of synthesis results keyed by quantized vocal tract parameters.
+
+The random search revisits near-identical candidates (WC and MA1-MA3 are
+fixed and the constrained TCX/TCY/TTX/TTY/VO barely move), and every revisit
+pays for a full synthesis. A :class:`SynthesisMemo` quantizes the candidate
+vectors to a grid over the ranges of ``VTP_max_min`` and returns the stored
+result of a candidate that falls into an already evaluated grid cell.
+
+Results are kept in an in-memory LRU tier and, optionally, in a persistent
+sqlite tier that is shared across runs. Use a ``namespace`` that identifies
+the speaker, gestural score and target and the settings of the objective
+(see :func:`objective_namespace`), so that results of different setups
+never mix in the persistent tier.
+
+Example::
+
+    namespace = objective_namespace(
+        ['JD2.speaker', 'banane.ges', 'banane-orig.wav'], band=None)
+    memo = SynthesisMemo(resolution=200, persistent_file='memo.sqlite',
+                         namespace=namespace)
+    ssq = memo.evaluate(batch_1, batch_2,
+                        lambda missing: evaluator.evaluate(
+                            [batch_1[j] for j in missing],
+                            [batch_2[j] for j in missing]))
+
+'''
+
+import collections
+import io
+import os
+import sqlite3
+
+import numpy as np
+
+from .cache import config_hash, file_hash
+from .parameters import VTP_max_min
+
+
+def objective_namespace(files, **settings):
+    '''
+    Returns a memo namespace for the objective defined by the content of
+    ``files`` (e.g. speaker file, gestural score and target recording) and
+    the ``settings`` that change the result of an evaluation (e.g. the DTW
+    band, the MFCC configuration and early abandoning): the base names of
+    the files followed by a hash of their contents and of the settings.
+
+    '''
+    names = [os.path.splitext(os.path.basename(name))[0] for name in files]
+    digest = config_hash(dict(files=[file_hash(name) for name in files],
+                              settings=settings))
+    return '/'.join(names + [digest[:32]])
+
+
+class SynthesisMemo(object):
+    '''
+    Two-tier cache of evaluation results for quantized parameter vectors.
+
+    Parameters:
+
+    * resolution -- number of grid steps over the range of each parameter;
+      a scalar or one value per parameter
+    * ranges -- [min, max] row per parameter (default: ``VTP_max_min``)
+    * maxsize -- number of results in the in-memory tier
+    * persistent_file -- sqlite file of the persistent tier (default: none)
+    * namespace -- prefix of all keys, see the module documentation
+
+    '''
+
+    def __init__(self, resolution=200, ranges=VTP_max_min, maxsize=100000,
+                 persistent_file=None, namespace=''):
+        ranges = np.asarray(ranges, dtype=float)
+        self.minimum = ranges.min(axis=1)
+        span = ranges.max(axis=1) - self.minimum
+        resolution = np.broadcast_to(np.asarray(resolution, dtype=float),
+                                     span.shape)
+        # fixed parameters (zero span) all fall into one grid cell
+        self.step = np.where(span > 0, span / resolution, 1.0)
+        self.maxsize = maxsize
+        self.namespace = namespace.encode()
+        self._memory = collections.OrderedDict()
+        self._connection = None
+        if persistent_file is not None:
+            self._connection = sqlite3.connect(persistent_file)
+            self._connection.execute('CREATE TABLE IF NOT EXISTS memo '
+                                     '(key BLOB PRIMARY KEY, value BLOB)')
+            self._connection.commit()
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    def quantize(self, params):
+        '''
+        Returns the grid indices of the parameter vector(s) ``params``.
+
+        '''
+        params = np.asarray(params, dtype=float)
+        return np.floor((params - self.minimum) / self.step).astype(np.int32)
+
+    def key(self, *params):
+        '''
+        Returns the key of the candidate made of the vectors ``params``.
+
+        '''
+        return self.namespace + b'|' + b''.join(
+            self.quantize(vector).tobytes() for vector in params)
+
+    def get(self, key):
+        '''
+        Returns the stored result of ``key``, or ``None``.
+
+        '''
+        value = self._memory.get(key)
+        if value is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return value
+        if self._connection is not None:
+            row = self._connection.execute(
+                'SELECT value FROM memo WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                value = np.load(io.BytesIO(row[0]))
+                self._remember(key, value)
+                self.persistent_hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        '''
+        Stores the result ``value`` (a number or numpy array) for ``key``.
+        Non-finite results (NaN of candidates that were not promoted by
+        :mod:`pyvtl.fidelity`, infinite ones of abandoned candidates) are
+        not stored: they are not the result of the candidate.
+
+        '''
+        value = np.asarray(value)
+        if not np.all(np.isfinite(value)):
+            return
+        self._remember(key, value)
+        if self._connection is not None:
+            stream = io.BytesIO()
+            np.save(stream, value)
+            self._connection.execute(
+                'INSERT OR REPLACE INTO memo (key, value) VALUES (?, ?)',
+                (key, stream.getvalue()))
+
+    def evaluate(self, params_1, params_2, compute):
+        '''
+        Returns the results of all candidates ``zip(params_1, params_2)`` as
+        a numpy array.
+
+        Candidates without a stored result are evaluated in one call of
+        ``compute(missing)``, where ``missing`` is the list of their indices;
+        it has to return their results in the same order. Non-finite results
+        are returned but not stored (see :meth:`put`).
+
+        '''
+        keys = [self.key(p1, p2) for p1, p2 in zip(params_1, params_2)]
+        results = []
+        # first index of every missing key; duplicates within the batch are
+        # only computed once
+        missing = collections.OrderedDict()
+        for index, key in enumerate(keys):
+            if key in missing:
+                value = None
+                self.memory_hits += 1
+            else:
+                value = self.get(key)
+            if value is None:
+                missing.setdefault(key, index)
+            results.append(value)
+        if missing:
+            computed = dict(zip(missing, compute(list(missing.values()))))
+            for key, value in computed.items():
+                self.put(key, value)
+            for index, key in enumerate(keys):
+                if results[index] is None:
+                    results[index] = np.asarray(computed[key])
+            self.flush()
+        return np.array(results)
+
+    def flush(self):
+        '''
+        Commits the persistent tier.
+
+        '''
+        if self._connection is not None:
+            self._connection.commit()
+
+    @property
+    def hit_rate(self):
+        lookups = self.memory_hits + self.persistent_hits + self.misses
+        if lookups == 0:
+            return 0.0
+        return (self.memory_hits + self.persistent_hits) / float(lookups)
+
+    def stats(self):
+        '''
+        Returns the hit counts and hit rate as a dict.
+
+        '''
+        return dict(memory_hits=self.memory_hits,
+                    persistent_hits=self.persistent_hits,
+                    misses=self.misses,
+                    hit_rate=self.hit_rate,
+                    memory_size=len(self._memory))
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.commit()
+            self._connection.close()
+            self._connection = None
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
@@ -0,0 +1,378 @@
+'''
+Batch optimizers with ask/tell semantics for the vocal tract parameters.
+
+An optimizer proposes a batch of candidates with :meth:`Optimizer.ask`, the
+caller evaluates them (e.g. with :class:`pyvtl.parallel.ProcessPoolEvaluator`)
+and reports the sums of squares back with :meth:`Optimizer.tell`. All
+candidates respect the parameter bounds, and :attr:`Optimizer.converged`
+tells when a run can stop early.
+
+Two optimizers are available:
+
+* :class:`CMAES` -- covariance matrix adaptation evolution strategy
+* :class:`AdaptiveLocalSearch` -- (1+lambda) local search around the
+  incumbent with a step size adapted by the 1/5th success rule
+
+Both search the free parameters of a :class:`SearchSpace`, by default the
+two vectors (/a/ and /n/) of the nanana training with the ranges of
+``VTP_max_min``; fixed parameters (WC, MA1-MA3) keep their value.
+
+:meth:`Optimizer.state` and :meth:`Optimizer.set_state` save and restore the
+complete search state, e.g. with :mod:`pyvtl.checkpoint` from the
+``callback`` of :func:`minimize`; a restored optimizer continues with exactly
+the candidates the original one would have proposed.
+
+Example::
+
+    space = SearchSpace()
+    optimizer = CMAES(space, x0=space.join(SCHWA_VTP, SCHWA_VTP))
+    with ProcessPoolEvaluator('JD2.speaker', 'banane.ges', target_mfcc) as ev:
+        best = minimize(optimizer, ev.evaluate, max_evaluations=5000)
+
+'''
+
+import abc
+
+import numpy as np
+
+from .checkpoint import generator_state, set_generator_state
+from .parameters import VTP_max_min
+
+
+class SearchSpace(object):
+    '''
+    Bounds of ``number_vectors`` concatenated parameter vectors with the
+    ranges ``ranges`` ([min, max] row per parameter).
+
+    Optimizers work on the free parameters (those with a non-empty range),
+    scaled to the unit interval.
+
+    '''
+
+    def __init__(self, ranges=VTP_max_min, number_vectors=2):
+        ranges = np.asarray(ranges, dtype=float)
+        self.vector_size = ranges.shape[0]
+        self.number_vectors = number_vectors
+        self.lower = np.tile(ranges.min(axis=1), number_vectors)
+        self.upper = np.tile(ranges.max(axis=1), number_vectors)
+        self.free = self.upper > self.lower
+        self.dimension = int(self.free.sum())
+
+    def join(self, *params):
+        '''
+        Concatenates parameter vectors into one candidate.
+
+        '''
+        return np.concatenate([np.asarray(vector, dtype=float)
+                               for vector in params])
+
+    def split(self, candidates):
+        '''
+        Splits a N x (number_vectors * vector_size) candidate matrix into
+        one N x vector_size matrix per parameter vector.
+
+        '''
+        candidates = np.atleast_2d(candidates)
+        return [candidates[:, ii * self.vector_size:(ii + 1) * self.vector_size]
+                for ii in range(self.number_vectors)]
+
+    def to_unit(self, candidates):
+        '''
+        Returns the free parameters of ``candidates`` scaled to [0, 1].
+
+        '''
+        candidates = np.atleast_2d(candidates)
+        lower = self.lower[self.free]
+        return (candidates[:, self.free] - lower) / (self.upper[self.free] - lower)
+
+    def from_unit(self, unit):
+        '''
+        Returns full candidates for free parameters ``unit`` in [0, 1]; the
+        fixed parameters are set to their value.
+
+        '''
+        unit = np.clip(np.atleast_2d(unit), 0.0, 1.0)
+        candidates = np.tile(self.lower, (unit.shape[0], 1))
+        lower = self.lower[self.free]
+        candidates[:, self.free] = lower + unit * (self.upper[self.free] - lower)
+        return candidates
+
+
+class Optimizer(abc.ABC):
+    '''
+    Base class of the batch optimizers.
+
+    Subclasses implement :meth:`_ask` and :meth:`_tell` in the unit space of
+    the free parameters and set ``self.stop_reason`` once they converge.
+
+    '''
+
+    def __init__(self, space, x0=None, batch_size=8, seed=None,
+                 tolerance=1e-6, patience=50):
+        self.space = space
+        self.batch_size = batch_size
+        self.random = np.random.default_rng(seed)
+        self.tolerance = tolerance
+        self.patience = patience
+        if x0 is None:
+            self.x0 = np.full(space.dimension, 0.5)
+        else:
+            self.x0 = self.space.to_unit(x0)[0]
+        self.best_x = self.space.from_unit(self.x0)[0]
+        self.best_value = np.inf
+        self.evaluations = 0
+        self.generation = 0
+        self.stop_reason = None
+        self._stale_generations = 0
+
+    def ask(self):
+        '''
+        Returns the next batch of candidates (batch_size x parameters).
+
+        '''
+        return self.space.from_unit(self._ask())
+
+    def tell(self, candidates, values):
+        '''
+        Reports the objective ``values`` of ``candidates`` (as returned by
+        :meth:`ask`); lower values are better.
+
+        '''
+        candidates = np.atleast_2d(candidates)
+        values = np.asarray(values, dtype=float)
+        self.evaluations += len(values)
+        self.generation += 1
+        best = int(np.argmin(values))
+        threshold = self.best_value
+        if np.isfinite(threshold):
+            threshold -= self.tolerance * abs(threshold)
+        if values[best] < threshold:
+            self._stale_generations = 0
+        else:
+            self._stale_generations += 1
+        if values[best] < self.best_value:
+            self.best_value = float(values[best])
+            self.best_x = candidates[best].copy()
+        self._tell(self.space.to_unit(candidates), values)
+        if self.stop_reason is None and self._stale_generations >= self.patience:
+            self.stop_reason = 'no improvement in %i generations' % self.patience
+
+    @property
+    def converged(self):
+        return self.stop_reason is not None
+
+    def report(self):
+        '''
+        Returns the state of the run as a dict.
+
+        '''
+        return dict(evaluations=self.evaluations,
+                    generation=self.generation,
+                    best_value=self.best_value,
+                    converged=self.converged,
+                    stop_reason=self.stop_reason)
+
+    def state(self):
+        '''
+        Returns the complete search state (distribution, incumbent, counters
+        and random generator) as a flat dict for
+        :func:`pyvtl.checkpoint.save_checkpoint`.
+
+        '''
+        state = dict((key, np.copy(value) if isinstance(value, np.ndarray)
+                      else value)
+                     for key, value in vars(self).items()
+                     if key not in ('space', 'random'))
+        state['random'] = generator_state(self.random)
+        return state
+
+    def set_state(self, state):
+        '''
+        Continues the search from a :meth:`state`.
+
+        '''
+        state = dict(state)
+        set_generator_state(self.random, state.pop('random'))
+        for key, value in state.items():
+            if isinstance(value, np.ndarray) and value.ndim == 0:
+                value = value.item()
+            setattr(self, key, value)
+
+    @abc.abstractmethod
+    def _ask(self):
+        '''
+        Returns the next batch of candidates in the unit space (batch_size x
+        dimension).
+
+        '''
+
+    @abc.abstractmethod
+    def _tell(self, unit, values):
+        '''
+        Updates the search with the candidates ``unit`` (in the unit space)
+        and their objective ``values``.
+
+        '''
+
+
+class CMAES(Optimizer):
+    '''
+    (mu/mu_w, lambda)-CMA-ES in the unit space of the free parameters.
+
+    Candidates outside the bounds are projected onto them before evaluation,
+    and the projected candidates are used for the update.
+
+    Parameters (in addition to those of :class:`Optimizer`):
+
+    * sigma -- initial step size in units of the parameter ranges
+    * min_sigma -- the run has converged once the largest standard
+      deviation of the search distribution falls below this value
+
+    '''
+
+    def __init__(self, space, x0=None, batch_size=None, sigma=0.3,
+                 min_sigma=1e-4, **kwargs):
+        n = space.dimension
+        if batch_size is None:
+            batch_size = 4 + int(3 * np.log(n))
+        super(CMAES, self).__init__(space, x0, batch_size, **kwargs)
+        self.mean = self.x0.copy()
+        self.sigma = sigma
+        self.min_sigma = min_sigma
+
+        self.mu = batch_size // 2
+        weights = np.log(self.mu + 0.5) - np.log(np.arange(1, self.mu + 1))
+        self.weights = weights / weights.sum()
+        self.mueff = 1.0 / np.sum(self.weights**2)
+        self.cc = (4 + self.mueff / n) / (n + 4 + 2 * self.mueff / n)
+        self.cs = (self.mueff + 2) / (n + self.mueff + 5)
+        self.c1 = 2 / ((n + 1.3)**2 + self.mueff)
+        self.cmu = min(1 - self.c1, 2 * (self.mueff - 2 + 1 / self.mueff)
+                       / ((n + 2)**2 + self.mueff))
+        self.damps = (1 + 2 * max(0, np.sqrt((self.mueff - 1) / (n + 1)) - 1)
+                      + self.cs)
+        self.chiN = np.sqrt(n) * (1 - 1 / (4.0 * n) + 1 / (21.0 * n**2))
+
+        self.pc = np.zeros(n)
+        self.ps = np.zeros(n)
+        self.C = np.eye(n)
+        self.B = np.eye(n)
+        self.D = np.ones(n)
+
+    def _ask(self):
+        z = self.random.standard_normal((self.batch_size, self.space.dimension))
+        y = z @ (self.B * self.D).T
+        return np.clip(self.mean + self.sigma * y, 0.0, 1.0)
+
+    def _tell(self, unit, values):
+        n = self.space.dimension
+        # a last batch cut short by minimize may have fewer than mu
+        # candidates: use the renormalized weights of the best ones
+        order = np.argsort(values)[:self.mu]
+        weights = self.weights[:len(order)] / self.weights[:len(order)].sum()
+        y = (unit[order] - self.mean) / self.sigma
+        y_w = weights @ y
+        self.mean = self.mean + self.sigma * y_w
+
+        C_invsqrt = (self.B / self.D) @ self.B.T
+        self.ps = ((1 - self.cs) * self.ps
+                   + np.sqrt(self.cs * (2 - self.cs) * self.mueff) * C_invsqrt @ y_w)
+        norm_ps = np.linalg.norm(self.ps)
+        hsig = (norm_ps / np.sqrt(1 - (1 - self.cs)**(2 * self.generation))
+                / self.chiN) < 1.4 + 2.0 / (n + 1)
+        self.pc = ((1 - self.cc) * self.pc
+                   + hsig * np.sqrt(self.cc * (2 - self.cc) * self.mueff) * y_w)
+        rank_mu = (weights[:, np.newaxis] * y).T @ y
+        self.C = ((1 - self.c1 - self.cmu) * self.C
+                  + self.c1 * (np.outer(self.pc, self.pc)
+                               + (1 - hsig) * self.cc * (2 - self.cc) * self.C)
+                  + self.cmu * rank_mu)
+        self.sigma *= np.exp((self.cs / self.damps) * (norm_ps / self.chiN - 1))
+
+        self.C = np.triu(self.C) + np.triu(self.C, 1).T
+        eigenvalues, self.B = np.linalg.eigh(self.C)
+        self.D = np.sqrt(np.maximum(eigenvalues, 1e-20))
+
+        if self.sigma * self.D.max() < self.min_sigma:
+            self.stop_reason = 'step size below %g' % self.min_sigma
+        elif self.D.max() > 1e7 * self.D.min():
+            self.stop_reason = 'ill-conditioned covariance matrix'
+
+    def report(self):
+        report = super(CMAES, self).report()
+        report['sigma'] = float(self.sigma * self.D.max())
+        return report
+
+
+class AdaptiveLocalSearch(Optimizer):
+    '''
+    (1+lambda) local search: every batch is drawn from a normal distribution
+    around the incumbent, and the best candidate replaces the incumbent if
+    it is better. The step size grows after successful batches and shrinks
+    after unsuccessful ones, so that about one batch in five succeeds.
+
+    Parameters (in addition to those of :class:`Optimizer`):
+
+    * sigma -- initial step size in units of the parameter ranges
+    * min_sigma -- the run has converged once the step size falls below
+      this value
+
+    '''
+
+    def __init__(self, space, x0=None, batch_size=8, sigma=0.1,
+                 min_sigma=1e-4, **kwargs):
+        super(AdaptiveLocalSearch, self).__init__(space, x0, batch_size,
+                                                  **kwargs)
+        self.incumbent = self.x0.copy()
+        self.incumbent_value = np.inf
+        self.sigma = sigma
+        self.min_sigma = min_sigma
+
+    def _ask(self):
+        step = self.random.standard_normal((self.batch_size,
+                                            self.space.dimension))
+        return np.clip(self.incumbent + self.sigma * step, 0.0, 1.0)
+
+    def _tell(self, unit, values):
+        best = int(np.argmin(values))
+        success = values[best] < self.incumbent_value
+        if success:
+            self.incumbent = unit[best].copy()
+            self.incumbent_value = float(values[best])
+        # 1/5th success rule
+        self.sigma *= np.exp((float(success) - 0.2) / 0.8 / np.sqrt(
+            self.space.dimension + 1))
+        self.sigma = min(self.sigma, 1.0)
+        if self.sigma < self.min_sigma:
+            self.stop_reason = 'step size below %g' % self.min_sigma
+
+    def report(self):
+        report = super(AdaptiveLocalSearch, self).report()
+        report['sigma'] = float(self.sigma)
+        return report
+
+
+def minimize(optimizer, evaluate, max_evaluations=100000, callback=None):
+    '''
+    Runs ``optimizer`` until it converges or ``max_evaluations`` candidates
+    are evaluated; returns :meth:`Optimizer.report` of the final state,
+    including ``best_x``.
+
+    ``evaluate(*params)`` receives one N x vector_size matrix per parameter
+    vector of the search space (for the nanana training ``params_1`` and
+    ``params_2``) and returns the N objective values, e.g.
+    ``ProcessPoolEvaluator.evaluate``. ``callback(optimizer)`` is called
+    after every batch.
+
+    '''
+    while (not optimizer.converged
+           and optimizer.evaluations < max_evaluations):
+        candidates = optimizer.ask()
+        candidates = candidates[:max_evaluations - optimizer.evaluations]
+        values = evaluate(*optimizer.space.split(candidates))
+        optimizer.tell(candidates, values)
+        if callback is not None:
+            callback(optimizer)
+    report = optimizer.report()
+    report['best_x'] = optimizer.best_x
+    return report
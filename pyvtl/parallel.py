@@ -0,0 +1,246 @@
+'''
+Process-pool evaluation of candidate vocal tract parameters.
+
+Every worker process loads its own copy of the VocalTractLab library and
+works in a private scratch directory with its own speaker, wav and feedback
+file. Batches of candidates are fanned out over all workers, so several
+``vtlGesToWav`` syntheses run side by side instead of one at a time.
+
+Example::
+
+    target_mfcc = get_MFCC('banane-orig.wav')
+    with ProcessPoolEvaluator('JD2.speaker', 'banane.ges', target_mfcc) as ev:
+        ssq = ev.evaluate(batch_1, batch_2)
+
+'''
+
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from . import api, audio, dtw, early, features, library, speaker, wav
+
+
+# state of the current worker process; set up by _init_worker
+_worker = None
+
+
+class _Worker(object):
+    '''
+    Synthesizes and scores candidates inside one worker process.
+
+    '''
+
+    def __init__(self, library_path, speaker_file, gesture_file, target_mfcc,
+                 scratch_root, shapes, native, band, block_frames):
+        self.vtl = api.VocalTractLab(library_path)
+        self.scratch_dir = tempfile.mkdtemp(prefix='worker-%i-' % os.getpid(),
+                                            dir=scratch_root)
+        template = speaker.SpeakerTemplate(speaker_file)
+        if shapes is None:
+            shapes = speaker.default_shapes(template)
+        self.patcher = template.patcher(shapes)
+        self.speaker_file = os.path.join(self.scratch_dir,
+                                         os.path.basename(speaker_file))
+        self.gesture_file = gesture_file
+        self.wav_file = os.path.join(self.scratch_dir, 'candidate.wav')
+        self.feedback_file = os.path.join(self.scratch_dir, 'feedback.txt')
+        self.target_mfcc = target_mfcc
+        self.native = native
+        self.band = band
+        # BandedDTW of the target by (n_mfcc, frames)
+        self._dtw = dict()
+        self.objective = None
+        if block_frames is not None:
+            self.objective = early.EarlyAbandoningObjective(
+                target_mfcc, block_frames, native)
+
+    def evaluate(self, job):
+        (params_1, params_2, keep_below, keep_file, gesture_file, n_mfcc,
+         frames) = job
+        self.patcher.write(self.speaker_file, params_1[:23], params_2[:23])
+        self.vtl.ges_to_wav(self.speaker_file,
+                            gesture_file or self.gesture_file,
+                            self.wav_file, self.feedback_file)
+        if sys.platform != 'win32':
+            wav.fix_header(self.wav_file)
+        if self.objective is not None and _abandons(gesture_file, n_mfcc,
+                                                    frames):
+            signal, rate = audio.read_wav(self.wav_file)
+            sum_of_squares, __, abandoned, fraction = (
+                self.objective.evaluate(signal, rate, keep_below))
+            return self._keep(sum_of_squares, keep_below, keep_file,
+                              abandoned, fraction)
+        mfcc = features.get_MFCC(self.wav_file, native=self.native)
+        if n_mfcc is not None or frames is not None:
+            mfcc = mfcc[:n_mfcc, :frames]
+        if self.band is None:
+            target_mfcc = self.target_mfcc[:n_mfcc, :frames]
+            sum_of_squares = float(np.sum((mfcc - target_mfcc)**2))
+        else:
+            sum_of_squares = self.dtw(n_mfcc, frames).distance(mfcc)
+        return self._keep(sum_of_squares, keep_below, keep_file, False, 1.0)
+
+    def _keep(self, sum_of_squares, keep_below, keep_file, abandoned,
+              fraction):
+        if keep_file is not None and sum_of_squares < keep_below:
+            shutil.move(self.wav_file, keep_file)
+        return sum_of_squares, abandoned, fraction
+
+    def dtw(self, n_mfcc, frames):
+        if (n_mfcc, frames) not in self._dtw:
+            self._dtw[n_mfcc, frames] = dtw.BandedDTW(
+                self.target_mfcc[:n_mfcc, :frames], self.band)
+        return self._dtw[n_mfcc, frames]
+
+
+def _abandons(gesture_file, n_mfcc, frames):
+    # early abandoning compares the audio with the target frame by frame, so
+    # it only scores jobs on the gestural score and features of the target
+    return gesture_file is None and n_mfcc is None and frames is None
+
+
+def _init_worker(*args):
+    global _worker
+    _worker = _Worker(*args)
+
+
+def _evaluate(job):
+    start = time.perf_counter()
+    result = _worker.evaluate(job)
+    return result + (time.perf_counter() - start,)
+
+
+class ProcessPoolEvaluator(object):
+    '''
+    Evaluates batches of candidate parameter pairs on a pool of processes.
+
+    Each candidate is written into two shapes (by default /a/ and /n/) of a
+    private copy of ``speaker_file``, synthesized from ``gesture_file`` and
+    scored by the sum of squared MFCC differences against ``target_mfcc``.
+
+    Parameters:
+
+    * processes -- number of worker processes (default: all cores)
+    * library_path -- VocalTractLab binary (default: the one in vtlapi-2.1b)
+    * scratch_dir -- directory in which the per-worker scratch directories
+      are created (default: the system temp directory)
+    * shapes -- names of the two shapes the candidates are written to
+      (default: the /a/ and /n/ shape, see :func:`speaker.default_shapes`)
+    * native -- compute the MFCCs at the 22050 Hz of the synthesis instead of
+      resampling to 16000 Hz; ``target_mfcc`` has to be computed the same way
+      (``get_MFCC(target, native=True)``)
+    * band -- score the candidates by the banded DTW distance with this
+      band (see :mod:`pyvtl.dtw`) instead of the sum of squares, so that
+      candidates and target do not need the same number of frames
+    * block_frames -- compute the sum of squares ``block_frames`` MFCC
+      frames at a time and abandon candidates once it exceeds
+      ``keep_below`` (see :mod:`pyvtl.early`); abandoned candidates get an
+      infinite sum of squares and are counted in ``abandon_stats``.
+      Candidates with their own ``gesture_file``, ``n_mfcc`` or ``frames``
+      are always scored in full and not counted.
+
+    '''
+
+    def __init__(self, speaker_file, gesture_file, target_mfcc, processes=None,
+                 library_path=None, scratch_dir=None, shapes=None,
+                 native=False, band=None, block_frames=None):
+        if library_path is None:
+            library_path = library.default_library_path()
+        if band is not None and block_frames is not None:
+            raise ValueError('Early abandoning works on the sum of squares, '
+                             'not on the DTW distance')
+        self.processes = processes or os.cpu_count() or 1
+        self.early_abandoning = block_frames is not None
+        self.band = band
+        self.abandon_stats = early.AbandonStats()
+        # seconds the workers were busy and seconds spent in evaluate
+        self.busy_time = 0.0
+        self.wall_time = 0.0
+        self.scratch_root = tempfile.mkdtemp(prefix='vtl-pool-',
+                                             dir=scratch_dir)
+        initargs = (os.path.abspath(library_path),
+                    os.path.abspath(speaker_file),
+                    os.path.abspath(gesture_file),
+                    np.asarray(target_mfcc),
+                    self.scratch_root,
+                    shapes,
+                    native,
+                    band,
+                    block_frames)
+        self.pool = multiprocessing.Pool(self.processes,
+                                         initializer=_init_worker,
+                                         initargs=initargs)
+
+    def evaluate(self, params_1, params_2, keep_below=None, keep_files=None,
+                 gesture_file=None, n_mfcc=None, frames=None):
+        '''
+        Returns the sums of squares of all candidates ``zip(params_1,
+        params_2)`` as a numpy array, in the order of the candidates.
+
+        If ``keep_files`` is given, the synthesized audio of every candidate
+        whose sum of squares is below ``keep_below`` is moved to the
+        corresponding path of ``keep_files``; all other audio is discarded.
+
+        ``gesture_file`` replaces the gestural score of the pool for this
+        batch (or, as a list, one gestural score per candidate, see
+        :mod:`pyvtl.gestures`), and ``n_mfcc`` and ``frames`` restrict the
+        sum of squares to the first coefficients and frames (see
+        :mod:`pyvtl.fidelity`).
+
+        '''
+        if keep_files is None:
+            keep_files = [None] * len(params_1)
+        else:
+            keep_files = [os.path.abspath(name) for name in keep_files]
+        if keep_below is None:
+            keep_below = np.inf
+        if gesture_file is None or isinstance(gesture_file, str):
+            gesture_files = [gesture_file] * len(params_1)
+        else:
+            gesture_files = list(gesture_file)
+        gesture_files = [None if name is None else os.path.abspath(name)
+                         for name in gesture_files]
+        jobs = [(p1, p2, keep_below, keep_file, name, n_mfcc, frames)
+                for p1, p2, keep_file, name in zip(params_1, params_2,
+                                                   keep_files, gesture_files)]
+        chunksize = max(1, len(jobs) // (4 * self.processes))
+        start = time.perf_counter()
+        results = self.pool.map(_evaluate, jobs, chunksize=chunksize)
+        self.wall_time += time.perf_counter() - start
+        self.busy_time += sum(result[-1] for result in results)
+        if self.early_abandoning:
+            for job, (__, abandoned, fraction, __) in zip(jobs, results):
+                if _abandons(job[4], n_mfcc, frames):
+                    self.abandon_stats.add(abandoned, fraction)
+        return np.array([result[0] for result in results])
+
+    @property
+    def utilization(self):
+        '''
+        Fraction of the time in :meth:`evaluate` that the workers were busy.
+
+        '''
+        if self.wall_time == 0:
+            return 0.0
+        return self.busy_time / (self.wall_time * self.processes)
+
+    def close(self):
+        '''
+        Shuts down the worker processes and removes their scratch files.
+
+        '''
+        self.pool.close()
+        self.pool.join()
+        shutil.rmtree(self.scratch_root, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,32 @@
+'''
+Vocal tract parameters (VTP) of the nanana training.
+
+The order of the parameters is the order of the speaker file and of
+``vtlGetTractParamInfo``.
+
+'''
+
+import numpy as np
+
+
+VTP_NAMES = ['HX', 'HY', 'JX', 'JA', 'LP', 'LD', 'VS', 'VO', 'WC', 'TCX',
+             'TCY', 'TTX', 'TTY', 'TBX', 'TBY', 'TRX', 'TRY', 'TS1', 'TS2',
+             'TS3', 'TS4', 'MA1', 'MA2', 'MA3']
+
+# The range of vocal tract parameters (VTP), one [min, max] row per parameter.
+# WC and MA1-MA3 are fixed (not included in Prom-on et al., 2014).
+VTP_max_min = np.array([[0, 1], [-6, -3.5], [-0.5, 0], [-7, 0],
+                        [-1, 1], [-2, 4], [0, 1], [-0.1, 1],
+                        [0, 0], [-3, 4], [-3, 1], [1.5, 5.5],
+                        [-3, 2.5], [-3, 4], [-3, 5], [-4, 2],
+                        [-6, 0], [-1.4, 1.4], [-1.4, 1.4], [-1.4, 1.4],
+                        [-1.4, 1.4], [-0.05, -0.05], [-0.05, -0.05],
+                        [-0.05, -0.05]])
+
+# VTP of schwa, the starting point of the training
+SCHWA_VTP = np.array([1.0, -4.75, 0.0, -2.0,
+                      -0.07, 0.95, 0.0, -0.1,
+                      0.0, -0.4, -1.46, 3.5,
+                      -1.0, 2.0, 0.5, 0.0,
+                      0.0, 0.0, 0.06, 0.15,
+                      0.15, -0.05, -0.05, -0.05])
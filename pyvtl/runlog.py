@@ -0,0 +1,195 @@
+'''
+Append-only binary log of the evaluated candidates of a training run.
+
+The training scripts used to rewrite the complete history arrays
+(``Every_SSQ``, ``Every_VTP_1``, ``Every_VTP_2``) as text after every
+improvement, so the cost of recording grew with the length of the run. A
+:class:`RunRecorder` instead appends one fixed-width record per candidate --
+iteration, sum of squares, elapsed time and the parameter vectors -- to a
+binary file through a small in-memory buffer.
+
+The log starts with a 64 byte header that describes the record layout and is
+read back as a memory-mapped numpy structured array with :func:`read_log`.
+:func:`export_csv` writes the CSV files of the original scripts on demand.
+
+Example::
+
+    with RunRecorder('nanana.runlog') as recorder:
+        recorder.record(0, current_sum_of_squares, params_1, params_2)
+        ...
+    records = read_log('nanana.runlog')
+    records['ssq'].min(), records['params'][:, 0]  # /a/ vectors
+
+'''
+
+import os
+import struct
+import time
+
+import numpy as np
+
+
+MAGIC = b'PYVTLLOG'
+VERSION = 1
+# magic, version, number of vectors, vector size; padded to HEADER_SIZE
+_HEADER = struct.Struct('<8sIII')
+HEADER_SIZE = 64
+
+
+def record_dtype(number_vectors=2, vector_size=24):
+    '''
+    Returns the numpy dtype of one log record.
+
+    '''
+    return np.dtype([('iteration', '<i8'),
+                     ('ssq', '<f8'),
+                     ('time', '<f8'),
+                     ('params', '<f8', (number_vectors, vector_size))])
+
+
+def _read_header(file_):
+    header = file_.read(HEADER_SIZE)
+    if len(header) < HEADER_SIZE or not header.startswith(MAGIC):
+        raise ValueError('%s is not a run log' % file_.name)
+    __, version, number_vectors, vector_size = _HEADER.unpack_from(header)
+    if version != VERSION:
+        raise ValueError('Unsupported run log version %i in %s'
+                         % (version, file_.name))
+    return record_dtype(number_vectors, vector_size)
+
+
+class RunRecorder(object):
+    '''
+    Buffered writer of a run log.
+
+    Parameters:
+
+    * log_file -- file of the log; an existing log with the same layout is
+      continued, otherwise a new one is created
+    * number_vectors, vector_size -- layout of the parameters of a record
+    * buffer_size -- number of records kept in memory before they are
+      written to the file
+    * append -- continue an existing log (default) or start a new one
+    * elapsed -- seconds already spent in the run, e.g. when it is resumed
+      from a checkpoint
+
+    '''
+
+    def __init__(self, log_file, number_vectors=2, vector_size=24,
+                 buffer_size=1024, append=True, elapsed=0.0):
+        self.log_file = log_file
+        self.dtype = record_dtype(number_vectors, vector_size)
+        self._buffer = np.zeros(buffer_size, dtype=self.dtype)
+        self._buffered = 0
+        self._start = time.time() - elapsed
+        if append and os.path.exists(log_file) and os.path.getsize(log_file):
+            with open(log_file, 'rb') as file_:
+                dtype = _read_header(file_)
+            if dtype != self.dtype:
+                raise ValueError('%s has records of another layout' % log_file)
+            self._file = open(log_file, 'r+b')
+            # drop a record that was only partially written
+            size = os.path.getsize(log_file) - HEADER_SIZE
+            self.written = size // self.dtype.itemsize
+            self._file.truncate(HEADER_SIZE + self.written * self.dtype.itemsize)
+            self._file.seek(0, os.SEEK_END)
+        else:
+            self._file = open(log_file, 'wb')
+            header = _HEADER.pack(MAGIC, VERSION, number_vectors, vector_size)
+            self._file.write(header.ljust(HEADER_SIZE, b'\0'))
+            self.written = 0
+
+    def record(self, iteration, ssq, *params, elapsed=None):
+        '''
+        Appends the record of one candidate: its ``iteration``, sum of
+        squares ``ssq`` and parameter vectors ``params``. ``elapsed``
+        defaults to :attr:`elapsed`.
+
+        '''
+        if elapsed is None:
+            elapsed = self.elapsed
+        entry = self._buffer[self._buffered]
+        entry['iteration'] = iteration
+        entry['ssq'] = ssq
+        entry['time'] = elapsed
+        entry['params'] = params
+        self._buffered += 1
+        if self._buffered == len(self._buffer):
+            self.flush()
+
+    @property
+    def elapsed(self):
+        '''
+        Seconds since the start of the run.
+
+        '''
+        return time.time() - self._start
+
+    def truncate(self, number):
+        '''
+        Keeps only the first ``number`` records, e.g. those up to the
+        checkpoint a run is resumed from.
+
+        '''
+        self.flush()
+        if number < self.written:
+            self.written = number
+            self._file.truncate(HEADER_SIZE + number * self.dtype.itemsize)
+            self._file.seek(0, os.SEEK_END)
+
+    def flush(self):
+        '''
+        Writes the buffered records to the file.
+
+        '''
+        if self._buffered:
+            self._file.write(self._buffer[:self._buffered].tobytes())
+            self.written += self._buffered
+            self._buffered = 0
+        self._file.flush()
+
+    def __len__(self):
+        return self.written + self._buffered
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_log(log_file):
+    '''
+    Returns the records of ``log_file`` as a read-only memory-mapped
+    structured array with the fields ``iteration``, ``ssq``, ``time`` and
+    ``params`` (records x vectors x parameters). Records that are still in
+    the buffer of a running recorder are not included.
+
+    '''
+    with open(log_file, 'rb') as file_:
+        dtype = _read_header(file_)
+    number = (os.path.getsize(log_file) - HEADER_SIZE) // dtype.itemsize
+    if number == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(log_file, dtype=dtype, mode='r', offset=HEADER_SIZE,
+                     shape=(number,))
+
+
+def export_csv(log_file, ssq_file='Every_SSQ.csv',
+               vtp_files=('Every_VTP_1.csv', 'Every_VTP_2.csv')):
+    '''
+    Writes the sums of squares of ``log_file`` to ``ssq_file`` and every
+    parameter vector to its file in ``vtp_files``, one row per record, in
+    the format of the original training scripts.
+
+    '''
+    records = read_log(log_file)
+    np.savetxt(ssq_file, records['ssq'][:, np.newaxis], delimiter=',')
+    for index, vtp_file in enumerate(vtp_files):
+        np.savetxt(vtp_file, records['params'][:, index], delimiter=',')
@@ -0,0 +1,268 @@
+'''
+Writing candidate vocal tract parameters into a speaker file.
+
+A :class:`SpeakerTemplate` reads a speaker file (e.g. JD2.speaker or
+child-1y.speaker) once and indexes the ``value`` attribute of every parameter
+of every ``<shape name=...>`` entry by shape and parameter name. Patched
+speaker files are then emitted from the pre-split text of the template,
+without parsing the XML or walking a tree again.
+
+Example::
+
+    template = SpeakerTemplate('JD2.speaker')
+    patcher = template.patcher(['a', 'tt-alveolar-nas(a)'])
+    patcher.write('candidate.speaker', params_a, params_n)
+
+Vocal tract shapes are indexed by their name. Glottis shapes are defined once
+for every glottis model, so they are indexed as ``'<model type>/<name>'``,
+e.g. ``'Triangular glottis/modal'``; their parameters are named by the
+``index`` of the control parameter.
+
+'''
+
+import os
+import re
+
+import numpy as np
+
+
+_TAG = re.compile(r'<glottis_model\b[^>]*?\btype="(?P<model>[^"]*)"'
+                  r'|<shape\s+name="(?P<shape>[^"]*)"'
+                  r'|(?P<end></shape>)'
+                  r'|<(?:control_)?param\b(?P<param>[^>]*)>')
+_ATTRIBUTE = re.compile(r'\b(name|index|value|domi)="([^"]*)"')
+
+
+class SpeakerTemplate(object):
+    '''
+    Index of all shapes and their parameter values in ``speaker_file``.
+
+    '''
+
+    def __init__(self, speaker_file):
+        with open(speaker_file, 'r') as file_:
+            self.text = file_.read()
+        # shape key -> list of (parameter name, start, end) of its values
+        self.shapes = dict()
+        # shape key -> dominance (domi / 100) of its parameters
+        self.dominance = dict()
+        self._patchers = dict()
+        self.shape_names = []
+        self.vocal_tract_shape_names = []
+
+        glottis_model = None
+        shape = None
+        for match in _TAG.finditer(self.text):
+            if match.group('model') is not None:
+                glottis_model = match.group('model')
+            elif match.group('shape') is not None:
+                shape = match.group('shape')
+                if glottis_model is None:
+                    self.vocal_tract_shape_names.append(shape)
+                else:
+                    shape = '%s/%s' % (glottis_model, shape)
+                if shape in self.shapes:
+                    raise ValueError('Shape "%s" defined twice in %s'
+                                     % (shape, speaker_file))
+                self.shape_names.append(shape)
+                self.shapes[shape] = []
+                self.dominance[shape] = []
+            elif match.group('end') is not None:
+                shape = None
+            elif shape is not None:
+                attributes = dict()
+                offset = match.start('param')
+                for attribute in _ATTRIBUTE.finditer(match.group('param')):
+                    attributes[attribute.group(1)] = (
+                        attribute.group(2), offset + attribute.start(2),
+                        offset + attribute.end(2))
+                name = attributes.get('name', attributes.get('index'))[0]
+                __, start, end = attributes['value']
+                self.shapes[shape].append((name, start, end))
+                self.dominance[shape].append(
+                    float(attributes.get('domi', ('100',))[0]) / 100.0)
+
+    def param_names(self, shape):
+        '''
+        Returns the parameter names of ``shape`` in file order.
+
+        '''
+        return [name for name, __, __ in self._shape(shape)]
+
+    def get_params(self, shape):
+        '''
+        Returns the parameter values of ``shape`` as stored in the template.
+
+        '''
+        return np.array([float(self.text[start:end])
+                         for __, start, end in self._shape(shape)])
+
+    def get_dominance(self, shape):
+        '''
+        Returns the dominance (0 to 1) of the parameters of ``shape`` over
+        the underlying vowel (1 where the file does not give one).
+
+        '''
+        self._shape(shape)
+        return np.array(self.dominance[shape])
+
+    def patcher(self, shapes):
+        '''
+        Returns a :class:`SpeakerPatcher` that writes parameter vectors into
+        the given ``shapes`` (a list of shape names).
+
+        '''
+        shapes = tuple(shapes)
+        if shapes not in self._patchers:
+            self._patchers[shapes] = SpeakerPatcher(self, shapes)
+        return self._patchers[shapes]
+
+    def render(self, params):
+        '''
+        Returns the speaker file text with the shapes of the dict ``params``
+        (shape name -> parameter vector) replaced.
+
+        '''
+        shapes = list(params)
+        return self.patcher(shapes).render(*[params[shape] for shape in shapes])
+
+    def write(self, output_file, params):
+        '''
+        Writes the speaker file with the shapes of the dict ``params``
+        (shape name -> parameter vector) replaced to ``output_file``.
+
+        '''
+        with open(output_file, 'w') as file_:
+            file_.write(self.render(params))
+
+    def _shape(self, shape):
+        try:
+            return self.shapes[shape]
+        except KeyError:
+            raise ValueError('Shape "%s" not in the speaker file!' % shape)
+
+
+class SpeakerPatcher(object):
+    '''
+    Pre-split text of a :class:`SpeakerTemplate` for a fixed list of shapes.
+
+    The template text is cut at the parameter values of ``shapes``, so a
+    patched file is the fragments joined with the formatted values of the
+    new parameter vectors.
+
+    '''
+
+    def __init__(self, template, shapes):
+        self.shapes = list(shapes)
+        slots = []
+        for index, shape in enumerate(self.shapes):
+            for position, (__, start, end) in enumerate(template._shape(shape)):
+                slots.append((start, end, index, position))
+        slots.sort()
+
+        self._fragments = []
+        self._slots = []
+        previous = 0
+        for start, end, index, position in slots:
+            self._fragments.append(template.text[previous:start])
+            self._slots.append((index, position))
+            previous = end
+        self._fragments.append(template.text[previous:])
+        # keep the template values of parameters that are not patched
+        self._defaults = [template.text[start:end] for start, end, __, __ in slots]
+        self._sizes = [len(template.shapes[shape]) for shape in self.shapes]
+
+    def render(self, *params):
+        '''
+        Returns the speaker file text with one parameter vector per shape.
+        A vector shorter than the number of parameters of its shape only
+        replaces the leading parameters.
+
+        '''
+        if len(params) != len(self.shapes):
+            raise ValueError('Expected %i parameter vectors, got %i'
+                             % (len(self.shapes), len(params)))
+        values = []
+        for vector, size in zip(params, self._sizes):
+            vector = np.asarray(vector, dtype=float).tolist()[:size]
+            values.append([repr(value) for value in vector])
+
+        pieces = []
+        for fragment, default, (index, position) in zip(self._fragments,
+                                                        self._defaults,
+                                                        self._slots):
+            pieces.append(fragment)
+            shape_values = values[index]
+            if position < len(shape_values):
+                pieces.append(shape_values[position])
+            else:
+                pieces.append(default)
+        pieces.append(self._fragments[-1])
+        return ''.join(pieces)
+
+    def write(self, output_file, *params):
+        '''
+        Writes the speaker file with one parameter vector per shape to
+        ``output_file``.
+
+        '''
+        with open(output_file, 'w') as file_:
+            file_.write(self.render(*params))
+
+
+def default_shapes(template):
+    '''
+    Returns the names of the shapes that hold the /a/ (first) and /n/ (41st)
+    parameters in the speaker files of the nanana training.
+
+    '''
+    return (template.vocal_tract_shape_names[0],
+            template.vocal_tract_shape_names[40])
+
+
+# templates already read by update_speaker_file, keyed by path: (mtime,
+# template, shapes written into the file since it was read, or None)
+_templates = dict()
+
+
+def _template(speaker_file, shapes=None):
+    # a template whose file was patched in place is only reused for the
+    # same shapes: the values of other patched shapes are not in its text
+    speaker_file = os.path.abspath(speaker_file)
+    mtime = os.path.getmtime(speaker_file)
+    cached = _templates.get(speaker_file)
+    if cached is not None and shapes is None:
+        shapes = tuple(default_shapes(cached[1]))
+    if (cached is None or cached[0] != mtime
+            or cached[2] not in (None, shapes)):
+        cached = (mtime, SpeakerTemplate(speaker_file), None)
+        _templates[speaker_file] = cached
+    return cached[1]
+
+
+def update_speaker_file(params_1, params_2, speaker_file='nanana.speaker',
+                        output_file=None, shapes=None):
+    '''
+    Takes two sets of vocal tract parameters (numpy arrays) and writes the
+    first 23 parameters of each into two shapes of ``speaker_file``: the
+    named ``shapes`` or, by default, the /a/ (first) and /n/ (41st) vocal
+    tract shape.
+
+    The result is written to ``output_file``, or back to ``speaker_file`` if
+    no output file is given. The speaker file is only parsed again when it
+    was modified, or patched in place with other shapes.
+
+    '''
+    if output_file is None:
+        output_file = speaker_file
+    template = _template(speaker_file,
+                         None if shapes is None else tuple(shapes))
+    if shapes is None:
+        shapes = default_shapes(template)
+    shapes = tuple(shapes)
+    template.patcher(shapes).write(output_file, params_1[:23], params_2[:23])
+    if os.path.abspath(output_file) == os.path.abspath(speaker_file):
+        # only the values of shapes changed, the template is still valid
+        # for patching them again
+        _templates[os.path.abspath(speaker_file)] = (
+            os.path.getmtime(speaker_file), template, shapes)
@@ -0,0 +1,246 @@
+'''
+Incremental synthesis with ``vtlTubeSynthesisReset`` and
+``vtlTubeSynthesisAdd``.
+
+``vtlSynthBlock`` and ``vtlGesToWav`` return audio only once the whole
+utterance is synthesized. A :class:`StreamingSynthesizer` instead takes the
+tube geometry frame by frame, as :class:`TubeFrame` tuples, and returns the
+audio in chunks of ``chunk_size`` samples as soon as they are complete. The
+latency is bounded by one chunk plus one frame.
+
+Every frame sets the tube section lengths (m), areas (m^2) and articulators,
+the incisor position (m), the velum opening (m^2), the aspiration strength
+(dB) and the glottis parameters that the synthesis moves to during the
+frame. :func:`feedback_frames` converts the frames of a feedback file (see
+:mod:`pyvtl.feedback`) to tube frames.
+
+Example::
+
+    with VocalTractLab(speaker_file='JD2.speaker') as vtl:
+        synthesizer = StreamingSynthesizer(vtl, frame_rate=100.0,
+                                           chunk_size=512)
+        for chunk in synthesizer.stream(feedback_frames(
+                read_feedback('feedback.txt'),
+                speaker_velum_opening('JD2.speaker'))):
+            play(chunk)
+
+'''
+
+import asyncio
+import collections
+import re
+
+import numpy as np
+
+from .parameters import VTP_NAMES
+
+
+TubeFrame = collections.namedtuple('TubeFrame', [
+    'length', 'area', 'articulator', 'glottis_params', 'incisor_position',
+    'velum_opening', 'aspiration_strength'])
+# incisor position from the articulators, closed velum, aspiration strength
+# from the glottis parameters
+TubeFrame.__new__.__defaults__ = (None, 0.0, None)
+
+# velum opening (m^2) at the largest velic opening parameter (VO = 1): the
+# max_nasal_port_area of the velum of JD2.speaker (2 cm^2, see
+# speaker_velum_opening); the opening grows linearly with positive VO and is
+# closed for VO <= 0
+MAX_VELUM_OPENING = 2e-4
+_NASAL_PORT_AREA = re.compile(r'<velum\b[^>]*\bmax_nasal_port_area="([^"]*)"')
+_VELIC_OPENING = VTP_NAMES.index('VO')
+
+_INCISORS = ord('I')
+
+
+def _letters(articulator):
+    # articulator letters as uint8, from bytes, str or an array of codes
+    if isinstance(articulator, str):
+        articulator = articulator.encode()
+    if isinstance(articulator, bytes):
+        return np.frombuffer(articulator, dtype=np.uint8)
+    return np.asarray(articulator, dtype=np.uint8)
+
+
+def incisor_position(length, articulator):
+    '''
+    Returns the distance (in the unit of ``length``) from the glottis to
+    the first tube section of the lower incisors, or the tube length if no
+    section belongs to the incisors.
+
+    '''
+    letters = _letters(articulator)
+    incisors = np.flatnonzero(letters == _INCISORS)
+    end = incisors[0] if len(incisors) else len(length)
+    return float(np.sum(length[:end]))
+
+
+def speaker_velum_opening(speaker_file):
+    '''
+    Returns the largest velum opening (m^2) of the speaker in
+    ``speaker_file``: the ``max_nasal_port_area`` (cm^2) of its velum.
+
+    '''
+    with open(speaker_file, 'r') as file_:
+        match = _NASAL_PORT_AREA.search(file_.read())
+    if match is None:
+        raise ValueError('No max_nasal_port_area in %s' % speaker_file)
+    return float(match.group(1)) * 1e-4
+
+
+def velum_opening(tract_params, max_opening=MAX_VELUM_OPENING):
+    '''
+    Returns the velum opening (m^2) of the vocal tract parameters
+    ``tract_params`` (one vector, or frames x parameters), linear in the
+    velic opening parameter VO up to ``max_opening`` at VO = 1.
+
+    '''
+    tract_params = np.asarray(tract_params, dtype=np.float64)
+    return max_opening * np.clip(tract_params[..., _VELIC_OPENING], 0.0, 1.0)
+
+
+def feedback_frames(feedback, max_velum_opening=MAX_VELUM_OPENING):
+    '''
+    Yields a :class:`TubeFrame` for every frame of a
+    :class:`pyvtl.feedback.Feedback` (lengths in cm and areas in cm^2 are
+    converted to m and m^2). The velum opening follows the velic opening
+    parameter of the frame, see :func:`velum_opening`; the default
+    ``max_velum_opening`` is the one of JD2.speaker, for other speakers pass
+    :func:`speaker_velum_opening`. Feedback files have 100 frames per second.
+
+    '''
+    openings = velum_opening(feedback.tract_params, max_velum_opening)
+    for length, area, articulator, glottis_params, opening in zip(
+            feedback.lengths, feedback.areas, feedback.articulators,
+            feedback.glottis_params, openings):
+        length = length.astype(np.float64) * 1e-2
+        yield TubeFrame(length, area.astype(np.float64) * 1e-4,
+                        articulator, glottis_params,
+                        incisor_position(length, articulator), float(opening))
+
+
+class StreamingSynthesizer(object):
+    '''
+    Synthesizes tube frames incrementally on an initialized
+    :class:`pyvtl.api.VocalTractLab` ``vtl``.
+
+    Parameters:
+
+    * frame_rate -- tube frames per second (100 for feedback files)
+    * chunk_size -- number of samples of the returned audio chunks
+    * restart -- ``vtlTubeSynthesisReset`` does not reset the glottis model,
+      so an utterance starts in the state the previous one ended in; with
+      ``restart=True`` the synthesizer is initialized again (about 40 ms)
+      before every utterance but the first, so that all start at rest
+
+    '''
+
+    def __init__(self, vtl, frame_rate=200.0, chunk_size=1024, restart=True):
+        self.vtl = vtl
+        self.frame_rate = frame_rate
+        self.chunk_size = chunk_size
+        self.restart = restart
+        self.samples = None
+        self.sampling_rate = vtl.audio_sampling_rate
+        names = vtl.glottis_param_names
+        self._aspiration_index = (names.index('aspiration_strength')
+                                  if 'aspiration_strength' in names else None)
+        self.reset()
+
+    def reset(self):
+        '''
+        Starts a new utterance.
+
+        '''
+        if self.restart and self.samples:
+            self.vtl.close()
+            self.vtl.initialize(self.vtl.speaker_file)
+        self.vtl.tube_synthesis_reset()
+        self.frames = 0
+        self.samples = 0
+        self._chunk = np.zeros(self.chunk_size)
+        self._filled = 0
+
+    def add(self, frame):
+        '''
+        Synthesizes one :class:`TubeFrame` and returns the list of audio
+        chunks completed by it (often empty).
+
+        '''
+        self.frames += 1
+        number_samples = (int(round(self.frames * self.sampling_rate
+                                    / self.frame_rate)) - self.samples)
+        if number_samples <= 0:
+            return []
+        articulator = _letters(frame.articulator)
+        position = frame.incisor_position
+        if position is None:
+            position = incisor_position(frame.length, articulator)
+        aspiration = frame.aspiration_strength
+        if aspiration is None:
+            aspiration = (frame.glottis_params[self._aspiration_index]
+                          if self._aspiration_index is not None else -40.0)
+        audio = self.vtl.tube_synthesis_add(
+            number_samples, frame.length, frame.area, articulator, position,
+            frame.velum_opening, aspiration, frame.glottis_params, copy=False)
+        self.samples += number_samples
+        return self._collect(audio)
+
+    def _collect(self, audio):
+        chunks = []
+        while len(audio):
+            take = min(len(audio), self.chunk_size - self._filled)
+            self._chunk[self._filled:self._filled + take] = audio[:take]
+            self._filled += take
+            audio = audio[take:]
+            if self._filled == self.chunk_size:
+                chunks.append(self._chunk)
+                self._chunk = np.zeros(self.chunk_size)
+                self._filled = 0
+        return chunks
+
+    def flush(self):
+        '''
+        Returns the samples of the incomplete last chunk.
+
+        '''
+        chunk = self._chunk[:self._filled].copy()
+        self._filled = 0
+        return chunk
+
+    def stream(self, frames):
+        '''
+        Yields the audio chunks of the iterable ``frames`` while they are
+        synthesized, the incomplete last chunk included.
+
+        '''
+        self.reset()
+        for frame in frames:
+            for chunk in self.add(frame):
+                yield chunk
+        chunk = self.flush()
+        if len(chunk):
+            yield chunk
+
+    async def astream(self, frames):
+        '''
+        Asynchronous :meth:`stream` for an iterable or asynchronous iterable
+        of ``frames``; the synthesis runs in the default executor of the
+        event loop.
+
+        '''
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.reset)
+        if not hasattr(frames, '__aiter__'):
+            frames = _aiter(frames)
+        async for frame in frames:
+            for chunk in await loop.run_in_executor(None, self.add, frame):
+                yield chunk
+        chunk = self.flush()
+        if len(chunk):
+            yield chunk
+
+
+async def _aiter(iterable):
+    for item in iterable:
+        yield item
@@ -0,0 +1,238 @@
+'''
+Surrogate pre-screening of candidates before synthesis.
+
+Almost every candidate of the random search is rejected after a full
+synthesis and MFCC comparison. A :class:`SurrogateScreen` predicts the sum
+of squares of every candidate with an online k-nearest-neighbour regression
+(:class:`KNNSurrogate`) over the candidates evaluated so far and only sends
+the competitive ones to synthesis: those predicted below the incumbent plus
+a ``margin``. A random ``exploration`` fraction of the rejected candidates
+is evaluated anyway. These explored candidates are an unbiased sample of
+the screen's decisions, so they give its precision and recall: how many of
+the candidates it passes beat the incumbent, and how many of the candidates
+that beat the incumbent it passes.
+
+Example (as in banana.py, outside of the memo)::
+
+    screen = SurrogateScreen(KNNSurrogate(), margin=0.1, exploration=0.1)
+    ssq = screen.evaluate(batch_1, batch_2, current_sum_of_squares,
+                          lambda selected: evaluator.evaluate(
+                              [batch_1[j] for j in selected],
+                              [batch_2[j] for j in selected]))
+    screen.stats()['recall']
+
+Skipped candidates get a sum of squares of NaN. The surrogate can be warmed
+up from a run log (see :mod:`pyvtl.runlog`)::
+
+    records = read_log('nanana.runlog')
+    screen.surrogate.add(records['ssq'], records['params'][:, 0],
+                         records['params'][:, 1])
+
+'''
+
+import numpy as np
+
+from .checkpoint import generator_state, set_generator_state
+from .parameters import VTP_max_min
+
+
+class KNNSurrogate(object):
+    '''
+    Inverse distance weighted k-nearest-neighbour regression of the sum of
+    squares over candidates scaled to the unit cube.
+
+    Parameters:
+
+    * ranges -- [min, max] row per parameter of every vector (default:
+      ``VTP_max_min``); fixed parameters are ignored
+    * k -- number of neighbours
+    * maxsize -- number of observations kept; the oldest are replaced
+
+    '''
+
+    def __init__(self, ranges=VTP_max_min, k=8, maxsize=20000):
+        ranges = np.asarray(ranges, dtype=float)
+        self.lower = ranges.min(axis=1)
+        span = ranges.max(axis=1) - self.lower
+        self.free = span > 0
+        self.span = span[self.free]
+        self.lower = self.lower[self.free]
+        self.k = k
+        self.maxsize = maxsize
+        self._points = None
+        self._values = np.zeros(maxsize)
+        self.size = 0
+        self.added = 0
+
+    def features(self, *params):
+        '''
+        Returns the candidates made of the vectors ``params`` (one N x 24
+        matrix per vector) scaled to the unit cube (N x free parameters).
+
+        '''
+        return np.hstack([(np.atleast_2d(vector)[:, self.free] - self.lower)
+                          / self.span for vector in params])
+
+    def add(self, values, *params):
+        '''
+        Adds the evaluated candidates ``params`` with their sums of squares
+        ``values``; candidates without a finite value (e.g. skipped ones in a
+        run log) are ignored.
+
+        '''
+        values = np.asarray(values, dtype=float)
+        finite = np.isfinite(values)
+        points = self.features(*params)[finite]
+        values = values[finite]
+        if self._points is None:
+            self._points = np.zeros((self.maxsize, points.shape[1]))
+        for point, value in zip(points[-self.maxsize:],
+                                values[-self.maxsize:]):
+            slot = self.added % self.maxsize
+            self._points[slot] = point
+            self._values[slot] = value
+            self.added += 1
+        self.size = min(self.added, self.maxsize)
+
+    def predict(self, *params):
+        '''
+        Returns the predicted sums of squares of the candidates ``params``.
+
+        '''
+        points = self.features(*params)
+        if self.size == 0:
+            return np.full(len(points), np.nan)
+        stored = self._points[:self.size]
+        distances = (np.sum(points**2, axis=1)[:, np.newaxis]
+                     + np.sum(stored**2, axis=1)
+                     - 2 * points @ stored.T)
+        distances = np.sqrt(np.maximum(distances, 0.0))
+        k = min(self.k, self.size)
+        nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        rows = np.arange(len(points))[:, np.newaxis]
+        weights = 1.0 / np.maximum(distances[rows, nearest], 1e-12)
+        values = self._values[:self.size][nearest]
+        return np.sum(weights * values, axis=1) / np.sum(weights, axis=1)
+
+
+class SurrogateScreen(object):
+    '''
+    Sends only competitive candidates (and an exploration fraction of the
+    others) to the evaluation.
+
+    Parameters:
+
+    * surrogate -- regression model with ``add(values, *params)`` and
+      ``predict(*params)``, e.g. :class:`KNNSurrogate`
+    * margin -- candidates predicted below ``incumbent * (1 + margin)`` are
+      competitive
+    * exploration -- fraction of the other candidates evaluated anyway
+    * min_observations -- all candidates are evaluated until the surrogate
+      has seen this many
+    * seed -- seed of the random selection of the explored candidates, or
+      a ``np.random.Generator``
+
+    '''
+
+    def __init__(self, surrogate, margin=0.1, exploration=0.1,
+                 min_observations=200, seed=None):
+        self.surrogate = surrogate
+        self.margin = margin
+        self.exploration = exploration
+        self.min_observations = min_observations
+        self.random = np.random.default_rng(seed)
+        self.candidates = 0
+        self.evaluated = 0
+        # decisions of the screen against the truth, on the explored sample
+        self.true_positives = 0
+        self.false_positives = 0
+        self.false_negatives = 0
+        self.true_negatives = 0
+
+    def select(self, incumbent, *params):
+        '''
+        Returns ``(selected, passed, explored)`` boolean arrays for the
+        candidates ``params``: the ones to evaluate, the ones the screen
+        passes, and the randomly explored ones (among all candidates).
+
+        '''
+        number = len(params[0])
+        explored = self.random.random(number) < self.exploration
+        if self.surrogate.size < self.min_observations:
+            passed = np.ones(number, dtype=bool)
+        else:
+            predicted = self.surrogate.predict(*params)
+            passed = predicted < incumbent * (1 + self.margin)
+        return passed | explored, passed, explored
+
+    def evaluate(self, params_1, params_2, incumbent, compute):
+        '''
+        Returns the sums of squares of the candidates ``zip(params_1,
+        params_2)``, NaN for skipped ones. The selected candidates are
+        evaluated in one call of ``compute(selected)``, where ``selected``
+        is the list of their indices; their results train the surrogate.
+
+        '''
+        selected, passed, explored = self.select(incumbent, params_1,
+                                                 params_2)
+        indices = list(np.flatnonzero(selected))
+        values = np.full(len(selected), np.nan)
+        if indices:
+            values[indices] = compute(indices)
+            self.surrogate.add(values[indices],
+                               np.asarray(params_1)[indices],
+                               np.asarray(params_2)[indices])
+        self.candidates += len(selected)
+        self.evaluated += len(indices)
+
+        good = values < incumbent
+        sample = explored
+        self.true_positives += int(np.sum(sample & passed & good))
+        self.false_positives += int(np.sum(sample & passed & ~good))
+        self.false_negatives += int(np.sum(sample & ~passed & good))
+        self.true_negatives += int(np.sum(sample & ~passed & ~good))
+        return values
+
+    @property
+    def precision(self):
+        passed = self.true_positives + self.false_positives
+        return self.true_positives / float(passed) if passed else np.nan
+
+    @property
+    def recall(self):
+        good = self.true_positives + self.false_negatives
+        return self.true_positives / float(good) if good else np.nan
+
+    def stats(self):
+        '''
+        Returns the counts, the fraction of skipped candidates and the
+        precision and recall of the screen as a dict.
+
+        '''
+        skipped = self.candidates - self.evaluated
+        return dict(candidates=self.candidates,
+                    evaluated=self.evaluated,
+                    skipped=skipped,
+                    skip_rate=(skipped / float(self.candidates)
+                               if self.candidates else 0.0),
+                    true_positives=self.true_positives,
+                    false_positives=self.false_positives,
+                    false_negatives=self.false_negatives,
+                    true_negatives=self.true_negatives,
+                    precision=self.precision,
+                    recall=self.recall)
+
+    def state(self):
+        '''
+        Returns the state of the random generator, see
+        :func:`pyvtl.checkpoint.generator_state`.
+
+        '''
+        return generator_state(self.random)
+
+    def set_state(self, state):
+        '''
+        Continues the random selection from a :meth:`state`.
+
+        '''
+        set_generator_state(self.random, state)
@@ -0,0 +1,402 @@
+'''
+Lightweight instrumentation of the training loop.
+
+The module level functions record into the current :class:`Telemetry`,
+which :func:`configure` creates. Until then, and after :func:`disable`,
+they return immediately: :func:`stage` returns a shared no-op context
+manager, so instrumented code costs one function call per stage.
+
+A :class:`Telemetry` keeps for every stage the total count, wall and CPU
+time and the wall times of the last ``window`` calls in a
+:class:`RollingMetric` (ring buffer with a rolling histogram). Counters
+(e.g. evaluations) are turned into rates at every flush, and gauges (e.g.
+cache hit rates, worker utilization) keep their last value and a rolling
+history. :meth:`Telemetry.maybe_flush` writes a snapshot every
+``interval`` seconds, including the resident memory of the process: in
+the Prometheus text format (the file is replaced atomically, as for the
+textfile collector of the node exporter) or as one JSON line per snapshot.
+
+Example::
+
+    telemetry.configure('nanana.prom', interval=60.0)
+    for batch in batches:
+        with telemetry.stage('synthesis'):
+            ssq = evaluator.evaluate(batch_1, batch_2)
+        telemetry.count('evaluations', len(ssq))
+        telemetry.gauge('memo_hit_rate', memo.hit_rate)
+        telemetry.maybe_flush()
+    telemetry.close()
+
+'''
+
+import bisect
+import collections
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+
+# upper bucket edges (s) of the rolling histograms: 3 per decade
+DEFAULT_EDGES = np.logspace(-6, 3, 28)
+
+FORMATS = ('prometheus', 'jsonl')
+
+
+class RollingMetric(object):
+    '''
+    The last ``window`` values of a metric in a ring buffer, with a
+    histogram over them (counts below every edge of ``edges`` and above the
+    last one).
+
+    '''
+
+    def __init__(self, window=1024, edges=DEFAULT_EDGES):
+        self.values = np.zeros(window)
+        self.edges = np.asarray(edges, dtype=float)
+        self._edges = self.edges.tolist()  # bisect is faster on lists
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        self.size = 0
+        self._next = 0
+
+    def add(self, value):
+        '''
+        Adds ``value``; the oldest value leaves the window once it is full.
+
+        '''
+        if self.size == len(self.values):
+            old = self.values[self._next]
+            self.counts[bisect.bisect_left(self._edges, old)] -= 1
+        else:
+            self.size += 1
+        self.values[self._next] = value
+        self.counts[bisect.bisect_left(self._edges, value)] += 1
+        self._next = (self._next + 1) % len(self.values)
+
+    def last(self):
+        '''
+        Returns the last value (NaN while the window is empty).
+
+        '''
+        if self.size == 0:
+            return float('nan')
+        return float(self.values[(self._next - 1) % len(self.values)])
+
+    def window(self):
+        '''
+        Returns the values in the window, oldest first.
+
+        '''
+        if self.size < len(self.values):
+            return self.values[:self.size].copy()
+        return np.roll(self.values, -self._next)
+
+    def quantiles(self, quantiles=(0.5, 0.9, 0.99)):
+        '''
+        Returns the ``quantiles`` of the window (NaN while it is empty).
+
+        '''
+        if self.size == 0:
+            return [float('nan')] * len(quantiles)
+        return np.quantile(self.values[:self.size], quantiles).tolist()
+
+    def histogram(self):
+        '''
+        Returns ``(edges, counts)``: the cumulative counts of the window
+        below every edge, as in a Prometheus histogram, and the total.
+
+        '''
+        return self.edges, np.cumsum(self.counts)
+
+
+class _Stage(object):
+    # timer of one stage; reused for every call of the stage
+
+    def __init__(self, window):
+        self.count = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.rolling = RollingMetric(window)
+
+    def __enter__(self):
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        wall = time.perf_counter() - self._wall
+        self.cpu += time.process_time() - self._cpu
+        self.wall += wall
+        self.count += 1
+        self.rolling.add(wall)
+
+
+class _NullStage(object):
+    # stage of disabled telemetry
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+def resident_memory():
+    '''
+    Returns the resident set size of the process in bytes (the peak where
+    the current one is not available, 0 where neither is, e.g. on Windows).
+
+    '''
+    if sys.platform.startswith('linux'):
+        try:
+            with open('/proc/self/statm') as file_:
+                pages = int(file_.read().split()[1])
+            return pages * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError):
+            pass
+    try:
+        import resource  # not available on Windows
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Telemetry(object):
+    '''
+    Stage timers, counters and gauges with periodic snapshots to
+    ``metrics_file``.
+
+    Parameters:
+
+    * format -- 'prometheus' (the file holds the last snapshot) or 'jsonl'
+      (one line is appended per snapshot)
+    * interval -- seconds between the snapshots of :meth:`maybe_flush`
+    * window -- number of values in the rolling windows
+    * prefix -- prefix of the Prometheus metric names
+
+    '''
+
+    def __init__(self, metrics_file, format='prometheus', interval=60.0,
+                 window=1024, prefix='pyvtl'):
+        if format not in FORMATS:
+            raise ValueError('Unknown format %r, use one of %s'
+                             % (format, ', '.join(FORMATS)))
+        self.metrics_file = metrics_file
+        self.format = format
+        self.interval = interval
+        self.window = window
+        self.prefix = prefix
+        self.stages = collections.OrderedDict()
+        self.counters = collections.OrderedDict()
+        self.gauges = collections.OrderedDict()
+        self.rates = collections.OrderedDict()
+        self.start = time.time()
+        self._last_flush = time.perf_counter()
+        self._last_counts = dict()
+
+    def stage(self, name):
+        '''
+        Returns the context manager that times the stage ``name``.
+
+        '''
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = _Stage(self.window)
+        return stage
+
+    def count(self, name, number=1):
+        '''
+        Adds ``number`` to the counter ``name``.
+
+        '''
+        self.counters[name] = self.counters.get(name, 0) + number
+
+    def gauge(self, name, value):
+        '''
+        Sets the gauge ``name`` to ``value``.
+
+        '''
+        rolling = self.gauges.get(name)
+        if rolling is None:
+            rolling = self.gauges[name] = RollingMetric(self.window)
+        rolling.add(value)
+
+    def maybe_flush(self):
+        '''
+        Writes a snapshot if the last one is ``interval`` seconds old.
+
+        '''
+        if time.perf_counter() - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        '''
+        Writes a snapshot now.
+
+        '''
+        now = time.perf_counter()
+        elapsed = now - self._last_flush
+        for name, count in self.counters.items():
+            rate = ((count - self._last_counts.get(name, 0)) / elapsed
+                    if elapsed > 0 else 0.0)
+            rolling = self.rates.get(name)
+            if rolling is None:
+                rolling = self.rates[name] = RollingMetric(self.window)
+            rolling.add(rate)
+            self._last_counts[name] = count
+        self._last_flush = now
+        if self.format == 'prometheus':
+            _replace(self.metrics_file, self.prometheus())
+        else:
+            with open(self.metrics_file, 'a') as file_:
+                file_.write(json.dumps(self.snapshot()) + '\n')
+
+    def snapshot(self):
+        '''
+        Returns the current state as a dict.
+
+        '''
+        stages = collections.OrderedDict()
+        for name, stage in self.stages.items():
+            p50, p90, p99 = stage.rolling.quantiles()
+            edges, counts = stage.rolling.histogram()
+            stages[name] = dict(count=stage.count, wall=stage.wall,
+                                cpu=stage.cpu, p50=p50, p90=p90, p99=p99,
+                                histogram=dict(zip(['%g' % edge
+                                                    for edge in edges]
+                                                   + ['+Inf'],
+                                                   counts.tolist())))
+        return dict(time=time.time(), uptime=time.time() - self.start,
+                    resident_memory=resident_memory(), stages=stages,
+                    counters=dict(self.counters),
+                    rates=dict((name, rolling.last())
+                               for name, rolling in self.rates.items()),
+                    gauges=dict((name, rolling.last())
+                                for name, rolling in self.gauges.items()))
+
+    def prometheus(self):
+        '''
+        Returns the current state in the Prometheus text format.
+
+        '''
+        prefix = self.prefix
+        lines = ['# TYPE %s_uptime_seconds gauge' % prefix,
+                 '%s_uptime_seconds %r' % (prefix, time.time() - self.start),
+                 '# TYPE %s_resident_memory_bytes gauge' % prefix,
+                 '%s_resident_memory_bytes %i' % (prefix, resident_memory())]
+        if self.stages:
+            lines.append('# TYPE %s_stage_seconds summary' % prefix)
+            for name, stage in self.stages.items():
+                for quantile, value in zip(
+                        ('0.5', '0.9', '0.99'), stage.rolling.quantiles()):
+                    lines.append('%s_stage_seconds{stage="%s",quantile="%s"} '
+                                 '%r' % (prefix, name, quantile, value))
+                lines.append('%s_stage_seconds_sum{stage="%s"} %r'
+                             % (prefix, name, stage.wall))
+                lines.append('%s_stage_seconds_count{stage="%s"} %i'
+                             % (prefix, name, stage.count))
+            lines.append('# TYPE %s_stage_cpu_seconds_total counter' % prefix)
+            for name, stage in self.stages.items():
+                lines.append('%s_stage_cpu_seconds_total{stage="%s"} %r'
+                             % (prefix, name, stage.cpu))
+        for name, count in self.counters.items():
+            lines.append('# TYPE %s_%s_total counter' % (prefix, name))
+            lines.append('%s_%s_total %r' % (prefix, name, count))
+        for kind, metrics in (('per_second', self.rates), ('', self.gauges)):
+            for name, rolling in metrics.items():
+                metric = '_'.join(part for part in (prefix, name, kind)
+                                  if part)
+                lines.append('# TYPE %s gauge' % metric)
+                lines.append('%s %r' % (metric, rolling.last()))
+        return '\n'.join(lines) + '\n'
+
+    def close(self):
+        '''
+        Writes a last snapshot.
+
+        '''
+        self.flush()
+
+
+def _replace(file_name, text):
+    # atomic replacement, so that readers never see a partial snapshot
+    directory = os.path.dirname(os.path.abspath(file_name))
+    file_, temporary = tempfile.mkstemp(suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(file_, 'w') as stream:
+            stream.write(text)
+        os.replace(temporary, file_name)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+# the current Telemetry; None while disabled
+_current = None
+
+
+def configure(metrics_file, format='prometheus', interval=60.0, window=1024):
+    '''
+    Enables the telemetry with a new :class:`Telemetry` and returns it.
+
+    '''
+    global _current
+    _current = Telemetry(metrics_file, format, interval, window)
+    return _current
+
+
+def disable():
+    '''
+    Disables the telemetry; recorded values are dropped.
+
+    '''
+    global _current
+    _current = None
+
+
+def enabled():
+    return _current is not None
+
+
+def stage(name):
+    '''
+    Context manager that times the stage ``name``.
+
+    '''
+    if _current is None:
+        return _NULL_STAGE
+    return _current.stage(name)
+
+
+def count(name, number=1):
+    if _current is not None:
+        _current.count(name, number)
+
+
+def gauge(name, value):
+    if _current is not None:
+        _current.gauge(name, value)
+
+
+def maybe_flush():
+    if _current is not None:
+        _current.maybe_flush()
+
+
+def close():
+    '''
+    Writes a last snapshot and disables the telemetry.
+
+    '''
+    global _current
+    if _current is not None:
+        _current.close()
+        _current = None
@@ -0,0 +1,133 @@
+'''
+Thread-parallel synthesis with several independently loaded copies of the
+VocalTractLab library.
+
+One library can only run one synthesis at a time, because ``vtlInitialize``
+and ``vtlClose`` act on a single global synthesizer. ``ctypes`` releases the
+GIL during foreign calls, so N private copies of the binary (see
+:func:`pyvtl.library.load_private_copy`) driven from N threads synthesize in
+parallel inside one process, without the memory and pickling overhead of a
+process pool.
+
+Example::
+
+    with SynthesisPool('JD2.speaker', threads=4) as pool:
+        futures = [pool.synth_block(tract, glottis, 200.0)
+                   for tract, glottis in sequences]
+        signals = [future.result()[0] for future in futures]
+
+'''
+
+import concurrent.futures
+import os
+import queue
+import shutil
+import tempfile
+
+from . import api
+
+
+class _Instance(api.VocalTractLab):
+    '''
+    One private copy of the library with an initialized speaker.
+
+    '''
+
+    def __init__(self, library_path, speaker_file, directory):
+        super(_Instance, self).__init__(library_path, speaker_file,
+                                        private=True, directory=directory)
+
+
+class SynthesisPool(object):
+    '''
+    Runs VocalTractLab calls concurrently on ``threads`` private copies of
+    the library, each initialized with ``speaker_file``.
+
+    Every call returns a :class:`concurrent.futures.Future`; a call runs as
+    soon as one of the library copies is free.
+
+    Parameters:
+
+    * threads -- number of library copies and threads (default: all cores)
+    * library_path -- VocalTractLab binary (default: the one in vtlapi-2.1b)
+    * scratch_dir -- directory in which the library copies are stored
+      (default: the system temp directory)
+
+    '''
+
+    def __init__(self, speaker_file, threads=None, library_path=None,
+                 scratch_dir=None):
+        self.speaker_file = os.path.abspath(speaker_file)
+        self.threads = threads or os.cpu_count() or 1
+        self.scratch_dir = tempfile.mkdtemp(prefix='vtl-libs-', dir=scratch_dir)
+        self._instances = queue.Queue()
+        for ii in range(self.threads):
+            self._instances.put(_Instance(library_path, self.speaker_file,
+                                          self.scratch_dir))
+        self._executor = concurrent.futures.ThreadPoolExecutor(self.threads)
+
+        instance = self._instances.queue[0]
+        self.audio_sampling_rate = instance.audio_sampling_rate
+        self.number_tube_sections = instance.number_tube_sections
+        self.number_vocal_tract_parameters = instance.number_vocal_tract_parameters
+        self.number_glottis_parameters = instance.number_glottis_parameters
+
+    def _run(self, method_name, *args):
+        instance = self._instances.get()
+        try:
+            return getattr(instance, method_name)(*args)
+        finally:
+            self._instances.put(instance)
+
+    def synth_block(self, tract_params, glottis_params, frame_rate=200.0):
+        '''
+        ``vtlSynthBlock`` for the frames x params matrices ``tract_params``
+        and ``glottis_params``. The future resolves to ``(audio, tube_areas,
+        tube_articulators)`` as returned by
+        :meth:`pyvtl.api.VocalTractLab.synth_block`.
+
+        '''
+        return self._executor.submit(self._run, 'synth_block', tract_params,
+                                     glottis_params, frame_rate)
+
+    def ges_to_wav(self, gesture_file, wav_file, feedback_file=None,
+                   speaker_file=None):
+        '''
+        ``vtlGesToWav`` for ``gesture_file``, with the speaker of the pool
+        unless another ``speaker_file`` is given. The future resolves to
+        ``None`` once ``wav_file`` is written.
+
+        '''
+        if speaker_file is None:
+            speaker_file = self.speaker_file
+        return self._executor.submit(self._run, 'ges_to_wav',
+                                     os.path.abspath(speaker_file),
+                                     os.path.abspath(gesture_file),
+                                     os.path.abspath(wav_file),
+                                     feedback_file and os.path.abspath(feedback_file))
+
+    def get_transfer_function(self, tract_params, num_spectrum_samples=1024):
+        '''
+        ``vtlGetTransferFunction`` for one vector of vocal tract parameters.
+        The future resolves to ``(magnitude_spectrum, phase_spectrum)``.
+
+        '''
+        return self._executor.submit(self._run, 'get_transfer_function',
+                                     tract_params, num_spectrum_samples)
+
+    def close(self):
+        '''
+        Waits for all pending calls, shuts down the synthesizers and removes
+        the library copies.
+
+        '''
+        self._executor.shutdown(wait=True)
+        while not self._instances.empty():
+            self._instances.get().close()
+        shutil.rmtree(self.scratch_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,261 @@
+'''
+Tract and glottis parameter sequences for ``vtlSynthBlock`` from keyframes.
+
+A keyframe is a ``(time, target)`` pair. Tract targets are shape names of
+the speaker (looked up once with ``vtlGetTractParams``) or parameter
+vectors; F0 and subglottal pressure targets are numbers. The frames x
+params matrices are computed column-wise in one step for all frames, with
+one of two interpolations:
+
+* ``'linear'`` -- the parameters move linearly from keyframe to keyframe
+* ``'target'`` -- target approximation: every parameter approaches the
+  target of the next keyframe as a critically damped second order system
+  with the time constant ``time_constant``, starting with the state
+  (position and velocity) reached at the previous keyframe
+
+Before the first and after the last keyframe the parameters keep the value
+of that keyframe. The subglottal pressure of the first frames is scaled by
+``PRESSURE_ONSET``: VocalTractLab produces a transient at the start of the
+audio unless the pressure stays at zero for two frames (see
+vtlapi-2.1b/example1.py).
+
+Example (the /a/ to /i/ transition of example1.py)::
+
+    with VocalTractLab(speaker_file='JD2.speaker') as vtl:
+        builder = TrajectoryBuilder(vtl)
+        tract, glottis = builder.build([(0.0, 'a'), (0.995, 'i')], 1.0,
+                                       f0=[(0.0, 120.0), (1.0, 100.0)])
+        audio = vtl.synth_block(tract, glottis, builder.frame_rate)[0]
+
+'''
+
+import numpy as np
+
+
+# factors of the subglottal pressure of the first frames
+PRESSURE_ONSET = (0.0, 0.0, 0.5)
+# index of F0 and subglottal pressure in the glottis parameters
+F0_INDEX = 0
+PRESSURE_INDEX = 1
+
+
+def _keyframes(keyframes):
+    # sorted key times and the K x P matrix of the targets
+    keyframes = sorted(keyframes, key=lambda keyframe: keyframe[0])
+    times = np.array([time for time, __ in keyframes], dtype=float)
+    values = np.array([np.atleast_1d(value) for __, value in keyframes],
+                      dtype=float)
+    return times, values
+
+
+def linear(times, values, frame_times):
+    '''
+    Returns the ``values`` (K x P) at the key ``times`` linearly
+    interpolated at ``frame_times`` (frames x P).
+
+    '''
+    if len(times) == 1:
+        return np.repeat(values, len(frame_times), axis=0)
+    frame_times = np.clip(frame_times, times[0], times[-1])
+    index = np.clip(np.searchsorted(times, frame_times, side='right') - 1,
+                    0, len(times) - 2)
+    span = times[index + 1] - times[index]
+    weight = np.divide(frame_times - times[index], span,
+                       out=np.ones_like(span), where=span > 0)[:, np.newaxis]
+    return (1 - weight) * values[index] + weight * values[index + 1]
+
+
+def _binomials(order):
+    # C(j, i) for j, i < order
+    binomials = np.zeros((order, order))
+    for j in range(order):
+        binomials[j, 0] = 1.0
+        for i in range(1, j + 1):
+            binomials[j, i] = binomials[j - 1, i - 1] + binomials[j - 1, i]
+    return binomials
+
+
+def target_approximation(times, values, frame_times, time_constant=0.015,
+                         order=2, slopes=None):
+    '''
+    Returns the trajectories (frames x P) at ``frame_times`` that approach
+    the target ``values[k]`` (K x P) between ``times[k - 1]`` and
+    ``times[k]`` as critically damped systems of ``order`` with
+    ``time_constant`` seconds, starting at rest at ``values[0]``.
+    ``time_constant`` can also hold one time constant per key time,
+    ``time_constant[k]`` being used while target ``k`` is approached.
+
+    With ``slopes`` (K or K x P, per second) the target of segment ``k`` is
+    the line ``values[k] + slopes[k] * (t - times[k])``, which reaches
+    ``values[k]`` at the end of the segment (as the F0 targets of
+    VocalTractLab's gestural scores).
+
+    '''
+    if len(times) == 1:
+        return np.repeat(values, len(frame_times), axis=0)
+    rate = 1.0 / np.asarray(time_constant, dtype=float)
+    if rate.ndim == 0:
+        rate = np.full(len(times), float(rate))
+    rate = rate[:, np.newaxis]
+    if slopes is None:
+        slopes = np.zeros_like(values)
+    slopes = np.broadcast_to(np.reshape(slopes, (len(times), -1)),
+                             values.shape)
+    binomials = _binomials(order)
+    factorials = np.cumprod(np.concatenate([[1.0], np.arange(1.0, order)]))
+    # the target line of segment k is offset + slope * t with t the time
+    # since times[k - 1]; the particular solution lags order time constants
+    offsets = np.empty_like(values)
+    offsets[1:] = values[1:] - slopes[1:] * np.diff(times)[:, np.newaxis]
+    offsets[0] = values[0]
+    # coefficients c[k, i] of the homogeneous solution exp(-r t) sum c_i t^i
+    # of every segment, from the derivatives reached at times[k - 1]
+    state = np.zeros((order,) + values.shape[1:])
+    state[0] = values[0]
+    coefficients = np.zeros((len(times), order) + values.shape[1:])
+    for k in range(1, len(times)):
+        r = rate[k]
+        particular = np.zeros_like(state)
+        particular[0] = offsets[k] - slopes[k] * order / r
+        if order > 1:
+            particular[1] = slopes[k]
+        c = coefficients[k]
+        for j in range(order):
+            terms = sum(binomials[j, i] * (-r)**(j - i) * factorials[i] * c[i]
+                        for i in range(j))
+            c[j] = (state[j] - particular[j] - terms) / factorials[j]
+        # derivatives at the end of the segment
+        dt = times[k] - times[k - 1]
+        decay = np.exp(-r * dt)
+        powers = dt**np.arange(order)
+        # derivative i of the polynomial sum c_l t^l at dt
+        polynomial = np.array([
+            sum(factorials[l] / factorials[l - i] * c[l] * powers[l - i]
+                for l in range(i, order)) for i in range(order)])
+        state = np.array([
+            sum(binomials[j, i] * (-r)**(j - i) * polynomial[i]
+                for i in range(j + 1)) for j in range(order)]) * decay
+        state[0] += offsets[k] + slopes[k] * (dt - order / r)
+        if order > 1:
+            state[1] += slopes[k]
+
+    # segment of every frame: k reaches target k; after the last key time
+    # the last target is approached further
+    segment = np.clip(np.searchsorted(times, frame_times, side='left'),
+                      1, len(times) - 1)
+    dt = np.maximum(frame_times - times[segment - 1], 0.0)[:, np.newaxis]
+    r = rate[segment]
+    polynomial = np.zeros((len(frame_times),) + values.shape[1:])
+    for c in np.moveaxis(coefficients[segment], 1, 0)[::-1]:
+        polynomial = polynomial * dt + c
+    return (offsets[segment] + slopes[segment] * (dt - order / r)
+            + polynomial * np.exp(-r * dt))
+
+
+INTERPOLATIONS = {'linear': linear, 'target': target_approximation}
+
+
+class TrajectoryBuilder(object):
+    '''
+    Builds tract and glottis parameter sequences from keyframes.
+
+    Parameters:
+
+    * vtl -- initialized :class:`pyvtl.api.VocalTractLab`; it provides the
+      shapes of the speaker and the neutral glottis parameters
+    * frame_rate -- frames per second
+    * method -- 'linear' or 'target' (see the module documentation)
+    * time_constant -- time constant of the target approximation in seconds
+    * shapes -- dict of additional tract shapes by name
+    * glottis_neutral -- glottis parameters used where no target is given
+      (default: the neutral parameters of ``vtl``)
+
+    '''
+
+    def __init__(self, vtl=None, frame_rate=200.0, method='linear',
+                 time_constant=0.015, shapes=None, glottis_neutral=None):
+        if method not in INTERPOLATIONS:
+            raise ValueError('Unknown interpolation %r' % method)
+        self.vtl = vtl
+        self.frame_rate = frame_rate
+        self.method = method
+        self.time_constant = time_constant
+        self.shapes = dict(shapes or {})
+        if glottis_neutral is None:
+            glottis_neutral = vtl.glottis_param_neutral
+        self.glottis_neutral = np.asarray(glottis_neutral, dtype=float)
+
+    def shape(self, name):
+        '''
+        Returns the tract parameters of the shape ``name``.
+
+        '''
+        if name not in self.shapes:
+            if self.vtl is None:
+                raise ValueError('Unknown shape %r' % name)
+            self.shapes[name] = self.vtl.get_tract_params(name)
+        return self.shapes[name]
+
+    def frame_times(self, duration):
+        '''
+        Returns the times of the frames of an utterance of ``duration``
+        seconds.
+
+        '''
+        return np.arange(int(duration * self.frame_rate)) / self.frame_rate
+
+    def interpolate(self, keyframes, frame_times):
+        '''
+        Returns the keyframe targets interpolated at ``frame_times``
+        (frames x P).
+
+        '''
+        times, values = _keyframes(keyframes)
+        if self.method == 'target':
+            return target_approximation(times, values, frame_times,
+                                        self.time_constant)
+        return linear(times, values, frame_times)
+
+    def tract(self, keyframes, duration):
+        '''
+        Returns the tract parameters (frames x params) for ``keyframes``
+        with shape names or parameter vectors as targets.
+
+        '''
+        keyframes = [(time, self.shape(target) if isinstance(target, str)
+                      else target) for time, target in keyframes]
+        return self.interpolate(keyframes, self.frame_times(duration))
+
+    def glottis(self, duration, f0=None, pressure=None, keyframes=None):
+        '''
+        Returns the glottis parameters (frames x params). ``f0`` and
+        ``pressure`` are numbers or keyframes; ``keyframes`` with complete
+        glottis parameter vectors replace the neutral parameters. The
+        pressure onset is applied to the first frames.
+
+        '''
+        frame_times = self.frame_times(duration)
+        if keyframes is None:
+            glottis = np.tile(self.glottis_neutral, (len(frame_times), 1))
+        else:
+            glottis = self.interpolate(keyframes, frame_times)
+        for index, targets in ((F0_INDEX, f0), (PRESSURE_INDEX, pressure)):
+            if targets is None:
+                continue
+            if np.isscalar(targets):
+                glottis[:, index] = targets
+            else:
+                glottis[:, index] = self.interpolate(targets, frame_times)[:, 0]
+        onset = min(len(PRESSURE_ONSET), len(frame_times))
+        glottis[:onset, PRESSURE_INDEX] *= PRESSURE_ONSET[:onset]
+        return glottis
+
+    def build(self, tract_keyframes, duration, f0=None, pressure=None,
+              glottis_keyframes=None):
+        '''
+        Returns ``(tract_params, glottis_params)`` for ``vtlSynthBlock``, see
+        :meth:`tract` and :meth:`glottis`.
+
+        '''
+        return (self.tract(tract_keyframes, duration),
+                self.glottis(duration, f0, pressure, glottis_keyframes))
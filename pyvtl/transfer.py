@@ -0,0 +1,183 @@
+'''
+Volume velocity transfer functions and formants of vocal tract shapes.
+
+``vtlGetTransferFunction`` computes the transfer function of a static vocal
+tract shape in the frequency domain, which is much cheaper than synthesizing
+audio. A :class:`TransferFunctionEngine` computes the spectra of a whole
+N x 24 matrix of tract parameter vectors (or of all vocal tract shapes of a
+speaker file) into preallocated arrays and keeps them in a LRU cache keyed
+by the exact parameter values.
+
+:func:`formants` extracts formant frequencies and -3 dB bandwidths from a
+batch of magnitude spectra at once: peaks are located on the dB spectrum,
+refined by parabolic interpolation, and the bandwidth is measured between
+the linearly interpolated -3 dB crossings on both sides of every peak.
+
+Example::
+
+    with VocalTractLab(speaker_file='JD2.speaker') as vtl:
+        engine = TransferFunctionEngine(vtl)
+        names, frequencies, bandwidths = engine.shape_formants()
+
+'''
+
+import collections
+
+import numpy as np
+
+from .speaker import SpeakerTemplate
+
+
+def spectrum_frequencies(num_spectrum_samples, sampling_rate):
+    '''
+    Returns the frequencies (Hz) of the samples of a transfer function.
+
+    '''
+    return np.arange(num_spectrum_samples) * (float(sampling_rate)
+                                              / num_spectrum_samples)
+
+
+def formants(magnitude, sampling_rate, number_formants=4, min_frequency=100.0,
+             max_frequency=5500.0, window=40):
+    '''
+    Returns the frequencies and bandwidths (Hz) of the first
+    ``number_formants`` peaks between ``min_frequency`` and
+    ``max_frequency`` of every magnitude spectrum (N x samples), as two
+    N x number_formants arrays; missing formants and bandwidths whose -3 dB
+    crossing is not within ``window`` samples of the peak are NaN.
+
+    '''
+    magnitude = np.atleast_2d(magnitude)
+    number, size = magnitude.shape
+    step = float(sampling_rate) / size
+    level = 20 * np.log10(np.maximum(magnitude, 1e-12))
+
+    # local maxima within the frequency range
+    center = level[:, 1:-1]
+    peak = (center > level[:, :-2]) & (center >= level[:, 2:])
+    bins = np.arange(1, size - 1)
+    peak &= (bins * step >= min_frequency) & (bins * step <= max_frequency)
+    rank = np.cumsum(peak, axis=1) - 1
+    peak &= rank < number_formants
+    rows, columns = np.nonzero(peak)
+    columns = columns + 1
+    slots = rank[rows, columns - 1]
+
+    # parabolic interpolation of the peak on the dB spectrum
+    left = level[rows, columns - 1]
+    middle = level[rows, columns]
+    right = level[rows, columns + 1]
+    curvature = left - 2 * middle + right
+    shift = np.divide(0.5 * (left - right), curvature,
+                      out=np.zeros_like(curvature), where=curvature != 0)
+    top = middle - 0.25 * (left - right) * shift
+
+    # -3 dB crossings on both sides
+    offsets = np.arange(1, window + 1)
+    threshold = (top - 3.0)[:, np.newaxis]
+    edges = []
+    for direction in (-1, 1):
+        index = np.clip(columns[:, np.newaxis] + direction * offsets, 0,
+                        size - 1)
+        values = level[rows[:, np.newaxis], index]
+        below = values < threshold
+        found = below.any(axis=1)
+        first = np.argmax(below, axis=1)
+        inner = np.where(first > 0,
+                         values[np.arange(len(rows)), first - 1], middle)
+        outer = values[np.arange(len(rows)), first]
+        fraction = np.divide(inner - threshold[:, 0], inner - outer,
+                             out=np.zeros_like(inner), where=inner != outer)
+        distance = first + fraction  # in samples from the peak
+        edges.append(np.where(found, distance, np.nan))
+
+    frequencies = np.full((number, number_formants), np.nan)
+    bandwidths = np.full((number, number_formants), np.nan)
+    frequencies[rows, slots] = (columns + shift) * step
+    bandwidths[rows, slots] = (edges[0] + edges[1]) * step
+    return frequencies, bandwidths
+
+
+class TransferFunctionEngine(object):
+    '''
+    Batched ``vtlGetTransferFunction`` on an initialized
+    :class:`pyvtl.api.VocalTractLab` ``vtl``.
+
+    Parameters:
+
+    * num_spectrum_samples -- samples of every spectrum over the sampling
+      rate of the synthesizer
+    * maxsize -- number of spectra kept in the cache
+
+    '''
+
+    def __init__(self, vtl, num_spectrum_samples=1024, maxsize=2048):
+        self.vtl = vtl
+        self.num_spectrum_samples = num_spectrum_samples
+        self.sampling_rate = vtl.audio_sampling_rate
+        self.frequencies = spectrum_frequencies(num_spectrum_samples,
+                                                self.sampling_rate)
+        self.maxsize = maxsize
+        self._cache = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def spectra(self, tract_params):
+        '''
+        Returns the magnitude and phase spectra (N x num_spectrum_samples
+        each) of the tract parameter vectors ``tract_params`` (N x params).
+
+        '''
+        tract_params = np.ascontiguousarray(np.atleast_2d(tract_params),
+                                            dtype=np.float64)
+        magnitude = np.empty((len(tract_params), self.num_spectrum_samples))
+        phase = np.empty_like(magnitude)
+        for row, params in enumerate(tract_params):
+            key = params.tobytes()
+            spectrum = self._cache.get(key)
+            if spectrum is None:
+                self.misses += 1
+                spectrum = self.vtl.get_transfer_function(
+                    params, self.num_spectrum_samples)
+                self._cache[key] = spectrum
+                while len(self._cache) > self.maxsize:
+                    self._cache.popitem(last=False)
+            else:
+                self.hits += 1
+                self._cache.move_to_end(key)
+            magnitude[row], phase[row] = spectrum
+        return magnitude, phase
+
+    def formants(self, tract_params, number_formants=4, **kwargs):
+        '''
+        Returns the formant frequencies and bandwidths (N x number_formants
+        each) of the tract parameter vectors ``tract_params``, see
+        :func:`formants`.
+
+        '''
+        magnitude = self.spectra(tract_params)[0]
+        return formants(magnitude, self.sampling_rate, number_formants,
+                        **kwargs)
+
+    def shape_params(self, speaker_file=None):
+        '''
+        Returns the names of all vocal tract shapes of ``speaker_file``
+        (default: the speaker of ``vtl``) and their parameters (shapes x
+        params). The parameters are those of the speaker of ``vtl``.
+
+        '''
+        if speaker_file is None:
+            speaker_file = self.vtl.speaker_file
+        names = SpeakerTemplate(speaker_file).vocal_tract_shape_names
+        return names, np.array([self.vtl.get_tract_params(name)
+                                for name in names])
+
+    def shape_formants(self, speaker_file=None, number_formants=4, **kwargs):
+        '''
+        Returns the names of all vocal tract shapes of ``speaker_file``
+        (default: the speaker of ``vtl``) and their formant frequencies and
+        bandwidths.
+
+        '''
+        names, params = self.shape_params(speaker_file)
+        return (names,) + self.formants(params, number_formants, **kwargs)
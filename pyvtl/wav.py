@@ -0,0 +1,206 @@
+'''
+Helpers for the wav files written by ``vtlGesToWav``.
+
+On non windows systems ``vtlGesToWav`` writes a corrupt 76 byte header: all
+32 bit fields of the RIFF header are written as 64 bit values, so the chunks
+are padded with zeros and no wav reader finds them. The samples that follow
+are fine.
+
+:func:`read_vtl_wav` reads such files (and regular 16 bit PCM wav files)
+without repairing them: the file is memory-mapped and the samples are
+returned as a read-only int16 view of the mapping together with the sampling
+rate and the sample count from the header.
+
+:func:`patch_header` repairs a file in place by overwriting only its header:
+the 76 bytes become a regular RIFF header whose ``fmt`` chunk is followed by
+a ``JUNK`` chunk that pads it to the samples, which stay where they are.
+From the command line whole directories are repaired in parallel::
+
+    python -m pyvtl.wav output/ nanana.wav -j 8
+
+'''
+
+import argparse
+import collections
+import concurrent.futures
+import glob
+import mmap
+import os
+import struct
+
+import numpy as np
+
+
+# layout of the header written by vtlGesToWav on non windows systems
+VTL_HEADER_SIZE = 76
+_VTL_FORMAT = struct.Struct('<HHI4xI4xHH')  # at 36: format ... bits
+_VTL_DATA_SIZE = struct.Struct('<I')  # at 68
+
+# regular header of the same size: RIFF, fmt and JUNK chunk up to the 44th
+# byte, JUNK content, data chunk header at 68
+_RIFF_HEADER = struct.Struct('<4sI4s4sIHHIIHH4sI')
+_DATA_HEADER = struct.Struct('<4sI')
+_JUNK_SIZE = VTL_HEADER_SIZE - _RIFF_HEADER.size - _DATA_HEADER.size
+
+WavInfo = collections.namedtuple('WavInfo', ['rate', 'channels', 'bits',
+                                             'data_offset', 'data_size',
+                                             'corrupt'])
+
+
+def read_header(buffer, file_size=None):
+    '''
+    Returns the :class:`WavInfo` of the wav file content ``buffer`` (at
+    least its header). ``corrupt`` is true for the header of ``vtlGesToWav``.
+    ``data_size`` is limited to the ``file_size`` (default: size of
+    ``buffer``).
+
+    '''
+    if file_size is None:
+        file_size = len(buffer)
+    if buffer[:4] != b'RIFF':
+        raise ValueError('Not a wav file')
+    if buffer[8:12] != b'WAVE' and buffer[16:20] == b'WAVE':
+        if len(buffer) < VTL_HEADER_SIZE or buffer[60:64] != b'data':
+            raise ValueError('Truncated vtlGesToWav header')
+        __, channels, rate, __, __, bits = _VTL_FORMAT.unpack_from(buffer, 36)
+        data_size, = _VTL_DATA_SIZE.unpack_from(buffer, 68)
+        offset = VTL_HEADER_SIZE
+        corrupt = True
+    elif buffer[8:12] == b'WAVE':
+        offset = 12
+        channels = rate = bits = data_size = None
+        while offset + 8 <= len(buffer):
+            chunk, size = _DATA_HEADER.unpack_from(buffer, offset)
+            offset += 8
+            if chunk == b'fmt ':
+                __, channels, rate, __, __, bits = struct.unpack_from(
+                    '<HHIIHH', buffer, offset)
+            elif chunk == b'data':
+                data_size = size
+                break
+            offset += size + size % 2
+        if rate is None or data_size is None:
+            raise ValueError('No fmt or data chunk in wav header')
+        corrupt = False
+    else:
+        raise ValueError('Not a wav file')
+    data_size = min(data_size, max(file_size - offset, 0))
+    return WavInfo(rate, channels, bits, offset, data_size, corrupt)
+
+
+def read_vtl_wav(wav_file):
+    '''
+    Returns the samples of the 16 bit wav file ``wav_file`` as read-only
+    int16 array (samples, or samples x channels) backed by a memory map of
+    the file, and the sampling rate. The header may be the corrupt header
+    of ``vtlGesToWav``.
+
+    '''
+    with open(wav_file, 'rb') as file_:
+        buffer = mmap.mmap(file_.fileno(), 0, access=mmap.ACCESS_READ)
+    info = read_header(buffer)
+    if info.bits != 16:
+        raise ValueError('%s has %i bit samples, not 16' % (wav_file,
+                                                            info.bits))
+    count = info.data_size // (2 * info.channels) * info.channels
+    samples = np.frombuffer(buffer, dtype='<i2', count=count,
+                            offset=info.data_offset)
+    if info.channels > 1:
+        samples = samples.reshape(-1, info.channels)
+    return samples, info.rate
+
+
+def patch_header(wav_file):
+    '''
+    Replaces the corrupt header written by ``vtlGesToWav`` in place; only
+    the header bytes are written. Returns False if ``wav_file`` already has
+    a regular header.
+
+    '''
+    with open(wav_file, 'r+b') as file_:
+        header = file_.read(VTL_HEADER_SIZE)
+        file_size = os.fstat(file_.fileno()).st_size
+        info = read_header(header, file_size)
+        if not info.corrupt:
+            return False
+        block_align = info.channels * info.bits // 8
+        file_.seek(0)
+        file_.write(_RIFF_HEADER.pack(b'RIFF', file_size - 8, b'WAVE',
+                                      b'fmt ', 16, 1, info.channels,
+                                      info.rate, info.rate * block_align,
+                                      block_align, info.bits,
+                                      b'JUNK', _JUNK_SIZE)
+                    + bytes(_JUNK_SIZE)
+                    + _DATA_HEADER.pack(b'data', info.data_size))
+    return True
+
+
+def fix_header(wav_file):
+    '''
+    Replaces the corrupt header of ``wav_file`` written by ``vtlGesToWav``.
+
+    '''
+    patch_header(wav_file)
+
+
+def wav_files(paths):
+    '''
+    Returns the wav files among ``paths`` and in the directories among
+    them (recursively).
+
+    '''
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '**', '*.wav'),
+                                          recursive=True)))
+        else:
+            files.append(path)
+    return files
+
+
+def repair(paths, threads=None):
+    '''
+    Patches the headers of all wav files in ``paths`` (files or
+    directories) with a pool of ``threads`` threads. Returns a dict that
+    maps every file to True (repaired), False (already regular) or the
+    exception it raised.
+
+    '''
+    files = wav_files(paths)
+    results = dict()
+    with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+        futures = dict((executor.submit(patch_header, wav_file), wav_file)
+                       for wav_file in files)
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except (IOError, ValueError) as error:
+                results[futures[future]] = error
+    return results
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description='Repair the corrupt headers of wav files written by '
+                    'vtlGesToWav in place.')
+    parser.add_argument('paths', nargs='+',
+                        help='wav files and directories (searched '
+                             'recursively for *.wav)')
+    parser.add_argument('-j', '--threads', type=int, default=None,
+                        help='number of parallel threads')
+    options = parser.parse_args(args)
+
+    results = repair(options.paths, options.threads)
+    failed = 0
+    for wav_file in sorted(results):
+        if isinstance(results[wav_file], Exception):
+            failed += 1
+            print('Error: %s: %s' % (wav_file, results[wav_file]))
+    repaired = sum(result is True for result in results.values())
+    print('Repaired %i of %i files.' % (repaired, len(results)))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,22 @@
+import numpy as np
+import scipy.io.wavfile
+
+from pyvtl.audio import read_wav
+
+
+def test_read_wav_scales_integer_formats(tmp_path):
+    for dtype, values in ((np.uint8, [0, 128, 255]),
+                          (np.int16, [-32768, 0, 32767])):
+        name = str(tmp_path / ('%s.wav' % np.dtype(dtype).name))
+        scipy.io.wavfile.write(name, 16000, np.array(values, dtype=dtype))
+        signal, rate = read_wav(name)
+        assert rate == 16000
+        assert np.allclose(signal, [-1.0, 0.0, 1.0], atol=1e-2)
+
+
+def test_read_wav_scales_multichannel_integer_files(tmp_path):
+    name = str(tmp_path / 'stereo.wav')
+    stereo = np.array([[16384, 16384], [-16384, 0]], dtype=np.int16)
+    scipy.io.wavfile.write(name, 16000, stereo)
+    signal, __ = read_wav(name)
+    assert np.allclose(signal, [0.5, -0.25])
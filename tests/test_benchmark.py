@@ -0,0 +1,14 @@
+from pyvtl.benchmark import compare
+
+
+def _results(**p50):
+    return dict(stages=dict((name, dict(p50=value))
+                            for name, value in p50.items()))
+
+
+def test_compare_ignores_small_absolute_deltas():
+    baseline = _results(sum_of_squares=10e-6, vtlGesToWav=0.5)
+    results = _results(sum_of_squares=40e-6, vtlGesToWav=0.7)
+    regressions = compare(results, baseline, threshold=0.2)
+    assert [name for name, __, __, __ in regressions] == ['vtlGesToWav']
+    assert len(compare(results, baseline, threshold=0.2, min_delta=0.0)) == 2
@@ -0,0 +1,34 @@
+import os
+
+import numpy as np
+import pytest
+
+from pyvtl.checkpoint import (generator_state, load_checkpoint,
+                              save_checkpoint, set_generator_state)
+
+
+def test_round_trip_with_generator_state(tmp_path):
+    name = str(tmp_path / 'run.checkpoint.npz')
+    random = np.random.default_rng(3)
+    random.standard_normal(5)
+    save_checkpoint(name, dict(counter=np.int64(40),
+                               current_sum_of_squares=12.5,
+                               current_VTP_1=np.arange(24.0),
+                               generator=generator_state(random)))
+    expected = random.standard_normal(5)
+    state = load_checkpoint(name)
+    assert state['counter'] == 40
+    assert state['current_sum_of_squares'] == 12.5
+    assert np.array_equal(state['current_VTP_1'], np.arange(24.0))
+    resumed = np.random.default_rng()
+    set_generator_state(resumed, state['generator'])
+    assert np.array_equal(resumed.standard_normal(5), expected)
+
+
+def test_failed_save_keeps_the_previous_checkpoint(tmp_path):
+    name = str(tmp_path / 'run.checkpoint.npz')
+    save_checkpoint(name, dict(counter=1))
+    with pytest.raises(TypeError):
+        save_checkpoint(name, dict(counter=2, unserializable=object()))
+    assert load_checkpoint(name)['counter'] == 1
+    assert os.listdir(str(tmp_path)) == ['run.checkpoint.npz']
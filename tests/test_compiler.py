@@ -0,0 +1,43 @@
+import os
+
+import numpy as np
+import pytest
+
+from pyvtl.api import VocalTractLab
+from pyvtl.compiler import (MAX_FRAME_DISTANCE, CompiledEvaluator,
+                            CompiledScore, ScoreCompiler, validate)
+from pyvtl.gestures import read_gestural_score
+
+REPOSITORY_DIR = os.path.join(os.path.dirname(__file__), '..')
+SPEAKER_FILE = os.path.join(REPOSITORY_DIR, 'JD2.speaker')
+GESTURE_FILE = os.path.join(REPOSITORY_DIR, 'banane.ges')
+
+
+def test_basis_rejects_shapes_the_score_does_not_use():
+    weights = np.zeros((4, 2, 3))
+    compiled = CompiledScore(weights, ['a'], {'a': np.ones(3)},
+                             np.zeros((4, 6)), 200.0)
+    assert np.array_equal(compiled.basis({'a': [2.0]})[1], [2.0, 1.0, 1.0])
+    with pytest.raises(KeyError):
+        compiled.basis({'b': np.zeros(3)})
+
+
+def test_validate_banane(tmp_path):
+    with VocalTractLab(speaker_file=SPEAKER_FILE, private=True,
+                       directory=str(tmp_path)) as vtl:
+        report = validate(ScoreCompiler(vtl), GESTURE_FILE)
+    assert report['frame_distance'] <= MAX_FRAME_DISTANCE
+    assert report['passed']
+
+
+def test_evaluator_rejects_shapes_the_score_does_not_use(tmp_path):
+    with VocalTractLab(speaker_file=SPEAKER_FILE, private=True,
+                       directory=str(tmp_path)) as vtl:
+        compiled = ScoreCompiler(vtl).compile(
+            read_gestural_score(GESTURE_FILE))
+        # the tt-alveolar-clo gestures have no shape in JD2.speaker
+        assert compiled.shape_names == ['a', '@']
+        target_mfcc = np.zeros((40, 86))
+        with pytest.raises(KeyError):
+            CompiledEvaluator(vtl, compiled, target_mfcc)
+        CompiledEvaluator(vtl, compiled, target_mfcc, shape_names=['a'])
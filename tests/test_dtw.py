@@ -0,0 +1,46 @@
+import numpy as np
+
+from pyvtl.dtw import BandedDTW
+
+
+def naive_dtw(a, b):
+    costs = np.sum((a.T[:, np.newaxis] - b.T[np.newaxis])**2, axis=2)
+    accumulated = np.full((len(costs) + 1, costs.shape[1] + 1), np.inf)
+    accumulated[0, 0] = 0.0
+    for i in range(1, len(costs) + 1):
+        for j in range(1, costs.shape[1] + 1):
+            accumulated[i, j] = costs[i - 1, j - 1] + min(
+                accumulated[i - 1, j], accumulated[i, j - 1],
+                accumulated[i - 1, j - 1])
+    return accumulated[-1, -1]
+
+
+def test_distance_matches_naive_dtw_with_a_wide_band():
+    random = np.random.default_rng(0)
+    target = random.standard_normal((4, 12))
+    mfcc = random.standard_normal((4, 9))
+    distance, path = BandedDTW(target, band=20).distance(mfcc, path=True)
+    assert np.isclose(distance, naive_dtw(mfcc, target))
+    assert tuple(path[0]) == (0, 0) and tuple(path[-1]) == (8, 11)
+    steps = np.diff(path, axis=0)
+    assert np.all((steps >= 0) & (steps <= 1)) and np.all(steps.sum(1) > 0)
+
+
+def test_no_path_within_the_band():
+    random = np.random.default_rng(1)
+    target = random.standard_normal((4, 40))
+    mfcc = random.standard_normal((4, 5))
+    distance, path = BandedDTW(target, band=1).distance(mfcc, path=True)
+    assert distance == np.inf
+    assert path.shape == (0, 2)
+
+
+def test_one_frame_candidate_needs_a_band_over_the_whole_target():
+    random = np.random.default_rng(2)
+    target = random.standard_normal((4, 7))
+    mfcc = random.standard_normal((4, 1))
+    distance, path = BandedDTW(target, band=2).distance(mfcc, path=True)
+    assert distance == np.inf
+    assert path.shape == (0, 2)
+    distance = BandedDTW(target, band=3).distance(mfcc)
+    assert np.isclose(distance, naive_dtw(mfcc, target))
@@ -0,0 +1,35 @@
+import numpy as np
+
+from pyvtl.early import EarlyAbandoningObjective
+from pyvtl.features import signal_MFCC
+
+
+def signals(number, random):
+    # noise bursts with silent stretches, so that the top_db floor matters
+    times = np.arange(8000) / 16000.0
+    for __ in range(number):
+        envelope = np.maximum(np.sin(2 * np.pi * random.uniform(1, 6) * times),
+                              0.0)
+        yield (random.uniform(0.01, 1.0) * envelope
+               * random.standard_normal(len(times)))
+
+
+def test_lower_bound_never_exceeds_the_sum_of_squares():
+    random = np.random.default_rng(7)
+    target, = signals(1, random)
+    target_mfcc = signal_MFCC(target, 16000)
+    objective = EarlyAbandoningObjective(target_mfcc, block_frames=5)
+    for signal in signals(10, random):
+        value = float(np.sum((signal_MFCC(signal, 16000) - target_mfcc)**2))
+        full = objective.evaluate(signal, 16000)
+        assert np.isclose(full.value, value)
+        assert full.bound <= value * (1 + 1e-9)
+        for incumbent in value * np.array([0.1, 0.5, 0.9, 1.1]):
+            result = objective.evaluate(signal, 16000, incumbent)
+            assert result.bound <= value * (1 + 1e-9)
+            if result.abandoned:
+                assert result.bound > incumbent and result.fraction < 1
+            else:
+                assert np.isclose(result.value, value)
+    stats = objective.stats.stats()
+    assert 0 < stats['abandoned'] < stats['evaluated']
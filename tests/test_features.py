@@ -0,0 +1,40 @@
+import os
+import warnings
+
+import librosa
+import numpy as np
+
+from pyvtl.audio import read_wav
+from pyvtl.features import MFCCExtractor
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+# largest accepted difference of the MFCCs (dB): float64 signals match to
+# about 1e-12, float32 ones to about 5e-5
+ATOL = 1e-4
+
+
+def librosa_MFCC(y, sr=16000):
+    # the pipeline of the original get_MFCC of banana.py
+    stft = librosa.stft(y, window='hamming', n_fft=512,
+                        win_length=int(0.025 * sr),
+                        hop_length=int(0.010 * sr))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # power_to_db of a complex spectrum
+        S = librosa.feature.melspectrogram(S=stft, y=y, n_mels=40, fmin=0,
+                                           fmax=8000)
+        return librosa.feature.mfcc(S=librosa.power_to_db(S), n_mfcc=40)
+
+
+def test_extractor_matches_librosa():
+    signal, sr = read_wav(os.path.join(ROOT, 'example-hallo.wav'), sr=16000)
+    signal = signal.astype(np.float64)
+    extractor = MFCCExtractor()
+    expected = librosa_MFCC(signal)
+    assert np.allclose(extractor(signal), expected, rtol=0, atol=ATOL)
+
+    length = len(signal) // 3
+    signals = [signal[i * length:(i + 1) * length] for i in range(3)]
+    batch = extractor.batch(signals)
+    assert batch.shape == (3,) + librosa_MFCC(signals[0]).shape
+    for mfcc, y in zip(batch, signals):
+        assert np.allclose(mfcc, librosa_MFCC(y), rtol=0, atol=ATOL)
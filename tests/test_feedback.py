@@ -0,0 +1,54 @@
+import os
+import shutil
+
+import numpy as np
+
+from pyvtl.feedback import (ARTICULATORS, iter_feedback, read_feedback,
+                            sidecar_file)
+from pyvtl.streaming import feedback_frames
+
+FEEDBACK_FILE = os.path.join(os.path.dirname(__file__), '..', 'feedback.txt')
+
+
+def test_read_feedback(tmp_path):
+    name = str(tmp_path / 'feedback.txt')
+    shutil.copy(FEEDBACK_FILE, name)
+    feedback = read_feedback(name)
+    assert feedback.areas.shape == feedback.lengths.shape == (81, 40)
+    assert feedback.tract_params.shape == (81, 24)
+    assert feedback.glottis_params.shape == (81, 6)
+    assert np.allclose(np.diff(feedback.time), 0.01)
+    assert set(bytes(feedback.articulators.ravel())) <= set(
+        ARTICULATORS.encode())
+    assert os.path.exists(sidecar_file(name))
+    cached = read_feedback(name)
+    for field, value in zip(feedback._fields, cached):
+        assert np.array_equal(getattr(feedback, field), value)
+
+
+def test_blocks_and_streaming_frames():
+    feedback = read_feedback(FEEDBACK_FILE, cache=False)
+    blocks = list(iter_feedback(FEEDBACK_FILE, block_size=1000))
+    assert len(blocks) > 1
+    assert np.array_equal(np.concatenate([block.articulators
+                                          for block in blocks]),
+                          feedback.articulators)
+    frame = next(feedback_frames(feedback))
+    assert np.array_equal(frame.articulator, feedback.articulators[0])
+
+
+def test_truncated_file_replaces_the_sidecar(tmp_path):
+    name = str(tmp_path / 'feedback.txt')
+    shutil.copy(FEEDBACK_FILE, name)
+    assert len(read_feedback(name).time) == 81
+    # a run killed while writing: the incomplete last frame is dropped and
+    # the sidecar of the complete file is not used
+    with open(FEEDBACK_FILE, 'rb') as file_:
+        text = file_.read()
+    with open(name, 'wb') as file_:
+        file_.write(text[:len(text) // 2])
+    feedback = read_feedback(name)
+    assert 0 < len(feedback.time) < 81
+    assert np.array_equal(feedback.time,
+                          read_feedback(FEEDBACK_FILE, cache=False).time[
+                              :len(feedback.time)])
@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+from pyvtl.gestures import TimingEvaluator, TimingSpace, read_gestural_score
+from pyvtl.parameters import SCHWA_VTP
+
+GESTURE_FILE = os.path.join(os.path.dirname(__file__), '..', 'banane.ges')
+
+
+class _Pool(object):
+    def __init__(self, band):
+        self.band = band
+
+
+def test_duration_search_needs_a_band():
+    score = read_gestural_score(GESTURE_FILE)
+    with pytest.raises(ValueError):
+        TimingEvaluator(_Pool(None), TimingSpace(score), SCHWA_VTP,
+                        SCHWA_VTP)
+    TimingEvaluator(_Pool(None), TimingSpace(score, fields=('time_constant',)),
+                    SCHWA_VTP, SCHWA_VTP).close()
+    TimingEvaluator(_Pool(10), TimingSpace(score), SCHWA_VTP,
+                    SCHWA_VTP).close()
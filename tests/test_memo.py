@@ -0,0 +1,31 @@
+import numpy as np
+
+from pyvtl.memo import SynthesisMemo, objective_namespace
+from pyvtl.parameters import SCHWA_VTP
+
+
+def test_non_finite_results_are_not_stored(tmp_path):
+    memo = SynthesisMemo(persistent_file=str(tmp_path / 'memo.sqlite'))
+    params = np.array([SCHWA_VTP])
+    calls = []
+
+    def compute(missing):
+        calls.append(missing)
+        return [np.nan] if len(calls) == 1 else [1.0]
+
+    assert np.isnan(memo.evaluate(params, params, compute)[0])
+    assert memo.evaluate(params, params, compute)[0] == 1.0
+    assert memo.evaluate(params, params, compute)[0] == 1.0
+    assert len(calls) == 2
+    memo.close()
+
+
+def test_objective_namespace_follows_contents_and_settings(tmp_path):
+    target = tmp_path / 'target.wav'
+    target.write_bytes(b'one')
+    namespace = objective_namespace([str(target)], band=None)
+    assert namespace.startswith('target/')
+    assert objective_namespace([str(target)], band=None) == namespace
+    assert objective_namespace([str(target)], band=10) != namespace
+    target.write_bytes(b'two')
+    assert objective_namespace([str(target)], band=None) != namespace
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from pyvtl.optimize import (CMAES, AdaptiveLocalSearch, Optimizer,
+                            SearchSpace, minimize)
+
+
+def sphere(params_1, params_2):
+    return np.sum((params_1 - 0.5)**2, axis=1) + np.sum((params_2 - 0.5)**2,
+                                                         axis=1)
+
+
+def test_minimize_stops_at_max_evaluations():
+    # the last batch is cut to 5 candidates, fewer than mu = 7
+    space = SearchSpace()
+    optimizer = CMAES(space, batch_size=15, seed=1)
+    report = minimize(optimizer, sphere, max_evaluations=95)
+    assert report['evaluations'] == 95
+    assert np.isfinite(report['best_value'])
+
+
+def test_minimize_improves():
+    space = SearchSpace(np.tile([[0.0, 1.0]], (4, 1)))
+    for optimizer in (CMAES(space, seed=2),
+                      AdaptiveLocalSearch(space, seed=2)):
+        start = sphere(*space.split(optimizer.ask()))[0]
+        report = minimize(optimizer, sphere, max_evaluations=400)
+        assert report['best_value'] < start
+
+
+def test_optimizer_needs_ask_and_tell():
+    class AskOnly(Optimizer):
+        def _ask(self):
+            return np.zeros((self.batch_size, self.space.dimension))
+
+    with pytest.raises(TypeError):
+        AskOnly(SearchSpace())
@@ -0,0 +1,39 @@
+import os
+
+import numpy as np
+
+from pyvtl.runlog import RunRecorder, read_log
+
+
+def test_round_trip(tmp_path):
+    name = str(tmp_path / 'run.runlog')
+    random = np.random.default_rng(0)
+    params = random.standard_normal((5, 2, 24))
+    with RunRecorder(name, buffer_size=2) as recorder:
+        for iteration, (params_1, params_2) in enumerate(params):
+            recorder.record(iteration, 10.0 - iteration, params_1, params_2,
+                            elapsed=0.5 * iteration)
+        assert len(recorder) == 5
+    records = read_log(name)
+    assert np.array_equal(records['iteration'], np.arange(5))
+    assert np.array_equal(records['ssq'], 10.0 - np.arange(5))
+    assert np.array_equal(records['time'], 0.5 * np.arange(5))
+    assert np.array_equal(records['params'], params)
+
+
+def test_truncated_tail_is_dropped(tmp_path):
+    name = str(tmp_path / 'run.runlog')
+    params = np.zeros(24)
+    with RunRecorder(name) as recorder:
+        for iteration in range(3):
+            recorder.record(iteration, float(iteration), params, params)
+    # a run killed while writing the fourth record
+    with open(name, 'ab') as file_:
+        file_.write(b'\1' * 17)
+    assert len(read_log(name)) == 3
+    with RunRecorder(name) as recorder:
+        assert recorder.written == 3
+        recorder.record(3, 3.0, params, params)
+    records = read_log(name)
+    assert np.array_equal(records['iteration'], np.arange(4))
+    assert (os.path.getsize(name) - 64) % records.dtype.itemsize == 0
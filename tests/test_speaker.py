@@ -0,0 +1,20 @@
+import os
+import shutil
+
+import numpy as np
+
+from pyvtl.speaker import SpeakerTemplate, update_speaker_file
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_in_place_patches_of_different_shapes_survive(tmp_path):
+    speaker_file = str(tmp_path / 'nanana.speaker')
+    shutil.copy(os.path.join(ROOT, 'JD2.speaker'), speaker_file)
+    first = np.full(23, 0.25)
+    second = np.full(23, -0.5)
+    update_speaker_file(first, first, speaker_file, shapes=('a', 'e'))
+    update_speaker_file(second, second, speaker_file, shapes=('i', 'o'))
+    template = SpeakerTemplate(speaker_file)
+    for shape, value in (('a', 0.25), ('e', 0.25), ('i', -0.5), ('o', -0.5)):
+        assert np.allclose(template.get_params(shape)[:23], value)
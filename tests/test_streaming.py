@@ -0,0 +1,20 @@
+import os
+
+import numpy as np
+
+from pyvtl.parameters import SCHWA_VTP, VTP_NAMES
+from pyvtl.streaming import (MAX_VELUM_OPENING, speaker_velum_opening,
+                             velum_opening)
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+
+def test_velum_opening_of_the_speaker():
+    assert speaker_velum_opening(os.path.join(ROOT, 'JD2.speaker')) == (
+        MAX_VELUM_OPENING)
+    child = speaker_velum_opening(os.path.join(ROOT, 'VTL2.1_Linux',
+                                               'child-1y.speaker'))
+    assert np.isclose(child, 1.6439e-4)
+    params = np.array([SCHWA_VTP] * 3)
+    params[:, VTP_NAMES.index('VO')] = [-0.1, 0.5, 1.0]
+    assert np.allclose(velum_opening(params, child), [0.0, child / 2, child])
@@ -0,0 +1,53 @@
+import numpy as np
+
+from pyvtl.surrogate import KNNSurrogate, SurrogateScreen
+
+RANGES = np.tile([[0.0, 1.0]], (3, 1))
+
+
+def bowl(params_1, params_2):
+    return (np.sum((params_1 - 0.3)**2, axis=1)
+            + np.sum((params_2 - 0.7)**2, axis=1))
+
+
+def test_screen_precision_and_recall_on_a_toy_function():
+    random = np.random.default_rng(4)
+    screen = SurrogateScreen(KNNSurrogate(RANGES), margin=0.1,
+                             exploration=1.0, min_observations=0, seed=5)
+    warm_up = random.random((2, 500, 3))
+    screen.surrogate.add(bowl(*warm_up), *warm_up)
+    incumbent = 0.4  # about 15 % of the candidates are better
+    counts = np.zeros((2, 2), dtype=int)  # passed x good
+    for __ in range(20):
+        params_1, params_2 = random.random((2, 50, 3))
+        passed = (screen.surrogate.predict(params_1, params_2)
+                  < incumbent * 1.1)
+        values = screen.evaluate(params_1, params_2, incumbent,
+                                 lambda selected: bowl(params_1[selected],
+                                                       params_2[selected]))
+        assert np.array_equal(values, bowl(params_1, params_2))
+        good = values < incumbent
+        np.add.at(counts, (passed.astype(int), good.astype(int)), 1)
+
+    stats = screen.stats()
+    assert stats['true_positives'] == counts[1, 1]
+    assert stats['false_positives'] == counts[1, 0]
+    assert stats['false_negatives'] == counts[0, 1]
+    assert stats['true_negatives'] == counts[0, 0]
+    # the screen passes most of the good candidates (recall 0.83) and is
+    # far more precise than passing everything (0.79 against 0.16)
+    base_rate = counts[:, 1].sum() / float(counts.sum())
+    assert stats['recall'] > 0.75
+    assert stats['precision'] > 3 * base_rate
+
+
+def test_skipped_candidates_are_nan():
+    screen = SurrogateScreen(KNNSurrogate(RANGES), exploration=0.0,
+                             min_observations=0, seed=6)
+    points = np.array([[0.3, 0.3, 0.3], [1.0, 1.0, 1.0]])
+    screen.surrogate.add(bowl(points, 1 - points), points, 1 - points)
+    values = screen.evaluate(points, 1 - points, 0.5,
+                             lambda selected: bowl(points[selected],
+                                                   1 - points[selected]))
+    assert values[0] == 0.0 and np.isnan(values[1])
+    assert screen.stats()['skipped'] == 1
@@ -0,0 +1,48 @@
+import re
+
+import numpy as np
+
+from pyvtl.telemetry import RollingMetric, Telemetry
+
+SAMPLE = re.compile(r'^([a-z_]+)(\{[^}]*\})? (\S+)$')
+
+
+def test_rolling_quantiles_over_the_last_values():
+    rolling = RollingMetric(window=4, edges=[2.5, 5.0, 7.5])
+    for value in range(1, 11):
+        rolling.add(float(value))
+    assert rolling.last() == 10.0
+    assert np.array_equal(rolling.window(), [7.0, 8.0, 9.0, 10.0])
+    assert np.allclose(rolling.quantiles((0.0, 0.5, 1.0)), [7.0, 8.5, 10.0])
+    edges, counts = rolling.histogram()
+    assert counts.tolist() == [0, 0, 1, 4]
+
+
+def test_prometheus_snapshot(tmp_path):
+    name = str(tmp_path / 'metrics.prom')
+    telemetry = Telemetry(name, interval=0.0)
+    for __ in range(3):
+        with telemetry.stage('synthesis'):
+            pass
+    telemetry.count('evaluations', 12)
+    telemetry.gauge('memo_hit_rate', 0.25)
+    telemetry.maybe_flush()
+    with open(name) as file_:
+        text = file_.read()
+    samples = dict()
+    for line in text.splitlines():
+        if line.startswith('# TYPE '):
+            continue
+        match = SAMPLE.match(line)
+        assert match, line
+        samples[match.group(1) + (match.group(2) or '')] = float(
+            match.group(3))
+    assert samples['pyvtl_stage_seconds_count{stage="synthesis"}'] == 3
+    quantiles = [samples['pyvtl_stage_seconds{stage="synthesis",'
+                         'quantile="%s"}' % quantile]
+                 for quantile in ('0.5', '0.9', '0.99')]
+    assert 0 <= quantiles[0] <= quantiles[1] <= quantiles[2]
+    assert samples['pyvtl_evaluations_total'] == 12
+    assert samples['pyvtl_memo_hit_rate'] == 0.25
+    assert samples['pyvtl_evaluations_per_second'] > 0
+    assert samples['pyvtl_resident_memory_bytes'] > 0
@@ -0,0 +1,45 @@
+from math import factorial
+
+import numpy as np
+
+from pyvtl.trajectory import linear, target_approximation
+
+
+def step_response(times, time_constant, order):
+    # unit step response of a critically damped system of order
+    x = times / time_constant
+    return 1 - np.exp(-x) * sum(x**k / factorial(k) for k in range(order))
+
+
+def test_step_response_is_critically_damped():
+    frame_times = np.linspace(0.0, 0.2, 41)
+    for order in (1, 2, 5):
+        response = target_approximation(np.array([0.0, 1.0]),
+                                         np.array([[0.0], [1.0]]),
+                                         frame_times, 0.015, order)[:, 0]
+        assert np.allclose(response, step_response(frame_times, 0.015, order))
+        assert np.all(np.diff(response) >= 0) and response.max() < 1
+
+
+def test_state_carries_over_between_targets():
+    # a second target equal to the first continues the same step response
+    frame_times = np.linspace(0.0, 0.2, 41)
+    response = target_approximation(np.array([0.0, 0.05, 1.0]),
+                                    np.array([[0.0], [1.0], [1.0]]),
+                                    frame_times, 0.015, 5)[:, 0]
+    assert np.allclose(response, step_response(frame_times, 0.015, 5))
+
+
+def test_sloped_target_reaches_its_value_at_the_end():
+    # the line 1 + 2 (t - 1) is followed with a lag of order time constants
+    frame_times = np.array([0.5, 0.9, 1.0])
+    response = target_approximation(np.array([0.0, 1.0]),
+                                     np.array([[-1.0], [1.0]]), frame_times,
+                                     0.01, 5, slopes=np.array([0.0, 2.0]))
+    assert np.allclose(response[:, 0], 1 + 2 * (frame_times - 1 - 5 * 0.01))
+
+
+def test_linear_holds_the_ends():
+    values = linear(np.array([0.1, 0.2]), np.array([[1.0], [3.0]]),
+                    np.array([0.0, 0.15, 0.3]))
+    assert np.allclose(values[:, 0], [1.0, 2.0, 3.0])
@@ -0,0 +1,56 @@
+import numpy as np
+
+from pyvtl.transfer import formants, spectrum_frequencies
+
+FREQUENCIES = np.array([500.0, 1500.0, 2500.0, 3500.0])
+BANDWIDTHS = np.array([80.0, 100.0, 120.0, 150.0])
+
+
+def all_pole_magnitude(f, frequencies, bandwidths):
+    # product of second order resonances
+    magnitude = np.ones_like(f)
+    for frequency, bandwidth in zip(frequencies, bandwidths):
+        magnitude *= frequency**2 / np.sqrt((frequency**2 - f**2)**2
+                                            + (f * bandwidth)**2)
+    return magnitude
+
+
+def dense_formants(frequencies, bandwidths):
+    # peaks and -3 dB bandwidths on a 0.1 Hz grid
+    f = np.arange(100.0, 5500.0, 0.1)
+    level = 20 * np.log10(all_pole_magnitude(f, frequencies, bandwidths))
+    peaks = np.flatnonzero((level[1:-1] > level[:-2])
+                           & (level[1:-1] > level[2:])) + 1
+    widths = []
+    for peak in peaks:
+        above = level > level[peak] - 3
+        lower = upper = peak
+        while above[lower - 1]:
+            lower -= 1
+        while above[upper + 1]:
+            upper += 1
+        widths.append(f[upper] - f[lower])
+    return f[peaks], np.array(widths)
+
+
+def test_formants_of_a_synthetic_spectrum():
+    f = spectrum_frequencies(8192, 44100)
+    for scale in (1.0, 1.1):
+        spectrum = all_pole_magnitude(f, FREQUENCIES * scale, BANDWIDTHS)
+        frequencies, bandwidths = formants(spectrum, 44100)
+        expected_frequencies, expected_bandwidths = dense_formants(
+            FREQUENCIES * scale, BANDWIDTHS)
+        # the spectrum has 5.4 Hz bins
+        assert np.allclose(frequencies[0], expected_frequencies, atol=1.0)
+        assert np.allclose(bandwidths[0], expected_bandwidths, atol=2.0)
+
+
+def test_missing_formants_are_nan():
+    f = spectrum_frequencies(8192, 44100)
+    spectrum = all_pole_magnitude(f, FREQUENCIES[:2], BANDWIDTHS[:2])
+    frequencies, bandwidths = formants(spectrum, 44100)
+    assert np.allclose(frequencies[0, :2],
+                       dense_formants(FREQUENCIES[:2], BANDWIDTHS[:2])[0],
+                       atol=1.0)
+    assert np.all(np.isnan(frequencies[0, 2:]))
+    assert np.all(np.isnan(bandwidths[0, 2:]))
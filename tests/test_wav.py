@@ -0,0 +1,35 @@
+import struct
+
+import numpy as np
+import scipy.io.wavfile
+
+from pyvtl.wav import VTL_HEADER_SIZE, patch_header, read_vtl_wav
+
+
+def vtl_header(rate, data_size):
+    # the header of vtlGesToWav on Linux: every 32 bit field is written as
+    # a 64 bit value
+    return (b'RIFF' + bytes(4) + struct.pack('<Q', VTL_HEADER_SIZE + data_size)
+            + b'WAVEfmt ' + bytes(4) + struct.pack('<Q', 24)
+            + struct.pack('<HHQQHH', 1, 1, rate, 2 * rate, 2, 16)
+            + b'data' + bytes(4) + struct.pack('<Q', data_size))
+
+
+def test_patch_header(tmp_path):
+    name = str(tmp_path / 'vtl.wav')
+    samples = np.arange(-500, 500, 7, dtype='<i2')
+    header = vtl_header(22050, samples.nbytes)
+    assert len(header) == VTL_HEADER_SIZE
+    with open(name, 'wb') as file_:
+        file_.write(header + samples.tobytes())
+
+    signal, rate = read_vtl_wav(name)
+    assert rate == 22050 and np.array_equal(signal, samples)
+    del signal
+
+    assert patch_header(name)
+    rate, signal = scipy.io.wavfile.read(name)
+    assert rate == 22050 and np.array_equal(signal, samples)
+    with open(name, 'rb') as file_:
+        assert file_.read()[VTL_HEADER_SIZE:] == samples.tobytes()
+    assert not patch_header(name)
@@ -10,7 +10,6 @@ vocaltractlab API from python3.
 
 import ctypes
 import os
-import shutil
 import sys
 
 # Use 'VocalTractLabApi32.dll' if you use a 32-bit python version.
@@ -50,22 +49,13 @@ print('Stored results in "%s" and "%s".' % (wav_file_name.value.decode(),
                                             feedback_file_name.value.decode()))
 
 
-# fix wav header on non windows os
+# fix wav header on non windows os; only the header bytes are rewritten
 if sys.platform != 'win32':
-    WAV_HEADER = (b'RIFF\x8c\x87\x00\x00WAVEfmt\x20\x10\x00\x00\x00\x01\x00\x01'
-                  + b'\x00"V\x00\x00D\xac\x00\x00\x02\x00\x10\x00data')
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    os.pardir))
+    from pyvtl.wav import patch_header
 
     wav_file = wav_file_name.value.decode()
-    with open(wav_file, 'rb') as file_:
-        content = file_.read()
-
-    shutil.move(wav_file, wav_file + '.bkup')
-
-    with open(wav_file, 'wb') as newfile:
-        newcontent = WAV_HEADER + content[68:]
-        newfile.write(newcontent)
-
-    os.remove(wav_file + '.bkup')
+    patch_header(wav_file)
 
     print('Fixed header in %s.' % wav_file)
-